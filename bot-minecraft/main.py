@@ -3,6 +3,7 @@ from discord.ext import commands
 from discord import app_commands
 import os
 import logging
+from cogs.command_sync import sync_if_changed
 
 # Configuración detallada de logging
 logging.basicConfig(
@@ -48,21 +49,9 @@ async def setup_hook():
 
     logging.info("Sincronizando comandos...")
     try:
-        # Sincronizar comandos globales
-        synced_commands = await bot.tree.sync()
-        if synced_commands:
-            logging.info(f"{len(synced_commands)} comandos globales sincronizados: {[command.name for command in synced_commands]}")
-        else:
-            logging.warning("No se sincronizaron comandos globales.")
-
-        # Sincronizar comandos para guilds específicos si es necesario (ejemplo)
-        # for guild_id in self.guild_ids: # Asegúrate de tener self.guild_ids definido si usas esto
-        #     guild = discord.Object(id=guild_id)
-        #     guild_synced_commands = await self.tree.sync(guild=guild)
-        #     if guild_synced_commands:
-        #         logging.info(f"{len(guild_synced_commands)} comandos sincronizados para guild {guild_id}: {[command.name for command in guild_synced_commands]}")
-        #     else:
-        #         logging.warning(f"No se sincronizaron comandos para guild {guild_id}.")
+        # Solo se sincroniza si el árbol de comandos cambió desde el último arranque.
+        # Para probar en servidores concretos: DEV_GUILD_IDS=id1,id2
+        await sync_if_changed(bot.tree, log=logging.info)
 
     except Exception as e:
         logging.error(f"Error al sincronizar comandos: {e}", exc_info=True)
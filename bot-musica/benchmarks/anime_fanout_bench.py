@@ -0,0 +1,74 @@
+"""Tiempo de ``anime ... | 10`` con los detalles pedidos en serie o a la vez.
+
+Usa las APIs falsas de ``search_loop_lag_bench.py`` (MAL y traductor con
+latencia fija). Con ``ANIME_CONCURRENCY = 1`` el cog se comporta como
+antes: búsqueda, y para cada resultado detalles y traducción uno tras
+otro (21 viajes de ida y vuelta). Con el valor por defecto todos los
+resultados se piden a la vez y se envían en orden según están listos.
+
+Uso (desde bot-musica/):
+    python benchmarks/anime_fanout_bench.py [resultados] [latencia_ms]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cogs.search import Search
+from search_loop_lag_bench import FakeAPIs
+
+
+class TimedContext:
+    """Registra cuándo se envía cada embed y con qué título"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sent: list[tuple[float, str]] = []
+
+    async def send(self, content=None, embed=None, **kwargs):
+        self.sent.append((time.perf_counter() - self.start, embed.title if embed else content))
+
+
+async def run_mode(concurrency: int, results: int) -> TimedContext:
+    # Caché de traducciones vacía en cada modo
+    state_dir = tempfile.TemporaryDirectory()
+    os.environ["TRANSLATION_CACHE_DB"] = os.path.join(state_dir.name, "translation_cache.db")
+    cog = Search(bot=None)
+    cog.anime_slots = asyncio.Semaphore(concurrency)
+    await cog.cog_load()
+    ctx = TimedContext()
+    await cog.anime.callback(cog, ctx, mensaje=f"anime | {results}")
+    await cog.cog_unload()
+    state_dir.cleanup()
+    return ctx
+
+
+async def run(results: int, latency_ms: float):
+    server = FakeAPIs(latency_ms / 1000)
+    uri = server.start()
+    Search.MAL_API_URL = f"{uri}/mal"
+    Search.TRANSLATE_URL = f"{uri}/translate"
+    Search.EXCHANGE_API_URL = f"{uri}/rates"
+
+    print(f"anime | {results}, latencia de las APIs {latency_ms:.0f} ms\n")
+    for label, concurrency in (("en serie", 1), (f"a la vez ({Search.ANIME_CONCURRENCY})", Search.ANIME_CONCURRENCY)):
+        ctx = await run_mode(concurrency, results)
+        titles = [title for _, title in ctx.sent]
+        in_order = titles == [f"Anime {i + 1}" for i in range(results)]
+        print(f"{label:<16} primer embed {ctx.sent[0][0] * 1000:6.0f} ms, último {ctx.sent[-1][0] * 1000:6.0f} ms "
+              f"({ctx.sent[-1][0] * 1000 / latency_ms:.1f} viajes), en orden: {'sí' if in_order else 'no'}")
+    server.stop()
+
+
+def main():
+    results = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 150
+    asyncio.run(run(results, latency_ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""Servidor Lavalink v4 falso para pruebas sin conexión.
+
+Implementa lo mínimo que usa wavelink 3: el websocket (``ready``,
+``playerUpdate`` y los eventos de inicio/fin de canción), búsquedas en
+``/v4/loadtracks``, actualización y borrado de reproductores, ``/v4/info``,
+``/v4/stats`` y ``/version``. Las canciones son cortas y "suenan" en tiempo
+real: al terminar se emite ``TrackEndEvent`` con motivo ``finished``.
+
+Uso como módulo:
+    server = FakeLavalink(track_length=(3000, 8000))
+    uri = await server.start()
+    ...
+    await server.stop()
+"""
+import asyncio
+import random
+import time
+from collections import Counter
+from typing import Optional
+
+from aiohttp import WSMsgType, web
+
+SESSION_ID = "fake-session"
+
+
+class FakePlayerState:
+    __slots__ = ("track", "position", "started_at", "paused", "end_handle")
+
+    def __init__(self):
+        self.track: Optional[dict] = None
+        self.position = 0
+        self.started_at = 0.0
+        self.paused = False
+        self.end_handle: Optional[asyncio.TimerHandle] = None
+
+    def current_position(self) -> int:
+        if not self.track or self.paused:
+            return self.position
+        return self.position + int((time.monotonic() - self.started_at) * 1000)
+
+
+class FakeLavalink:
+    def __init__(self, track_length: tuple[int, int] = (3000, 8000), results_per_search: int = 5,
+                 load_latency: float = 0.02, update_latency: float = 0.003, update_interval: float = 1.0,
+                 password: str = "youshallnotpass"):
+        self.track_length = track_length
+        self.results_per_search = results_per_search
+        self.load_latency = load_latency
+        self.update_latency = update_latency
+        self.update_interval = update_interval
+        self.password = password
+        self.players: dict[str, FakePlayerState] = {}
+        # Duración (ms) del primer resultado de ciertas consultas; el resto, al azar
+        self.lengths: dict[str, int] = {}
+        # Pistas entregadas en búsquedas, por su "encoded"
+        self.tracks: dict[str, dict] = {}
+        self.sockets: list[web.WebSocketResponse] = []
+        self.requests = Counter()
+        self.events = Counter()
+        self.started = time.monotonic()
+        self._runner: Optional[web.AppRunner] = None
+        self._update_task: Optional[asyncio.Task] = None
+        # Los mensajes del websocket salen en orden desde una sola tarea
+        self._outgoing: asyncio.Queue = asyncio.Queue()
+        self._sender_task: Optional[asyncio.Task] = None
+
+        self.app = web.Application()
+        self.app.router.add_get("/v4/websocket", self.websocket)
+        self.app.router.add_get("/v4/info", self.info)
+        self.app.router.add_get("/v4/stats", self.stats)
+        self.app.router.add_get("/version", self.version)
+        self.app.router.add_get("/v4/loadtracks", self.load_tracks)
+        self.app.router.add_patch("/v4/sessions/{session}", self.update_session)
+        self.app.router.add_patch("/v4/sessions/{session}/players/{guild}", self.update_player)
+        self.app.router.add_delete("/v4/sessions/{session}/players/{guild}", self.destroy_player)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        loop = asyncio.get_running_loop()
+        self._update_task = loop.create_task(self._send_updates())
+        self._sender_task = loop.create_task(self._send_outgoing())
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        for task in (self._update_task, self._sender_task):
+            if task:
+                task.cancel()
+        for state in self.players.values():
+            if state.end_handle:
+                state.end_handle.cancel()
+        for ws in list(self.sockets):
+            await ws.close()
+        if self._runner:
+            await self._runner.cleanup()
+
+    # Datos de pistas
+
+    def make_track(self, query: str, index: int) -> dict:
+        seed = hash((query, index)) & 0xFFFFFFFF
+        length = self.lengths.get(query) if index == 0 and query in self.lengths else \
+            random.Random(seed).randint(*self.track_length)
+        identifier = f"{seed:011x}"[:11]
+        track = self.tracks[f"fake:{identifier}:{length}"] = {
+            "encoded": f"fake:{identifier}:{length}",
+            "info": {
+                "identifier": identifier,
+                "isSeekable": True,
+                "author": f"Artista {seed % 97}",
+                "length": length,
+                "isStream": False,
+                "position": 0,
+                "title": f"{query} ({index + 1})",
+                "uri": f"https://www.youtube.com/watch?v={identifier}",
+                "artworkUrl": None,
+                "isrc": None,
+                "sourceName": "youtube",
+            },
+            "pluginInfo": {},
+            "userData": {},
+        }
+        return track
+
+    def player_json(self, guild_id: str) -> dict:
+        state = self.players.get(guild_id) or FakePlayerState()
+        return {
+            "guildId": guild_id,
+            "track": state.track,
+            "volume": 100,
+            "paused": state.paused,
+            "state": {"time": int(time.time() * 1000), "position": state.current_position(), "connected": True, "ping": 1},
+            "voice": {"token": "token", "endpoint": "fake", "sessionId": "voice"},
+            "filters": {},
+        }
+
+    # Websocket y eventos
+
+    async def _send_outgoing(self) -> None:
+        try:
+            while True:
+                payload = await self._outgoing.get()
+                for ws in list(self.sockets):
+                    try:
+                        await ws.send_json(payload)
+                    except ConnectionError:
+                        pass
+        except asyncio.CancelledError:
+            pass
+
+    def emit(self, payload: dict) -> None:
+        if payload.get("op") == "event":
+            self.events[payload["type"] + (f":{payload['reason']}" if "reason" in payload else "")] += 1
+        self._outgoing.put_nowait(payload)
+
+    def track_event(self, guild_id: str, kind: str, track: dict, reason: Optional[str] = None) -> None:
+        payload = {"op": "event", "type": kind, "guildId": guild_id, "track": track}
+        if reason:
+            payload["reason"] = reason
+        self.emit(payload)
+
+    def finish(self, guild_id: str, track: dict) -> None:
+        state = self.players.get(guild_id)
+        if not state or state.track is not track:
+            return
+        state.track = None
+        state.end_handle = None
+        self.track_event(guild_id, "TrackEndEvent", track, "finished")
+
+    def schedule_end(self, guild_id: str, state: FakePlayerState) -> None:
+        if state.end_handle:
+            state.end_handle.cancel()
+            state.end_handle = None
+        if state.track and not state.paused:
+            remaining = max(0, state.track["info"]["length"] - state.position) / 1000
+            state.end_handle = asyncio.get_running_loop().call_later(remaining, self.finish, guild_id, state.track)
+
+    async def _send_updates(self) -> None:
+        try:
+            while True:
+                await asyncio.sleep(self.update_interval)
+                for guild_id, state in list(self.players.items()):
+                    if state.track:
+                        self.emit({
+                            "op": "playerUpdate",
+                            "guildId": guild_id,
+                            "state": {"time": int(time.time() * 1000), "position": state.current_position(),
+                                      "connected": True, "ping": 1},
+                        })
+        except asyncio.CancelledError:
+            pass
+
+    # Rutas HTTP
+
+    def authorized(self, request: web.Request) -> bool:
+        return request.headers.get("Authorization") == self.password
+
+    async def websocket(self, request: web.Request) -> web.StreamResponse:
+        if not self.authorized(request):
+            return web.Response(status=401)
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.sockets.append(ws)
+        await ws.send_json({"op": "ready", "resumed": False, "sessionId": SESSION_ID})
+        try:
+            async for message in ws:
+                if message.type == WSMsgType.ERROR:
+                    break
+        finally:
+            self.sockets.remove(ws)
+        return ws
+
+    async def info(self, request: web.Request) -> web.Response:
+        self.requests["info"] += 1
+        return web.json_response({
+            "version": {"semver": "4.0.0", "major": 4, "minor": 0, "patch": 0, "preRelease": None, "build": None},
+            "buildTime": 0, "git": {"branch": "fake", "commit": "fake", "commitTime": 0},
+            "jvm": "fake", "lavaplayer": "fake", "sourceManagers": ["youtube"],
+            "filters": [], "plugins": [],
+        })
+
+    async def stats(self, request: web.Request) -> web.Response:
+        self.requests["stats"] += 1
+        playing = sum(1 for state in self.players.values() if state.track and not state.paused)
+        return web.json_response({
+            "players": len(self.players),
+            "playingPlayers": playing,
+            "uptime": int((time.monotonic() - self.started) * 1000),
+            "memory": {"free": 1 << 28, "used": 1 << 27, "allocated": 1 << 28, "reservable": 1 << 29},
+            "cpu": {"cores": 2, "systemLoad": 0.1, "lavalinkLoad": 0.05},
+            "frameStats": None,
+        })
+
+    async def version(self, request: web.Request) -> web.Response:
+        return web.Response(text="4.0.0")
+
+    async def load_tracks(self, request: web.Request) -> web.Response:
+        self.requests["loadtracks"] += 1
+        await asyncio.sleep(self.load_latency)
+        identifier = request.query.get("identifier", "")
+        prefix, _, rest = identifier.partition(":")
+        query = rest if prefix.endswith("search") else identifier
+        tracks = [self.make_track(query, index) for index in range(self.results_per_search)]
+        return web.json_response({"loadType": "search", "data": tracks})
+
+    async def update_session(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        return web.json_response({"resuming": bool(data.get("resuming")), "timeout": data.get("timeout", 60)})
+
+    async def update_player(self, request: web.Request) -> web.Response:
+        self.requests["update_player"] += 1
+        await asyncio.sleep(self.update_latency)
+        guild_id = request.match_info["guild"]
+        no_replace = request.query.get("noReplace", "False").lower() == "true"
+        data = await request.json()
+        state = self.players.setdefault(guild_id, FakePlayerState())
+
+        if "track" in data:
+            encoded = (data["track"] or {}).get("encoded")
+            if encoded is None:
+                old, state.track = state.track, None
+                if old:
+                    self.track_event(guild_id, "TrackEndEvent", old, "stopped")
+                self.schedule_end(guild_id, state)
+            elif not (no_replace and state.track):
+                track = self.tracks.get(encoded)
+                if track is None:
+                    return web.json_response(
+                        {"timestamp": int(time.time() * 1000), "status": 400, "error": "Bad Request",
+                         "message": "Unknown track", "path": request.path}, status=400)
+                old = state.track
+                state.track = track
+                state.position = data.get("position") or 0
+                state.started_at = time.monotonic()
+                if old:
+                    self.track_event(guild_id, "TrackEndEvent", old, "replaced")
+                self.track_event(guild_id, "TrackStartEvent", track)
+
+        if "paused" in data and data["paused"] != state.paused:
+            state.position = state.current_position()
+            state.started_at = time.monotonic()
+            state.paused = data["paused"]
+        if "track" in data or "paused" in data:
+            self.schedule_end(guild_id, state)
+
+        return web.json_response(self.player_json(guild_id))
+
+    async def destroy_player(self, request: web.Request) -> web.Response:
+        self.requests["destroy_player"] += 1
+        guild_id = request.match_info["guild"]
+        state = self.players.pop(guild_id, None)
+        if state and state.end_handle:
+            state.end_handle.cancel()
+        if state and state.track:
+            self.track_event(guild_id, "TrackEndEvent", state.track, "cleanup")
+        return web.Response(status=204)
@@ -0,0 +1,170 @@
+"""API de Spotify falsa para pruebas sin conexión.
+
+Implementa lo que usa ``cogs.spotify.SpotifyAPI``: el token de
+credenciales de cliente (``/api/token``), ``/v1/tracks/{id}``,
+``/v1/albums/{id}`` y ``/v1/playlists/{id}`` con paginación por ``next``
+en bloques de ``page_size``. Las playlists y álbumes se crean con
+``add_playlist``/``add_album`` a partir de canciones inventadas.
+
+Uso como módulo:
+    server = FakeSpotify()
+    playlist_id = server.add_playlist("Mi lista", 120)
+    uri = await server.start()   # api_url = f"{uri}/v1", token_url = f"{uri}/api/token"
+    ...
+    await server.stop()
+"""
+import itertools
+import random
+import string
+from collections import Counter
+from typing import Optional
+
+from aiohttp import web
+
+
+class FakeSpotify:
+    def __init__(self, page_size: int = 100, client_id: str = "fake-id", client_secret: str = "fake-secret"):
+        self.page_size = page_size
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.tracks: dict[str, dict] = {}
+        self.albums: dict[str, dict] = {}
+        self.playlists: dict[str, dict] = {}
+        self.requests = Counter()
+        self.uri = ""
+        self._ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.router.add_post("/api/token", self.token)
+        self.app.router.add_get("/v1/tracks/{id}", self.get_track)
+        self.app.router.add_get("/v1/albums/{id}", self.get_album)
+        self.app.router.add_get("/v1/albums/{id}/tracks", self.get_album_tracks)
+        self.app.router.add_get("/v1/playlists/{id}", self.get_playlist)
+        self.app.router.add_get("/v1/playlists/{id}/tracks", self.get_playlist_tracks)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.uri = f"http://{host}:{port}"
+        return self.uri
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+    # Datos
+
+    def new_id(self) -> str:
+        rng = random.Random(next(self._ids))
+        return "".join(rng.choice(string.ascii_letters + string.digits) for _ in range(22))
+
+    def add_track(self) -> dict:
+        spotify_id = self.new_id()
+        rng = random.Random(spotify_id)
+        track = self.tracks[spotify_id] = {
+            "id": spotify_id,
+            "type": "track",
+            "is_local": False,
+            "name": f"Canción {len(self.tracks) + 1}",
+            "duration_ms": rng.randint(120_000, 300_000),
+            "artists": [{"name": f"Artista {rng.randrange(50)}"}],
+        }
+        return track
+
+    def add_playlist(self, name: str, size: int, tracks: Optional[list[dict]] = None) -> str:
+        spotify_id = self.new_id()
+        tracks = tracks if tracks is not None else [self.add_track() for _ in range(size)]
+        self.playlists[spotify_id] = {"name": name, "tracks": tracks}
+        return spotify_id
+
+    def add_album(self, name: str, size: int) -> str:
+        spotify_id = self.new_id()
+        self.albums[spotify_id] = {"name": name, "tracks": [self.add_track() for _ in range(size)]}
+        return spotify_id
+
+    def page(self, items: list, path: str, offset: int) -> dict:
+        chunk = items[offset:offset + self.page_size]
+        following = offset + self.page_size
+        return {
+            "items": chunk,
+            "total": len(items),
+            "offset": offset,
+            "limit": self.page_size,
+            "next": f"{self.uri}{path}?offset={following}&limit={self.page_size}" if following < len(items) else None,
+        }
+
+    # Rutas HTTP
+
+    def authorized(self, request: web.Request) -> bool:
+        return request.headers.get("Authorization") == "Bearer fake-token"
+
+    async def token(self, request: web.Request) -> web.Response:
+        self.requests["token"] += 1
+        auth = request.headers.get("Authorization", "")
+        data = await request.post()
+        if not auth.startswith("Basic ") or data.get("grant_type") != "client_credentials":
+            return web.json_response({"error": "invalid_client"}, status=400)
+        return web.json_response({"access_token": "fake-token", "token_type": "Bearer", "expires_in": 3600})
+
+    async def get_track(self, request: web.Request) -> web.Response:
+        self.requests["track"] += 1
+        if not self.authorized(request):
+            return web.json_response({"error": {"status": 401}}, status=401)
+        track = self.tracks.get(request.match_info["id"])
+        return web.json_response(track) if track else web.json_response({"error": {"status": 404}}, status=404)
+
+    async def get_album(self, request: web.Request) -> web.Response:
+        self.requests["album"] += 1
+        if not self.authorized(request):
+            return web.json_response({"error": {"status": 401}}, status=401)
+        spotify_id = request.match_info["id"]
+        album = self.albums.get(spotify_id)
+        if not album:
+            return web.json_response({"error": {"status": 404}}, status=404)
+        return web.json_response({
+            "id": spotify_id,
+            "name": album["name"],
+            "tracks": self.page(album["tracks"], f"/v1/albums/{spotify_id}/tracks", 0),
+        })
+
+    async def get_album_tracks(self, request: web.Request) -> web.Response:
+        self.requests["album_tracks"] += 1
+        if not self.authorized(request):
+            return web.json_response({"error": {"status": 401}}, status=401)
+        spotify_id = request.match_info["id"]
+        album = self.albums.get(spotify_id)
+        if not album:
+            return web.json_response({"error": {"status": 404}}, status=404)
+        offset = int(request.query.get("offset", "0"))
+        return web.json_response(self.page(album["tracks"], f"/v1/albums/{spotify_id}/tracks", offset))
+
+    async def get_playlist(self, request: web.Request) -> web.Response:
+        self.requests["playlist"] += 1
+        if not self.authorized(request):
+            return web.json_response({"error": {"status": 401}}, status=401)
+        spotify_id = request.match_info["id"]
+        playlist = self.playlists.get(spotify_id)
+        if not playlist:
+            return web.json_response({"error": {"status": 404}}, status=404)
+        items = [{"track": track} for track in playlist["tracks"]]
+        return web.json_response({
+            "id": spotify_id,
+            "name": playlist["name"],
+            "tracks": self.page(items, f"/v1/playlists/{spotify_id}/tracks", 0),
+        })
+
+    async def get_playlist_tracks(self, request: web.Request) -> web.Response:
+        self.requests["playlist_tracks"] += 1
+        if not self.authorized(request):
+            return web.json_response({"error": {"status": 401}}, status=401)
+        spotify_id = request.match_info["id"]
+        playlist = self.playlists.get(spotify_id)
+        if not playlist:
+            return web.json_response({"error": {"status": 404}}, status=404)
+        items = [{"track": track} for track in playlist["tracks"]]
+        offset = int(request.query.get("offset", "0"))
+        return web.json_response(self.page(items, f"/v1/playlists/{spotify_id}/tracks", offset))
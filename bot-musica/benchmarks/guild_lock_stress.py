@@ -0,0 +1,219 @@
+"""Prueba de estrés de la serialización por servidor.
+
+Carga ``cogs.music.Music`` tal cual sobre el bot y el Lavalink falsos de
+``music_load_bench.py`` y ``fake_lavalink.py`` (canciones cortas con
+eventos de inicio/fin por websocket), lanza ráfagas de
+``play`` y ``skip`` por servidor mientras las canciones terminan solas, y
+comprueba las invariantes de la cola con GuildLocks y sin ellos:
+
+- ninguna canción suena dos veces ni se pierde;
+- la cola nunca queda atascada (canciones pendientes sin nada sonando);
+- ninguna canción se corta a mitad sin que nadie haya pedido saltarla;
+- nunca hay dos actualizaciones del reproductor en curso a la vez en el
+  mismo servidor.
+
+Necesita las dependencias del bot (discord.py, wavelink, aiohttp).
+
+Uso (desde bot-musica/):
+    python benchmarks/guild_lock_stress.py [servidores] [comandos_por_servidor]
+"""
+import asyncio
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import wavelink
+
+from fake_lavalink import FakeLavalink
+from music_load_bench import FakeBot, FakeContext, FakeGuild
+
+# Canciones cortas (ms) y actualizaciones frecuentes para que haya muchos fines y precargas
+TRACK_LENGTH = (300, 1200)
+UPDATE_INTERVAL = 0.1
+# Una canción sustituida sin skip con más de esto por sonar se cortó (el margen cubre
+# las peticiones que se cruzan con el fin natural)
+CUT_MARGIN_MS = 1000
+# Sin avances durante este tiempo con la cola llena, la reproducción se atascó
+STUCK_AFTER = 5.0
+
+
+class RecordingLavalink(FakeLavalink):
+    """El Lavalink falso anotando por servidor qué suena, qué se corta y qué peticiones se solapan"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Títulos que empezaron a sonar, por servidor (``started`` es la hora de arranque)
+        self.played = defaultdict(list)
+        self.cut = Counter()
+        self.overlaps = Counter()
+        self.in_flight = Counter()
+        # Skips en curso que aún no sustituyeron ninguna canción (una sustitución cada uno)
+        self.pending_skips = defaultdict(list)
+
+    def track_event(self, guild_id: str, kind: str, track: dict, reason: str = None) -> None:
+        if kind == "TrackStartEvent":
+            self.played[guild_id].append(track["info"]["title"])
+        super().track_event(guild_id, kind, track, reason)
+
+    async def update_player(self, request):
+        guild_id = request.match_info["guild"]
+        state = self.players.get(guild_id)
+        old = state.track if state else None
+        remaining = old["info"]["length"] - state.current_position() if old else 0
+        self.in_flight[guild_id] += 1
+        if self.in_flight[guild_id] > 1:
+            self.overlaps[guild_id] += 1
+        try:
+            return await super().update_player(request)
+        finally:
+            self.in_flight[guild_id] -= 1
+            state = self.players.get(guild_id)
+            if old and (not state or state.track is not old) and remaining > CUT_MARGIN_MS:
+                if self.pending_skips[guild_id]:
+                    self.pending_skips[guild_id].pop(0)
+                else:
+                    self.cut[guild_id] += 1
+
+
+class NullLocks:
+    """Sustituto de GuildLocks que no serializa nada"""
+
+    def __call__(self, guild_id: int):
+        return contextlib.nullcontext()
+
+    def __len__(self) -> int:
+        return 0
+
+    def discard(self, guild_id: int) -> None:
+        pass
+
+
+async def skip(cog, ctx, server: RecordingLavalink):
+    pending = server.pending_skips[str(ctx.guild.id)]
+    token = object()
+    pending.append(token)
+    try:
+        await cog.skip_.callback(cog, ctx)
+    finally:
+        # Si no llegó a sustituir nada, su permiso caduca
+        if token in pending:
+            pending.remove(token)
+
+
+async def close_nodes() -> None:
+    """Cierra los nodos, los saca del Pool y cierra su sesión HTTP (Node.close no lo hace)"""
+    for node in list(wavelink.Pool.nodes.values()):
+        await node.close(eject=True)
+        await node._session.close()
+
+
+async def drive_guild(cog, server: RecordingLavalink, guild: FakeGuild, commands: int, rng: random.Random) -> list:
+    ctx = FakeContext(guild)
+    requested = [f"g{guild.id}-0 (1)"]
+    # La primera canción conecta al canal; el resto llega en ráfagas
+    await cog.play_.callback(cog, ctx, search=f"g{guild.id}-0")
+    tasks = []
+    for index in range(1, commands):
+        if rng.random() < 0.7:
+            requested.append(f"g{guild.id}-{index} (1)")
+            tasks.append(asyncio.create_task(cog.play_.callback(cog, ctx, search=f"g{guild.id}-{index}")))
+        else:
+            tasks.append(asyncio.create_task(skip(cog, ctx, server)))
+        # Ráfagas: a veces varios comandos llegan en la misma vuelta del bucle
+        if rng.random() < 0.5:
+            await asyncio.sleep(rng.uniform(0, 0.05))
+    await asyncio.gather(*tasks)
+
+    # Dejar que suene lo que queda; si nada avanza con la cola llena, se atascó
+    last_progress, started = time.monotonic(), len(server.played[str(guild.id)])
+    while cog.has_next(guild.id) or (guild.voice_client and guild.voice_client.current):
+        await asyncio.sleep(0.1)
+        if len(server.played[str(guild.id)]) != started:
+            last_progress, started = time.monotonic(), len(server.played[str(guild.id)])
+        elif time.monotonic() - last_progress > STUCK_AFTER:
+            break
+    return requested
+
+
+async def run(use_locks: bool, guilds: int, commands: int, seed: int) -> Counter:
+    server = RecordingLavalink(track_length=TRACK_LENGTH, update_interval=UPDATE_INTERVAL)
+    uri = await server.start()
+    os.environ["LAVALINK_NODES"] = uri
+    os.environ["LAVALINK_PASSWORD"] = server.password
+    state_dir = tempfile.TemporaryDirectory()
+    os.environ["MUSIC_STATE_DB"] = os.path.join(state_dir.name, "music_state.db")
+
+    from cogs.music import Music
+
+    bot = FakeBot()
+    for guild_id in range(1, guilds + 1):
+        bot.guilds[guild_id] = FakeGuild(bot, guild_id)
+
+    with redirect_stdout(io.StringIO()):
+        cog = Music(bot)
+        if not use_locks:
+            cog.guild_locks = NullLocks()
+        while not cog.node_balancer.available(wavelink.Pool.nodes.values()):
+            await asyncio.sleep(0.05)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            drive_guild(cog, server, guild, commands, random.Random(seed + guild.id))
+            for guild in bot.guilds.values()
+        ))
+        elapsed = time.perf_counter() - start
+
+        totals = Counter()
+        for guild, requested in zip(bot.guilds.values(), results):
+            key = str(guild.id)
+            played = Counter(server.played[key])
+            queued = {getattr(entry, "title", None) for entry in cog.get_queue(guild.id)}
+            totals["requested"] += len(requested)
+            totals["played"] += len(server.played[key])
+            totals["duplicated"] += sum(count - 1 for count in played.values() if count > 1)
+            totals["stuck"] += len(queued)
+            totals["lost"] += sum(1 for title in requested if title not in played and title not in queued)
+            totals["cut"] += server.cut[key]
+            totals["overlaps"] += server.overlaps[key]
+        totals["elapsed_ms"] = elapsed * 1000
+
+        # Cerrar todo antes de que termine el bucle: reproductores, cog, nodos y sus sesiones
+        for guild in bot.guilds.values():
+            if guild.voice_client:
+                await cog.stop_.callback(cog, FakeContext(guild))
+        await cog.cog_unload()
+        await close_nodes()
+        await server.stop()
+    state_dir.cleanup()
+    return totals
+
+
+def main():
+    guilds = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    commands = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    print(f"{guilds} servidores x {commands} comandos (play/skip) + fines de canción\n")
+    print(f"{'modo':<12}{'pedidas':>9}{'sonaron':>9}{'dobles':>8}{'perdidas':>10}{'atascadas':>11}{'cortadas':>10}{'solapes':>9}{'tiempo':>11}")
+    failed = False
+    for label, use_locks in (("sin lock", False), ("GuildLocks", True)):
+        totals = asyncio.run(run(use_locks, guilds, commands, seed=1234))
+        print(f"{label:<12}{totals['requested']:>9}{totals['played']:>9}{totals['duplicated']:>8}"
+              f"{totals['lost']:>10}{totals['stuck']:>11}{totals['cut']:>10}{totals['overlaps']:>9}{totals['elapsed_ms']:>9.0f}ms")
+        if use_locks and (totals["duplicated"] or totals["lost"] or totals["stuck"] or totals["cut"] or totals["overlaps"]):
+            failed = True
+    if failed:
+        print("\nERROR: con GuildLocks se rompió alguna invariante")
+        sys.exit(1)
+    print("\nCon GuildLocks no hay canciones dobles, perdidas, atascadas ni cortadas, ni peticiones solapadas.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""Prueba de carga del cog de música sin Discord ni Lavalink reales.
+
+Levanta un Lavalink falso (``fake_lavalink.py``: HTTP + websocket que emite
+los eventos de inicio y fin de canción), crea un bot mínimo con servidores,
+canales de voz y canales de texto simulados y carga ``cogs.music.Music``
+tal cual. Cada servidor lanza comandos play/skip/queue con pausas
+aleatorias mientras las canciones terminan solas, y al final se informa:
+
+- comandos por segundo;
+- latencia p50/p99/máx por comando (desde la llamada hasta que termina);
+- mensajes enviados y editados en Discord, peticiones y eventos de Lavalink;
+- memoria asignada (tracemalloc) y RSS máximo del proceso.
+
+Necesita las dependencias del bot (discord.py, wavelink, aiohttp).
+
+Uso (desde bot-musica/):
+    python benchmarks/music_load_bench.py [servidores] [comandos_por_servidor]
+"""
+import asyncio
+import io
+import itertools
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import wavelink
+
+from fake_lavalink import FakeLavalink
+
+# Mezcla de comandos y pausa entre comandos de un mismo servidor (s)
+COMMAND_WEIGHTS = {"play": 6, "skip": 2, "queue": 2}
+THINK_TIME = (0.05, 0.4)
+# Canciones distintas que se buscan; al repetirse entra en juego la caché de búsquedas
+SONG_POOL = 300
+
+_ids = itertools.count(1_000_000)
+
+
+class FakeMessage:
+    def __init__(self, channel: "FakeTextChannel"):
+        self.id = next(_ids)
+        self.channel = channel
+
+    async def edit(self, **kwargs):
+        self.channel.edits += 1
+        return self
+
+
+class FakeTextChannel:
+    def __init__(self, guild: "FakeGuild"):
+        self.id = next(_ids)
+        self.guild = guild
+        self.sends = 0
+        self.edits = 0
+
+    async def send(self, content=None, **kwargs):
+        self.sends += 1
+        return FakeMessage(self)
+
+
+class FakeMember:
+    def __init__(self, bot: bool = False):
+        self.id = next(_ids)
+        self.bot = bot
+        self.voice = None
+
+
+class FakeVoiceChannel:
+    def __init__(self, guild: "FakeGuild"):
+        self.id = next(_ids)
+        self.guild = guild
+        self.name = f"voz-{guild.id}"
+        self.members = []
+
+    async def connect(self, *, cls, timeout: float = 10.0, reconnect: bool = True, self_deaf: bool = False):
+        # Igual que discord.VoiceChannel.connect: crear el protocolo y conectarlo
+        player = cls(self.guild.bot, self)
+        self.guild.voice_client = player
+        try:
+            await player.connect(timeout=timeout, reconnect=reconnect, self_deaf=self_deaf)
+        except Exception:
+            self.guild.voice_client = None
+            raise
+        return player
+
+
+class FakeGuild:
+    def __init__(self, bot: "FakeBot", guild_id: int):
+        self.bot = bot
+        self.id = guild_id
+        self.name = f"Servidor {guild_id}"
+        self.voice_client = None
+        self.voice_channel = FakeVoiceChannel(self)
+        self.text_channel = FakeTextChannel(self)
+        self.member = FakeMember()
+        self.member.voice = type("VoiceState", (), {"channel": self.voice_channel})()
+        self.voice_channel.members.append(self.member)
+
+    async def change_voice_state(self, *, channel, self_mute: bool = False, self_deaf: bool = False):
+        """Simula la respuesta del gateway: VOICE_STATE_UPDATE y VOICE_SERVER_UPDATE"""
+        player = self.voice_client
+        if channel is None:
+            self.voice_client = None
+            return
+        if player is None:
+            return
+        await player.on_voice_state_update({"channel_id": channel.id, "session_id": f"voice-{self.id}"})
+        await player.on_voice_server_update({"token": "token", "endpoint": "fake.discord.media", "guild_id": self.id})
+
+
+class FakeBot:
+    """Lo justo de commands.Bot que usan el cog de música y wavelink"""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.user = FakeMember(bot=True)
+        self.guilds: dict[int, FakeGuild] = {}
+        self.listeners = defaultdict(list)
+        self.dispatched = Counter()
+
+    def add_listener(self, func, name: str):
+        self.listeners[name].append(func)
+
+    def dispatch(self, event: str, *args):
+        self.dispatched[event] += 1
+        for listener in self.listeners.get(f"on_{event}", ()):
+            self.loop.create_task(listener(*args))
+
+    async def wait_until_ready(self):
+        return
+
+    def is_closed(self) -> bool:
+        return False
+
+    def get_guild(self, guild_id: int):
+        return self.guilds.get(guild_id)
+
+    def get_channel(self, channel_id: int):
+        for guild in self.guilds.values():
+            if guild.voice_channel.id == channel_id:
+                return guild.voice_channel
+            if guild.text_channel.id == channel_id:
+                return guild.text_channel
+        return None
+
+
+class FakeContext:
+    def __init__(self, guild: FakeGuild):
+        self.guild = guild
+        self.author = guild.member
+        self.channel = guild.text_channel
+        self.interaction = None
+
+    @property
+    def voice_client(self):
+        return self.guild.voice_client
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def drive_guild(cog, guild: FakeGuild, commands_per_guild: int, rng: random.Random, latencies: dict):
+    ctx = FakeContext(guild)
+    names = list(COMMAND_WEIGHTS)
+    weights = list(COMMAND_WEIGHTS.values())
+    for _ in range(commands_per_guild):
+        name = rng.choices(names, weights)[0] if guild.voice_client else "play"
+        start = time.perf_counter()
+        try:
+            if name == "play":
+                await cog.play_.callback(cog, ctx, search=f"canción {rng.randrange(SONG_POOL)}")
+            elif name == "skip":
+                await cog.skip_.callback(cog, ctx)
+            else:
+                await cog.queue_.callback(cog, ctx, page=1)
+        except Exception as e:
+            latencies["errores"].append(0)
+            print(f"[BENCH] Error en {name}: {e}", file=sys.stderr)
+        latencies[name].append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(rng.uniform(*THINK_TIME))
+
+
+async def run(guild_count: int, commands_per_guild: int):
+    server = FakeLavalink()
+    uri = await server.start()
+    os.environ["LAVALINK_NODES"] = uri
+    os.environ["LAVALINK_PASSWORD"] = server.password
+    state_dir = tempfile.TemporaryDirectory()
+    os.environ["MUSIC_STATE_DB"] = os.path.join(state_dir.name, "music_state.db")
+
+    from cogs.music import Music
+
+    # Errores en tareas de fondo (eventos, temporizadores): se cuentan en lugar de imprimirse
+    background_errors = Counter()
+
+    def on_error(loop, context):
+        exception = context.get("exception")
+        if not isinstance(exception, asyncio.CancelledError):
+            background_errors[repr(exception or context.get("message"))] += 1
+
+    asyncio.get_running_loop().set_exception_handler(on_error)
+
+    bot = FakeBot()
+    for guild_id in range(1, guild_count + 1):
+        bot.guilds[guild_id] = FakeGuild(bot, guild_id)
+
+    log = io.StringIO()
+    latencies = defaultdict(list)
+    tracemalloc.start()
+    with redirect_stdout(log):
+        cog = Music(bot)
+        while not wavelink.Pool.nodes or not cog.node_balancer.available(wavelink.Pool.nodes.values()):
+            await asyncio.sleep(0.05)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            drive_guild(cog, guild, commands_per_guild, random.Random(guild.id), latencies)
+            for guild in bot.guilds.values()
+        ))
+        elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # Desconectar y cerrar todo
+        for guild in bot.guilds.values():
+            if guild.voice_client:
+                await cog.stop_.callback(cog, FakeContext(guild))
+        await cog.cog_unload()
+        await asyncio.sleep(0.2)
+        await wavelink.Pool.close()
+        await server.stop()
+    state_dir.cleanup()
+
+    total = sum(len(values) for name, values in latencies.items() if name != "errores")
+    print(f"{guild_count} servidores x {commands_per_guild} comandos en {elapsed:.1f} s "
+          f"→ {total / elapsed:.1f} comandos/s\n")
+    print(f"{'comando':<10}{'n':>7}{'p50':>10}{'p99':>10}{'máx':>10}")
+    for name in COMMAND_WEIGHTS:
+        values = latencies[name]
+        if values:
+            print(f"{name:<10}{len(values):>7}{percentile(values, 0.5):>8.1f}ms"
+                  f"{percentile(values, 0.99):>8.1f}ms{max(values):>8.1f}ms")
+    if latencies["errores"]:
+        print(f"errores: {len(latencies['errores'])}")
+    for error, count in background_errors.most_common(5):
+        print(f"error en segundo plano ({count}): {error}")
+
+    sends = sum(guild.text_channel.sends for guild in bot.guilds.values())
+    edits = sum(guild.text_channel.edits for guild in bot.guilds.values())
+    starts = server.events["TrackStartEvent"]
+    print(f"\nDiscord: {sends} mensajes enviados, {edits} ediciones "
+          f"({(sends + edits) / max(1, total):.2f} por comando)")
+    print(f"Lavalink: {dict(server.requests)}")
+    print(f"Eventos: {dict(server.events)}")
+    print(f"Canciones iniciadas: {starts}")
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"\nMemoria (tracemalloc): actual {current / 1024 / 1024:.1f} MiB, pico {peak / 1024 / 1024:.1f} MiB; "
+          f"RSS máximo {rss / 1024:.1f} MiB")
+
+
+def main():
+    guild_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    commands_per_guild = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    asyncio.run(run(guild_count, commands_per_guild))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark de la carga de playlists grandes.
+
+Compara la carga anterior (toda la playlist entra en la cola antes de
+responder) con la carga por bloques: la primera canción suena enseguida,
+la respuesta sale sin esperar y el resto entra en la cola en segundo plano
+hasta PLAYLIST_EAGER_LIMIT; lo demás se pagina a medida que la cola avanza.
+
+Mide el tiempo hasta el primer audio, el tiempo hasta la respuesta, el
+bloqueo más largo del bucle de eventos y la memoria asignada.
+
+Uso (desde bot-musica/):
+    python benchmarks/playlist_ingest_bench.py [canciones]
+"""
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs.music_queue import MusicQueue, PendingTracks
+
+EAGER_LIMIT = 500
+CHUNK = 100
+# Latencia simulada de player.play y msg.edit contra Lavalink/Discord
+PLAY_LATENCY = 0.02
+EDIT_LATENCY = 0.05
+
+
+class FakeTrack:
+    def __init__(self, index: int):
+        self.title = f"Canción {index}"
+        self.author = f"Artista {index % 300}"
+        self.uri = f"https://www.youtube.com/watch?v={index:011d}"
+        self.length = 180_000 + index % 60_000
+        self.encoded = "Q" * 300
+        self.raw_data = {"info": {"title": self.title, "uri": self.uri}, "pluginInfo": {}}
+
+
+async def loop_lag_monitor(samples: list, stop: asyncio.Event):
+    """Registra cuánto se retrasa el bucle de eventos respecto a un tick de 1 ms"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        samples.append(time.perf_counter() - start - 0.001)
+
+
+async def old_strategy(tracks: list, t0: float) -> dict:
+    queue = MusicQueue()
+    await asyncio.sleep(PLAY_LATENCY)
+    first_audio = time.perf_counter() - t0
+    for track in tracks[1:]:
+        queue.put(track)
+    await asyncio.sleep(EDIT_LATENCY)
+    reply = time.perf_counter() - t0
+    return {"first_audio": first_audio, "reply": reply, "queued": len(queue), "pending": 0}
+
+
+async def streaming_strategy(tracks: list, t0: float) -> dict:
+    queue = MusicQueue()
+    pending = PendingTracks()
+
+    async def ingest():
+        while pending and len(queue) < EAGER_LIMIT:
+            queue.extend(pending.take(min(CHUNK, EAGER_LIMIT - len(queue))))
+            await asyncio.sleep(0)
+
+    await asyncio.sleep(PLAY_LATENCY)
+    first_audio = time.perf_counter() - t0
+    pending.extend(tracks[1:])
+    task = asyncio.create_task(ingest())
+    await asyncio.sleep(EDIT_LATENCY)
+    reply = time.perf_counter() - t0
+    await task
+    return {"first_audio": first_audio, "reply": reply, "queued": len(queue), "pending": len(pending)}
+
+
+async def run(name: str, strategy, count: int):
+    tracks = [FakeTrack(i) for i in range(count)]
+    lag: list[float] = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(loop_lag_monitor(lag, stop))
+    await asyncio.sleep(0.01)
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = await strategy(tracks, t0)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stop.set()
+    await monitor
+    print(
+        f"{name:<12} primer audio: {result['first_audio'] * 1000:7.1f} ms  respuesta: {result['reply'] * 1000:7.1f} ms  "
+        f"bloqueo máx: {max(lag) * 1000:6.2f} ms  memoria pico: {peak / 1024:8.1f} KiB  "
+        f"en cola: {result['queued']}  pendientes: {result['pending']}"
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    print(f"Playlist de {count} canciones")
+    asyncio.run(run("completa", old_strategy, count))
+    asyncio.run(run("por bloques", streaming_strategy, count))
+
+
+if __name__ == "__main__":
+    main()
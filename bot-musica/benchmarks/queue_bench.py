@@ -0,0 +1,67 @@
+"""Microbenchmark de la cola de reproducción.
+
+Compara la lista plana con ``pop(0)`` que usaba el cog con ``MusicQueue``
+encolando y consumiendo una playlist de 10.000 canciones.
+
+Uso (desde bot-musica/):
+    python benchmarks/queue_bench.py [cantidad]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs.music_queue import MusicQueue
+
+
+class FakeTrack:
+    __slots__ = ("title", "length")
+
+    def __init__(self, index: int):
+        self.title = f"Canción {index}"
+        self.length = 180_000 + index % 60_000
+
+
+def bench_list(tracks: list) -> tuple[float, float]:
+    start = time.perf_counter()
+    queue = []
+    for track in tracks:
+        queue.append(track)
+    enqueue = time.perf_counter() - start
+
+    start = time.perf_counter()
+    while queue:
+        queue.pop(0)
+    drain = time.perf_counter() - start
+    return enqueue, drain
+
+
+def bench_music_queue(tracks: list) -> tuple[float, float]:
+    start = time.perf_counter()
+    queue = MusicQueue()
+    queue.extend(tracks)
+    enqueue = time.perf_counter() - start
+
+    start = time.perf_counter()
+    while queue:
+        queue.get()
+    drain = time.perf_counter() - start
+    return enqueue, drain
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    tracks = [FakeTrack(i) for i in range(count)]
+
+    print(f"Canciones: {count}")
+    for name, bench in (("list + pop(0)", bench_list), ("MusicQueue", bench_music_queue)):
+        enqueue, drain = bench(tracks)
+        print(
+            f"{name:<15} encolar: {enqueue * 1000:8.2f} ms ({count / enqueue:>12,.0f} canciones/s)  "
+            f"consumir: {drain * 1000:8.2f} ms ({count / drain:>12,.0f} canciones/s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
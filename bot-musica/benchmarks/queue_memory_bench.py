@@ -0,0 +1,119 @@
+"""Benchmark de memoria de las colas de reproducción.
+
+Compara la cola anterior (lista de ``wavelink.Playable``) con la actual
+(``MusicQueue`` de ``QueuedTrack``) para 100 servidores con 2.000 canciones
+cada uno. Si wavelink está instalado se usan Playable reales; si no, un
+sustituto con los mismos atributos que Playable en wavelink 3.
+
+Uso (desde bot-musica/):
+    python benchmarks/queue_memory_bench.py [servidores] [canciones]
+"""
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs.music_queue import MusicQueue
+from cogs.queued_track import QueuedTrack
+
+try:
+    from wavelink import Playable
+except ImportError:
+    class Playable:
+        """Sustituto con la misma forma que wavelink.Playable (sin __slots__, guarda el payload)"""
+
+        def __init__(self, data: dict):
+            info = data["info"]
+            self._encoded = data["encoded"]
+            self._identifier = info["identifier"]
+            self._is_seekable = info["isSeekable"]
+            self._author = info["author"]
+            self._length = info["length"]
+            self._is_stream = info["isStream"]
+            self._position = info["position"]
+            self._title = info["title"]
+            self._uri = info.get("uri")
+            self._artwork = info.get("artworkUrl")
+            self._isrc = info.get("isrc")
+            self._source = info["sourceName"]
+            plugin = data.get("pluginInfo", {})
+            self._album = {"name": plugin.get("albumName"), "url": plugin.get("albumUrl")}
+            self._artist = {"url": plugin.get("artistUrl"), "artwork": plugin.get("artistArtworkUrl")}
+            self._preview_url = plugin.get("previewUrl")
+            self._is_preview = plugin.get("isPreview")
+            self._playlist = None
+            self._recommended = False
+            self._extras = dict(data.get("userData", {}))
+            self._raw_data = data
+
+        encoded = property(lambda self: self._encoded)
+        identifier = property(lambda self: self._identifier)
+        is_seekable = property(lambda self: self._is_seekable)
+        author = property(lambda self: self._author)
+        length = property(lambda self: self._length)
+        is_stream = property(lambda self: self._is_stream)
+        title = property(lambda self: self._title)
+        uri = property(lambda self: self._uri)
+        artwork = property(lambda self: self._artwork)
+        source = property(lambda self: self._source)
+
+
+def make_payload(guild: int, index: int) -> dict:
+    identifier = f"{guild:04d}{index:07d}"
+    return {
+        "encoded": f"QAAA{identifier}" + "x" * 280,
+        "info": {
+            "identifier": identifier,
+            "isSeekable": True,
+            "author": f"Artista {index % 500}",
+            "length": 180_000 + index % 60_000,
+            "isStream": False,
+            "position": 0,
+            "title": f"Canción {index} del servidor {guild}",
+            "uri": f"https://www.youtube.com/watch?v={identifier}",
+            "artworkUrl": f"https://i.ytimg.com/vi/{identifier}/maxresdefault.jpg",
+            "isrc": None,
+            "sourceName": "youtube",
+        },
+        "pluginInfo": {},
+        "userData": {},
+    }
+
+
+def measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    queues = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del queues
+    return current
+
+
+def main():
+    guilds = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    per_guild = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+
+    def build_playables():
+        return {g: [Playable(make_payload(g, i)) for i in range(per_guild)] for g in range(guilds)}
+
+    def build_compact():
+        return {
+            g: MusicQueue(QueuedTrack.from_playable(Playable(make_payload(g, i))) for i in range(per_guild))
+            for g in range(guilds)
+        }
+
+    print(f"{guilds} servidores x {per_guild} canciones")
+    before = measure(build_playables)
+    after = measure(build_compact)
+    total = guilds * per_guild
+    print(f"list[Playable]          : {before / 2**20:8.1f} MiB ({before / total:6.0f} B/canción)")
+    print(f"MusicQueue[QueuedTrack] : {after / 2**20:8.1f} MiB ({after / total:6.0f} B/canción)")
+    print(f"Ahorro                  : {(1 - after / before):8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Retraso del bucle de eventos con el cog de búsquedas, antes y después.
+
+Levanta un servidor local que imita MyAnimeList, el traductor de Google y
+Exchange Rate API con una latencia fija, y lanza
+varios usuarios a la vez con ``anime ... | 3`` y ``convert``. Mientras
+tanto, una tarea mide cuánto se retrasa un tick de 1 ms del bucle.
+
+- antes: el mismo cog con las peticiones bloqueantes de siempre
+  (``requests.get``, o ``urllib`` si requests no está instalado);
+- después: el cog tal cual, con su sesión aiohttp compartida.
+
+Un retraso alto significa que mientras tanto no se atienden eventos de
+música, heartbeats del gateway ni comandos de otros servidores.
+
+Uso (desde bot-musica/):
+    python benchmarks/search_loop_lag_bench.py [usuarios] [latencia_ms]
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web
+
+from cogs.search import Search
+
+try:
+    import requests
+
+    def blocking_get_json(url: str, params=None, headers=None):
+        return requests.get(url, params=params, headers=headers).json()
+except ImportError:
+    import urllib.parse
+    import urllib.request
+
+    def blocking_get_json(url: str, params=None, headers=None):
+        if params:
+            url = f"{url}{'&' if '?' in url else '?'}{urllib.parse.urlencode(params)}"
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {})) as response:
+            return json.loads(response.read())
+
+
+class BlockingSearch(Search):
+    """El cog con las peticiones como estaban antes: bloqueando el bucle de eventos"""
+
+    async def get_json(self, url: str, params=None, headers=None):
+        return blocking_get_json(url, params=params, headers=headers)
+
+
+class FakeAPIs:
+    """Las APIs falsas, en un hilo con su propio bucle: el modo bloqueante no las puede frenar"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests = 0
+        self.app = web.Application()
+        self.app.router.add_get("/mal/anime", self.search)
+        self.app.router.add_get("/mal/anime/{id}", self.details)
+        self.app.router.add_get("/translate", self.translate)
+        self.app.router.add_get("/rates/{base}", self.rates)
+        self.loop = asyncio.new_event_loop()
+        self._runner = None
+
+    def start(self) -> str:
+        async def serve() -> int:
+            self._runner = web.AppRunner(self.app)
+            await self._runner.setup()
+            site = web.TCPSite(self._runner, "127.0.0.1", 0)
+            await site.start()
+            return site._server.sockets[0].getsockname()[1]
+
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        port = asyncio.run_coroutine_threadsafe(serve(), self.loop).result()
+        return f"http://127.0.0.1:{port}"
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def respond(self, data) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        return web.json_response(data)
+
+    async def search(self, request: web.Request) -> web.Response:
+        limit = int(request.query.get("limit", "1"))
+        return await self.respond({"data": [{"node": {"id": i + 1}} for i in range(limit)]})
+
+    async def details(self, request: web.Request) -> web.Response:
+        anime_id = request.match_info["id"]
+        return await self.respond({
+            "id": int(anime_id), "title": f"Anime {anime_id}", "synopsis": "An example synopsis. " * 20,
+            "mean": 8.1, "genres": [{"name": "Action"}], "num_episodes": 12, "status": "finished_airing",
+            "main_picture": {"large": "https://example.com/a.jpg"}, "media_type": "tv",
+            "start_date": "2020-01-01", "end_date": "2020-03-31", "studios": [{"name": "Studio"}],
+        })
+
+    async def translate(self, request: web.Request) -> web.Response:
+        return await self.respond([[["Una sinopsis de ejemplo. ", request.query.get("q", "")]]])
+
+    async def rates(self, request: web.Request) -> web.Response:
+        return await self.respond({"base": request.match_info["base"], "rates": {"USD": 1.0, "EUR": 0.92, "CLP": 940.0}})
+
+
+class FakeContext:
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, *args, **kwargs):
+        self.sent += 1
+
+
+async def measure_lag(samples: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        samples.append((time.perf_counter() - start - 0.001) * 1000)
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+async def run_mode(cog_class, users: int) -> dict:
+    # Caché de traducciones vacía en cada modo
+    state_dir = tempfile.TemporaryDirectory()
+    os.environ["TRANSLATION_CACHE_DB"] = os.path.join(state_dir.name, "translation_cache.db")
+    cog = cog_class(bot=None)
+    await cog.cog_load()
+    lag, stop = [], asyncio.Event()
+    monitor = asyncio.create_task(measure_lag(lag, stop))
+    ctx = FakeContext()
+
+    async def user(index: int):
+        await cog.anime.callback(cog, ctx, mensaje=f"anime {index} | 3")
+        await cog.convert.callback(cog, ctx, mensaje="100 USD to EUR")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(users)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor
+    await cog.cog_unload()
+    state_dir.cleanup()
+    return {"elapsed": elapsed, "messages": ctx.sent, "lag": lag}
+
+
+async def run(users: int, latency_ms: float):
+    server = FakeAPIs(latency_ms / 1000)
+    uri = server.start()
+    Search.MAL_API_URL = f"{uri}/mal"
+    Search.TRANSLATE_URL = f"{uri}/translate"
+    Search.EXCHANGE_API_URL = f"{uri}/rates"
+
+    print(f"{users} usuarios a la vez (anime | 3 + convert), latencia de las APIs {latency_ms:.0f} ms\n")
+    print(f"{'modo':<10}{'tiempo':>10}{'mensajes':>10}{'lag p50':>10}{'lag p99':>10}{'lag máx':>10}")
+    for label, cog_class in (("antes", BlockingSearch), ("después", Search)):
+        result = await run_mode(cog_class, users)
+        lag = result["lag"]
+        print(f"{label:<10}{result['elapsed']:>9.2f}s{result['messages']:>10}"
+              f"{percentile(lag, 0.5):>8.1f}ms{percentile(lag, 0.99):>8.1f}ms{max(lag):>8.1f}ms")
+    server.stop()
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 150
+    asyncio.run(run(users, latency_ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Prueba del resolvedor de Spotify contra servicios falsos.
+
+Levanta una API de Spotify falsa (``fake_spotify.py``) y un Lavalink falso
+(``fake_lavalink.py``) y resuelve la misma playlist varias veces:
+
+1. con la caché en disco vacía: una búsqueda en Lavalink por canción;
+2. otra vez con la misma caché;
+3. con objetos nuevos sobre el mismo archivo (como tras reiniciar el bot);
+4. una playlist que comparte la mitad de las canciones con la primera;
+5. con una caché pequeña, para comprobar la expulsión de entradas.
+
+Para cada paso se informa del tiempo, las búsquedas hechas en Lavalink,
+las peticiones a Spotify y las canciones resueltas. Desde el paso 2 las
+búsquedas en Lavalink deben ser 0.
+
+Uso (desde bot-musica/):
+    python benchmarks/spotify_resolve_bench.py [canciones]
+"""
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import wavelink
+
+from cogs.search_cache import SearchCache
+from cogs.spotify import SpotifyAPI, SpotifyMatchCache, SpotifyResolver, SpotifyTrack
+from fake_lavalink import FakeLavalink
+from fake_spotify import FakeSpotify
+from music_load_bench import FakeBot
+
+
+def make_resolver(spotify: FakeSpotify, path: str, max_entries: int = 50_000) -> SpotifyResolver:
+    # Caché de búsquedas nueva en cada resolvedor: solo cuenta la caché en disco
+    search_cache = SearchCache()
+    return SpotifyResolver(
+        SpotifyAPI(spotify.client_id, spotify.client_secret,
+                   api_url=f"{spotify.uri}/v1", token_url=f"{spotify.uri}/api/token"),
+        SpotifyMatchCache(path, max_entries=max_entries),
+        lambda query: search_cache.fetch(query, wavelink.Playable.search),
+    )
+
+
+async def measure(label: str, resolver: SpotifyResolver, url: str, lavalink: FakeLavalink, spotify: FakeSpotify):
+    searches = lavalink.requests["loadtracks"]
+    api_requests = sum(spotify.requests.values())
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        results = await resolver.load(url)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34}{elapsed * 1000:>9.0f} ms{lavalink.requests['loadtracks'] - searches:>11}"
+          f"{sum(spotify.requests.values()) - api_requests:>10}{len(results.tracks):>11}")
+
+
+async def run(size: int):
+    lavalink = FakeLavalink(load_latency=0.05)
+    lavalink_uri = await lavalink.start()
+    spotify = FakeSpotify()
+    first = spotify.add_playlist("Primera", size)
+    tracks = spotify.playlists[first]["tracks"]
+    second = spotify.add_playlist("Segunda", size, tracks[size // 2:] + [spotify.add_track() for _ in range(size // 2)])
+    # El primer resultado de cada búsqueda dura lo mismo que la canción de Spotify (si no, no se acepta)
+    for data in spotify.tracks.values():
+        track = SpotifyTrack.from_api(data)
+        lavalink.lengths[track.query] = track.length
+    await spotify.start()
+
+    with redirect_stdout(io.StringIO()):
+        await wavelink.Pool.connect(nodes=[wavelink.Node(uri=lavalink_uri, password=lavalink.password)],
+                                    client=FakeBot())
+        while not all(node.status is wavelink.NodeStatus.CONNECTED for node in wavelink.Pool.nodes.values()):
+            await asyncio.sleep(0.05)
+
+    url = f"https://open.spotify.com/playlist/{first}"
+    with tempfile.TemporaryDirectory() as state_dir:
+        path = os.path.join(state_dir, "spotify_cache.db")
+        print(f"Playlist de {size} canciones (latencia de búsqueda 50 ms)\n")
+        print(f"{'paso':<34}{'tiempo':>12}{'búsquedas':>11}{'spotify':>10}{'resueltas':>11}")
+
+        resolver = make_resolver(spotify, path)
+        await measure("1. caché vacía", resolver, url, lavalink, spotify)
+        await measure("2. misma caché", resolver, url, lavalink, spotify)
+        await resolver.api.close()
+
+        resolver = make_resolver(spotify, path)
+        await measure("3. tras reiniciar", resolver, url, lavalink, spotify)
+        await measure("4. playlist a medias en caché", resolver,
+                      f"https://open.spotify.com/playlist/{second}", lavalink, spotify)
+        print(f"\nEntradas en disco: {len(resolver.cache)}; estadísticas: {resolver.stats()}")
+        await resolver.api.close()
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        resolver = make_resolver(spotify, os.path.join(state_dir, "spotify_cache.db"), max_entries=size // 2)
+        with redirect_stdout(io.StringIO()):
+            await resolver.load(url)
+        print(f"5. caché de {size // 2} entradas: {len(resolver.cache)} en disco, "
+              f"{resolver.cache.evicted} expulsadas")
+        await resolver.api.close()
+
+    await wavelink.Pool.close()
+    await lavalink.stop()
+    await spotify.stop()
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    asyncio.run(run(size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import asyncio
+
+
+class GuildLocks:
+    """Un asyncio.Lock por servidor.
+
+    Serializa los cambios de estado de un mismo servidor (play, skip,
+    fin de canción...) sin bloquear a los demás servidores.
+    """
+
+    def __init__(self):
+        self._locks: dict[int, asyncio.Lock] = {}
+
+    def __call__(self, guild_id: int) -> asyncio.Lock:
+        lock = self._locks.get(guild_id)
+        if lock is None:
+            lock = self._locks[guild_id] = asyncio.Lock()
+        return lock
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def discard(self, guild_id: int) -> None:
+        """Olvida el lock de un servidor si nadie lo está usando"""
+        lock = self._locks.get(guild_id)
+        if lock is not None and not lock.locked():
+            del self._locks[guild_id]
@@ -0,0 +1,93 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Awaitable, Callable, Optional
+
+
+class IdleTracker:
+    """Temporizadores de desconexión por inactividad con un único montículo.
+
+    En lugar de una tarea por servidor, todas las fechas límite viven en un
+    heap y una sola tarea duerme hasta la más próxima. Reprogramar o cancelar
+    un servidor solo actualiza el diccionario; las entradas viejas del heap
+    se descartan al salir (borrado perezoso).
+    """
+
+    def __init__(self, on_expire: Callable[[int, int], Awaitable[None]]):
+        # on_expire(guild_id, segundos) se llama cuando vence el plazo de un servidor
+        self.on_expire = on_expire
+        self._heap: list[tuple[float, int, int]] = []
+        # guild_id -> (fecha límite, secuencia, segundos programados)
+        self._deadlines: dict[int, tuple[float, int, int]] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self._deadlines
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def scheduled(self, guild_id: int) -> Optional[int]:
+        """Segundos con los que se programó la desconexión del servidor, o None"""
+        entry = self._deadlines.get(guild_id)
+        return entry[2] if entry else None
+
+    def schedule(self, guild_id: int, seconds: int) -> None:
+        """Programa la desconexión; si ya había una con el mismo plazo se mantiene la original"""
+        if self.scheduled(guild_id) == seconds:
+            return
+        deadline = time.monotonic() + seconds
+        seq = next(self._counter)
+        self._deadlines[guild_id] = (deadline, seq, seconds)
+        heapq.heappush(self._heap, (deadline, seq, guild_id))
+        if self._heap[0][1] == seq:
+            self._wakeup.set()
+
+    def cancel(self, guild_id: int) -> None:
+        self._deadlines.pop(guild_id, None)
+
+    def start(self) -> None:
+        if not self._task or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self._deadlines.clear()
+        self._heap.clear()
+
+    def _pop_expired(self, now: float) -> list[tuple[int, int]]:
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, guild_id = heapq.heappop(self._heap)
+            entry = self._deadlines.get(guild_id)
+            if entry and entry[1] == seq:
+                del self._deadlines[guild_id]
+                expired.append((guild_id, entry[2]))
+        # Compactar si se acumularon demasiadas entradas canceladas
+        if len(self._heap) > 64 and len(self._heap) > 4 * len(self._deadlines):
+            self._heap = [(d, s, g) for g, (d, s, _) in self._deadlines.items()]
+            heapq.heapify(self._heap)
+        return expired
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                self._wakeup.clear()
+                for guild_id, seconds in self._pop_expired(time.monotonic()):
+                    try:
+                        await self.on_expire(guild_id, seconds)
+                    except Exception as e:
+                        print(f"[IDLE] Error al desconectar por inactividad en {guild_id}: {e}")
+
+                timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            pass
@@ -5,55 +5,269 @@ import wavelink
 import os
 from typing import Optional
 import asyncio
+import re
+import time
+from collections import deque
 from datetime import timedelta, datetime
+from cogs.music_queue import MusicQueue, PendingTracks
+from cogs.queued_track import QueuedTrack
+from cogs.search_cache import SearchCache
+from cogs.node_pool import NodeBalancer, parse_node_list
+from cogs.idle_tracker import IdleTracker
+from cogs.queue_store import QueueStore
+from cogs.guild_locks import GuildLocks
+from cogs.now_playing import ChannelOutbox, NowPlayingPanels
+from cogs.startup import wait_for_lavalink
+from cogs.playback_history import PlaybackHistory
+from cogs.spotify import SpotifyAPI, SpotifyMatchCache, SpotifyResolver, parse_spotify_link
 
 class Music(commands.Cog):
+    # Intentos (con espera creciente) para encontrar un nodo sano al migrar un reproductor
+    MIGRATION_ATTEMPTS = 8
+    # Cada cuánto (s) se revisa el estado de los nodos y cuánto puede estar uno caído antes de
+    # mover sus reproductores (wavelink reintenta el websocket sin avisar mientras tanto)
+    NODE_HEALTH_INTERVAL = 2
+    NODE_FAILOVER_GRACE = float(os.environ.get("LAVALINK_FAILOVER_GRACE", "10"))
+    # Tope (s) para sondear y conectar un nodo añadido con nodeadd
+    NODE_ADD_TIMEOUT = 30
+    # Segundos de inactividad antes de desconectarse (solo en el canal / con usuarios)
+    IDLE_ALONE_TIMEOUT = 5 * 60
+    IDLE_TIMEOUT = 15 * 60
+    # Con cuánta antelación (ms) se resuelve la siguiente canción
+    PREFETCH_WINDOW_MS = 15_000
+    # Canciones de una playlist que se cargan de golpe en la cola; el resto se pagina
+    PLAYLIST_EAGER_LIMIT = int(os.environ.get("PLAYLIST_EAGER_LIMIT", "500"))
+    INGEST_CHUNK = 100
+    # Espera (s) para agrupar ediciones del panel y mínimo entre refrescos de progreso
+    # (0: el panel solo cambia con la canción o al pausar/reanudar)
+    NOW_PLAYING_DEBOUNCE = 1.5
+    NOW_PLAYING_PROGRESS_INTERVAL = float(os.environ.get("NOW_PLAYING_PROGRESS_INTERVAL", "0"))
+    # Modo lote de play: máximo de búsquedas por comando, cuántas a la vez y tamaño del archivo
+    BATCH_MAX_ENTRIES = 50
+    BATCH_CONCURRENCY = 5
+    BATCH_MAX_FILE_BYTES = 64 * 1024
+    BATCH_BULLET = re.compile(r"^(?:\d+[.)]|[-*•])\s+")
+
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.bot.loop.create_task(self.connect_nodes())
         self.queues = {}
+        # Un lock por servidor: serializa play/skip/fin de canción sin frenar a los demás servidores
+        self.guild_locks = GuildLocks()
+        # Caché de búsquedas compartida entre todos los servidores
+        self.search_cache = SearchCache(
+            ttl=float(os.environ.get("SEARCH_CACHE_TTL", "600")),
+            max_entries=int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", "512")),
+            max_tracks=int(os.environ.get("SEARCH_CACHE_MAX_TRACKS", "20000")),
+        )
+        # Enlaces de Spotify: se buscan en Lavalink y lo encontrado se guarda en disco
+        self.spotify = None
+        if os.environ.get("SPOTIFY_CLIENT_ID") and os.environ.get("SPOTIFY_CLIENT_SECRET"):
+            self.spotify = SpotifyResolver(
+                SpotifyAPI(
+                    os.environ["SPOTIFY_CLIENT_ID"],
+                    os.environ["SPOTIFY_CLIENT_SECRET"],
+                    api_url=os.environ.get("SPOTIFY_API_URL", "https://api.spotify.com/v1"),
+                    token_url=os.environ.get("SPOTIFY_TOKEN_URL", "https://accounts.spotify.com/api/token"),
+                    max_tracks=int(os.environ.get("SPOTIFY_MAX_TRACKS", "500")),
+                ),
+                SpotifyMatchCache(
+                    os.environ.get("SPOTIFY_CACHE_DB", "spotify_cache.db"),
+                    max_entries=int(os.environ.get("SPOTIFY_CACHE_MAX_ENTRIES", "50000")),
+                    max_age=float(os.environ.get("SPOTIFY_CACHE_MAX_AGE_DAYS", "30")) * 86400,
+                ),
+                lambda query: self.search_cache.fetch(query, wavelink.Playable.search),
+                concurrency=self.BATCH_CONCURRENCY,
+            )
+        # Últimas canciones de cada servidor para previous/replay, con tope global de memoria
+        self.history = PlaybackHistory(
+            per_guild=int(os.environ.get("MUSIC_HISTORY_SIZE", "50")),
+            max_total=int(os.environ.get("MUSIC_HISTORY_MAX_TOTAL", "10000")),
+        )
         # Registrar manualmente los eventos de wavelink
         bot.add_listener(self.on_wavelink_track_end, "on_wavelink_track_end")
         bot.add_listener(self.on_wavelink_track_start, "on_wavelink_track_start")
         bot.add_listener(self.on_wavelink_websocket_closed, "on_wavelink_websocket_closed")
         bot.add_listener(self.on_voice_state_update, "on_voice_state_update")
-        # Diccionario para controlar temporizadores de desconexión
-        self.disconnect_timers = {}
-        # Iniciar la tarea de verificación periódica
-        self.check_voice_state_task = self.bot.loop.create_task(self.check_voice_state_loop())
+        bot.add_listener(self.on_wavelink_player_update, "on_wavelink_player_update")
+        bot.add_listener(self.on_wavelink_node_closed, "on_wavelink_node_closed")
+        # Temporizadores de desconexión por inactividad (un solo heap para todos los servidores)
+        self.idle_tracker = IdleTracker(self.disconnect_idle)
+        self.idle_tracker.start()
+        # Reparto de reproductores entre nodos de Lavalink según su carga
+        self.node_balancer = NodeBalancer(history_size=int(os.environ.get("LAVALINK_STATS_HISTORY", "240")))
+        self.node_stats_task = None
+        self.node_ready = asyncio.Event()
+        # Última (canción, posición, pausa) conocida por servidor, para la migración entre nodos
+        self.playback_snapshots = {}
+        self.migrating = set()
+        # Desde cuándo (monotonic) está cada nodo sin conexión
+        self.node_down_since = {}
+        # Siguiente canción ya resuelta por servidor: (entrada de la cola, Playable)
+        self.prefetched = {}
+        # Silencio medido entre canciones (ms) para las métricas
+        self.track_end_times = {}
+        self.playback_gaps = deque(maxlen=200)
+        # Latencia (ms) desde que el usuario envía el comando hasta la primera respuesta
+        self.command_latency = {"prefix": deque(maxlen=500), "slash": deque(maxlen=500)}
+        # Invocaciones con prefijo que aún no han enviado su primera respuesta
+        self.awaiting_reply = set()
+        # Playlists grandes que se van cargando en la cola por bloques
+        self.pending_tracks = {}
+        self.ingest_tasks = {}
+        # Estado persistente para sobrevivir a reinicios (escritura diferida en SQLite)
+        self.queue_store = QueueStore(
+            os.environ.get("MUSIC_STATE_DB", "music_state.db"),
+            self.snapshot_guild,
+            self.snapshot_queue,
+            interval=float(os.environ.get("MUSIC_STATE_FLUSH_INTERVAL", "5")),
+        )
+        self.queue_store.start()
+        self.sessions_restored = False
+        # Un único panel de "Reproduciendo ahora" por servidor, editado en el sitio
+        self.outbox = ChannelOutbox(delay=self.NOW_PLAYING_DEBOUNCE)
+        self.now_playing = NowPlayingPanels(
+            self.outbox, self.render_now_playing, progress_interval=self.NOW_PLAYING_PROGRESS_INTERVAL
+        )
 
     async def connect_nodes(self):
-        """Conecta a los nodos de Lavalink"""
-        await self.bot.wait_until_ready()
+        """Conecta a los nodos de Lavalink en segundo plano.
+
+        No espera al gateway de Discord: cada nodo se sondea hasta que
+        responde y entonces se abre su websocket, reintentando si falla.
+        Las sesiones guardadas se restauran cuando además el bot está listo.
+        """
+        timeline = getattr(self.bot, "startup_timeline", None)
+        if timeline:
+            timeline.start("Nodos de Lavalink")
 
         lavalink_uri = os.environ.get("LAVALINK_URI", "http://127.0.0.1:2333")
         lavalink_password = os.environ.get("LAVALINK_PASSWORD", "youshallnotpass")
+        # LAVALINK_NODES permite varios nodos; si no está, se usa LAVALINK_URI
+        node_specs = parse_node_list(os.environ.get("LAVALINK_NODES", lavalink_uri), lavalink_password)
 
-        nodes = [
-            wavelink.Node(
-                uri=lavalink_uri,
-                password=lavalink_password,
-            )
-        ]
-        await wavelink.Pool.connect(nodes=nodes, client=self.bot, cache_capacity=100)
-        print("Conectado a los nodos de Lavalink")
-        
-        # Verificar la versión del servidor
+        for spec in node_specs:
+            self.bot.loop.create_task(self.connect_node(*spec))
+        if not self.node_stats_task:
+            self.node_stats_task = self.bot.loop.create_task(self.node_stats_loop())
+
+        # Con el primer nodo listo ya se puede reproducir; el resto sigue conectándose
+        await self.node_ready.wait()
+        if timeline:
+            timeline.end("Nodos de Lavalink")
+
+        if not self.sessions_restored:
+            self.sessions_restored = True
+            await self.bot.wait_until_ready()
+            await self.restore_sessions()
+
+    async def connect_node(self, identifier: str, uri: str, password: str):
+        """Espera a que un nodo responda y lo conecta, reintentando con espera creciente"""
+        started = time.perf_counter()
+        attempts = await wait_for_lavalink(uri, password)
+        print(f"🔗 Lavalink {identifier} ({uri}) listo tras {attempts} intento(s), {time.perf_counter() - started:.1f} s")
+
+        # Sin límite de reintentos: el websocket sigue intentándolo (con su propia espera creciente)
+        # dentro de esta tarea, sin bloquear al resto del bot
+        node = self.new_node(identifier, uri, password)
+        if not await self.open_node(node):
+            print(f"⚠️ No se pudo registrar el nodo {identifier} (¿contraseña incorrecta?)")
+            return
+        print(f"📊 Nodo {identifier} conectado en {time.perf_counter() - started:.1f} s")
+        self.node_ready.set()
+
+    @staticmethod
+    def new_node(identifier: str, uri: str, password: str) -> wavelink.Node:
+        # Sin el temporizador de inactividad de wavelink: de eso se encarga IdleTracker, y
+        # wavelink crea y cancela una tarea por canción que falla si se cancela antes de empezar
+        return wavelink.Node(identifier=identifier, uri=uri, password=password, inactive_player_timeout=None)
+
+    async def open_node(self, node: wavelink.Node) -> bool:
+        """Registra un nodo en el pool y espera a su "ready"; False si Lavalink lo rechaza"""
+        await wavelink.Pool.connect(nodes=[node], client=self.bot, cache_capacity=100)
+        if node.identifier not in wavelink.Pool.nodes:
+            return False
+        # El nodo queda listo al recibir el "ready" del websocket
+        while not self.node_balancer.is_connected(node):
+            await asyncio.sleep(0.1)
+        return True
+
+    async def node_stats_loop(self):
+        """Actualiza periódicamente la carga de cada nodo y rescata los reproductores de los caídos"""
+        interval = float(os.environ.get("LAVALINK_STATS_INTERVAL", "15"))
+        next_refresh = 0.0
         try:
-            node = wavelink.Pool.get_node()
-            if node:
-                print(f"🔗 Servidor Lavalink: {node.uri}")
-                print(f"📊 Estado del nodo: {'Conectado' if node.status else 'Desconectado'}")
-                # Intentar obtener información del servidor
-                if hasattr(node, 'version'):
-                    print(f"🏷️ Versión de Lavalink: {node.version}")
-        except Exception as e:
-            print(f"⚠️ No se pudo obtener información del servidor: {e}")
+            while not self.bot.is_closed():
+                if time.monotonic() >= next_refresh:
+                    await self.node_balancer.refresh(wavelink.Pool.nodes.values())
+                    next_refresh = time.monotonic() + interval
+                self.check_nodes()
+                await asyncio.sleep(self.NODE_HEALTH_INTERVAL)
+        except asyncio.CancelledError:
+            pass
+
+    def check_nodes(self):
+        """Mueve los reproductores de los nodos que llevan demasiado tiempo caídos.
+
+        Si Lavalink se cae, wavelink pasa el nodo a CONNECTING y reintenta el
+        websocket indefinidamente sin emitir on_wavelink_node_closed, así que
+        sus reproductores se quedarían mudos hasta que volviera. Un nodo que
+        sigue "conectado" pero no contesta a las estadísticas también cuenta
+        como caído.
+        """
+        now = time.monotonic()
+        for node in list(wavelink.Pool.nodes.values()):
+            if self.node_balancer.is_healthy(node):
+                self.node_down_since.pop(node.identifier, None)
+                continue
+            down_since = self.node_down_since.setdefault(node.identifier, now)
+            if now - down_since < self.NODE_FAILOVER_GRACE:
+                continue
+            stranded = [player for player in node.players.values()
+                        if player.guild and player.guild.id not in self.migrating]
+            if not stranded:
+                continue
+            print(f"[NODES] Nodo {node.identifier} sin conexión hace {now - down_since:.0f} s, "
+                  f"moviendo {len(stranded)} reproductores")
+            self.node_balancer.loads.pop(node.identifier, None)
+            for player in stranded:
+                self.bot.loop.create_task(self.migrate_player(player, exclude=node))
 
-    def get_queue(self, guild_id: int) -> list[wavelink.Playable]:
+    def metrics(self, history: int = 20) -> dict:
+        """Carga actual y reciente de los nodos para la ruta /metrics (se llama desde el hilo de Flask)"""
+        nodes = {}
+        for node in list(wavelink.Pool.nodes.values()):
+            latest = self.node_balancer.history.latest(node.identifier)
+            nodes[node.identifier] = {
+                "uri": node.uri,
+                "connected": self.node_balancer.is_connected(node),
+                "draining": node.identifier in self.node_balancer.draining,
+                "players": len(node.players),
+                "current": latest.as_dict() if latest else None,
+                "history": [load.as_dict() for load in self.node_balancer.history.recent(node.identifier, history)],
+            }
+        return {
+            "timestamp": time.time(),
+            "nodes": nodes,
+            "playback_gaps_ms": self.gap_stats(),
+            "search_cache": self.search_cache.stats(),
+            "spotify": self.spotify.stats() if self.spotify else None,
+            "history": self.history.stats(),
+        }
+
+    def select_node(self) -> Optional[wavelink.Node]:
+        """Devuelve el nodo con menos carga que acepta reproductores nuevos"""
+        return self.node_balancer.best_node(wavelink.Pool.nodes.values())
+
+    def create_player(self, client: discord.Client, channel: discord.abc.Connectable) -> wavelink.Player:
+        """Crea el reproductor en el nodo con menos carga (se usa como cls de connect)"""
+        node = self.select_node()
+        return wavelink.Player(client, channel, nodes=[node] if node else None)
+
+    def get_queue(self, guild_id: int) -> MusicQueue:
         """Obtiene la cola de reproducción del servidor"""
         if guild_id not in self.queues:
-            self.queues[guild_id] = []
+            self.queues[guild_id] = MusicQueue()
         return self.queues[guild_id]
 
     def format_time(self, milliseconds: int) -> str:
@@ -62,6 +276,41 @@ class Music(commands.Cog):
             return "N/A"
         return str(timedelta(milliseconds=milliseconds)).split('.')[0]
 
+    async def cog_before_invoke(self, ctx: commands.Context):
+        """Responde de inmediato a las interacciones y empieza a medir la latencia.
+
+        Los comandos son híbridos: prefijo y slash ejecutan el mismo código
+        con un Context nativo. En slash se difiere la respuesta antes de
+        nada para no pasar del límite de 3 s de Discord mientras Lavalink
+        busca, y ese aviso cuenta como primera respuesta. Con prefijo la
+        latencia la registra ``reply`` al enviar el primer mensaje.
+        """
+        if ctx.interaction:
+            if not ctx.interaction.response.is_done():
+                await ctx.defer()
+            self.record_latency(ctx)
+            return
+        self.awaiting_reply.add(ctx)
+
+    async def cog_after_invoke(self, ctx: commands.Context):
+        # Los comandos que terminan sin responder con reply no cuentan
+        self.awaiting_reply.discard(ctx)
+
+    def record_latency(self, ctx: commands.Context):
+        """Registra los ms desde que el usuario envió el comando hasta ahora"""
+        path = "slash" if ctx.interaction else "prefix"
+        # El snowflake del mensaje o la interacción marca cuándo lo envió el usuario
+        received_at = discord.utils.snowflake_time((ctx.interaction or ctx.message).id)
+        self.command_latency[path].append((discord.utils.utcnow() - received_at).total_seconds() * 1000)
+
+    async def reply(self, ctx: commands.Context, *args, **kwargs):
+        """Envía la respuesta de un comando de música; la primera de cada invocación mide la latencia"""
+        message = await ctx.send(*args, **kwargs)
+        if ctx in self.awaiting_reply:
+            self.awaiting_reply.discard(ctx)
+            self.record_latency(ctx)
+        return message
+
     async def on_wavelink_track_end(self, payload: wavelink.TrackEndEventPayload):
         """Evento que se dispara cuando termina una canción"""
         print(f"Evento on_wavelink_track_end disparado: {payload.reason}")
@@ -76,40 +325,62 @@ class Music(commands.Cog):
             print("El player no tiene guild asociado")
             return
 
-        # Solo reproducir la siguiente canción si la canción actual terminó naturalmente
-        # Usar comparaciones en minúsculas para evitar problemas de mayúsculas
-        reason_lower = payload.reason.lower() if payload.reason else ""
+        # Serializar con los comandos del mismo servidor (play, skip, stop...)
+        recover = False
+        async with self.guild_locks(player.guild.id):
+            # Solo reproducir la siguiente canción si la canción actual terminó naturalmente
+            # Usar comparaciones en minúsculas para evitar problemas de mayúsculas
+            reason_lower = payload.reason.lower() if payload.reason else ""
+            # El fin de una canción que ya no es la actual (tras un skip, o un play que llegó
+            # mientras el evento esperaba el lock) se ignora: ya suena otra. wavelink vacía
+            # player.current con cualquier fin que no sea "replaced", aunque llegue tarde, así
+            # que entonces cuenta la última canción que Lavalink dijo haber empezado
+            snapshot = self.playback_snapshots.get(player.guild.id)
+            latest = player.current or (snapshot[0] if snapshot else None)
+            if payload.track and latest and latest.encoded != payload.track.encoded:
+                print("Evento de fin de canción obsoleto, se ignora")
+                return
+            # Solo se mide el silencio si hay algo que poner a continuación
+            if reason_lower != "replaced" and self.has_next(player.guild.id):
+                self.track_end_times[player.guild.id] = time.perf_counter()
         
-        if reason_lower == "finished":
-            print("Canción terminada naturalmente")
-            await self.play_next(player)
-        elif reason_lower == "replaced":
-            print("Canción reemplazada (skip)")
-            # No hacemos nada, el skip ya se encarga de reproducir la siguiente
-            pass
-        elif reason_lower in ["stopped", "ended", "cleanup", "loading_failed"]:
-            print(f"Canción terminada por: {payload.reason}")
-            # Para casos como STOPPED, ENDED, etc. verificar si debemos reproducir la siguiente
-            if self.get_queue(player.guild.id):
+            if reason_lower == "finished":
+                print("Canción terminada naturalmente")
                 await self.play_next(player)
-        else:
-            print(f"Canción terminada por otra razón desconocida: {payload.reason}")
-            # Para otros casos desconocidos, intentar reproducir la siguiente
-            try:
-                await self.play_next(player)
-            except Exception as e:
-                print(f"Error al intentar reproducir siguiente canción: {e}")
-                # Si falla, intentar una reconexión si el canal aún existe
+            elif reason_lower == "replaced":
+                print("Canción reemplazada (skip)")
+                # No hacemos nada, el skip ya se encarga de reproducir la siguiente
+                pass
+            elif reason_lower in ["stopped", "ended", "cleanup", "loading_failed"]:
+                print(f"Canción terminada por: {payload.reason}")
+                # Para casos como STOPPED, ENDED, etc. verificar si debemos reproducir la siguiente
+                if self.get_queue(player.guild.id):
+                    await self.play_next(player)
+            else:
+                print(f"Canción terminada por otra razón desconocida: {payload.reason}")
+                # Para otros casos desconocidos, intentar reproducir la siguiente
                 try:
-                    if hasattr(player, 'text_channel') and player.text_channel:
-                        await player.text_channel.send("⚠️ Hubo un problema con el reproductor. Intentando recuperar...")
-                        queue = self.get_queue(player.guild.id)
-                        if queue and player.guild.voice_client:
-                            await player.guild.voice_client.disconnect()
-                            # No reproducimos aquí, solo notificamos para que el usuario inicie manualmente
-                            await player.text_channel.send("🔄 Por favor, usa el comando play nuevamente.")
-                except Exception as recovery_error:
-                    print(f"Error durante la recuperación: {recovery_error}")
+                    await self.play_next(player)
+                except Exception as e:
+                    print(f"Error al intentar reproducir siguiente canción: {e}")
+                    recover = True
+
+            # Si no empezó otra canción, el reproductor queda inactivo
+            self.update_idle_state(player, playing=player.current is not None and player.current is not payload.track)
+
+        if recover:
+            # Mover el reproductor a un nodo sano conservando la cola; fuera del lock,
+            # porque puede tener que esperar a que vuelva algún nodo
+            try:
+                if hasattr(player, 'text_channel') and player.text_channel:
+                    await player.text_channel.send("⚠️ Hubo un problema con el reproductor. Intentando recuperar...")
+                player = await self.migrate_player(player)
+                if player:
+                    async with self.guild_locks(player.guild.id):
+                        if not player.current:
+                            await self.play_next(player)
+            except Exception as recovery_error:
+                print(f"Error durante la recuperación: {recovery_error}")
 
     async def on_wavelink_track_start(self, payload: wavelink.TrackStartEventPayload):
         """Evento que se dispara cuando empieza una canción"""
@@ -117,52 +388,405 @@ class Music(commands.Cog):
         player = payload.player
         if player and hasattr(player, 'text_channel') and player.text_channel:
             print(f"[TRACK START] Player conectado a canal de voz: {player.channel.name if player.channel else 'Desconocido'}")
+        if player:
+            self.update_idle_state(player, playing=True)
+            self.playback_snapshots[player.guild.id] = (payload.track, 0, player.paused)
+            self.queue_store.mark_dirty(player.guild.id)
+            self.history.push(player.guild.id, payload.track)
+            self.now_playing.update(player.guild.id, getattr(player, 'text_channel', None))
+            ended_at = self.track_end_times.pop(player.guild.id, None)
+            if ended_at is not None:
+                gap = (time.perf_counter() - ended_at) * 1000
+                self.playback_gaps.append(gap)
+                print(f"[TRACK START] Silencio entre canciones: {gap:.0f} ms")
 
     async def on_wavelink_websocket_closed(self, payload: wavelink.WebsocketClosedEventPayload):
         """Evento que se dispara cuando se cierra la conexión WebSocket con Lavalink"""
         print(f"[WEBSOCKET] Conexión cerrada - Código: {payload.code}, Razón: {payload.reason}, Por servidor remoto: {payload.by_remote}")
         
+        # Es el websocket de voz con Discord: el nodo sigue sano y discord.py/wavelink se encargan
+        # de reconectar la voz (4006, 4015...); los nodos caídos los rescata check_nodes
         if payload.player and hasattr(payload.player, 'text_channel') and payload.player.text_channel:
             try:
                 await payload.player.text_channel.send(f"⚠️ Conexión con el servidor de música perdida (Código: {payload.code})")
             except:
                 pass
 
+    async def on_wavelink_player_update(self, payload: wavelink.PlayerUpdateEventPayload):
+        """Guarda la última posición conocida para poder reanudar si el nodo cae"""
+        player = payload.player
+        if not player or not player.guild or not player.current:
+            return
+        track = player.current
+        # wavelink cambia player.current antes de que Lavalink empiece la nueva canción:
+        # hasta su TrackStart, la posición recibida es aún la de la anterior
+        snapshot = self.playback_snapshots.get(player.guild.id)
+        if snapshot and snapshot[0].encoded != track.encoded:
+            return
+        self.playback_snapshots[player.guild.id] = (track, payload.position, player.paused)
+        # Solo avanza la posición: se actualiza esa columna sin volver a guardar la cola
+        self.queue_store.mark_position(player.guild.id, payload.position)
+        self.now_playing.progress(player.guild.id, getattr(player, 'text_channel', None))
+
+        # Cerca del final: dejar resuelta la siguiente canción; empieza con el fin "finished"
+        # de esta, así la actual suena entera y play_next no tiene que buscar nada
+        if player.paused or track.is_stream or not track.length:
+            return
+        if track.length - payload.position <= self.PREFETCH_WINDOW_MS and self.has_next(player.guild.id):
+            await self.prefetch_next(player)
+
+    async def on_wavelink_node_closed(self, node: wavelink.Node, disconnected: list[wavelink.Player]):
+        """Evento que se dispara cuando se pierde la conexión con un nodo de Lavalink"""
+        print(f"[NODES] Nodo {node.identifier} desconectado, {len(disconnected)} reproductores afectados")
+        self.node_balancer.loads.pop(node.identifier, None)
+        await asyncio.gather(*(self.migrate_player(player, exclude=node) for player in disconnected),
+                             return_exceptions=True)
+
+    async def wait_for_node(self, exclude: Optional[wavelink.Node] = None) -> Optional[wavelink.Node]:
+        """Espera con reintentos a que haya un nodo sano al que mover un reproductor"""
+        delay = 1
+        for _ in range(self.MIGRATION_ATTEMPTS):
+            node = self.node_balancer.best_node(wavelink.Pool.nodes.values(), exclude=exclude)
+            # Si el nodo caído vuelve antes que otro esté libre, también sirve (salvo si se está drenando)
+            if (not node and exclude and self.node_balancer.is_healthy(exclude)
+                    and exclude.identifier not in self.node_balancer.draining):
+                node = exclude
+            if node:
+                return node
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 8)
+        return None
+
+    async def migrate_player(self, player: wavelink.Player,
+                             exclude: Optional[wavelink.Node] = None) -> Optional[wavelink.Player]:
+        """Mueve un reproductor a un nodo sano y reanuda la canción donde iba.
+
+        wavelink 3 no puede cambiar un reproductor de nodo, así que se crea
+        uno nuevo en el mismo canal. La cola vive en self.queues, así que no
+        se toca; se conservan la canción actual, su posición y si estaba en
+        pausa. Devuelve el reproductor nuevo, o None si no se pudo.
+        """
+        guild = player.guild
+        if not guild or guild.id in self.migrating:
+            return None
+        self.migrating.add(guild.id)
+        text_channel = getattr(player, 'text_channel', None)
+        try:
+            # La espera puede durar casi un minuto: sin el lock, stop/play/queue siguen respondiendo
+            target = await self.wait_for_node(exclude=exclude or player.node)
+            async with self.guild_locks(guild.id):
+                # Mientras se esperaba alguien pudo usar stop (que borra la foto) o crear otro
+                # reproductor; si el nodo se cerró con on_wavelink_node_closed ya no hay ninguno
+                voice_client = guild.voice_client
+                if (voice_client is not None and voice_client is not player) or guild.id not in self.playback_snapshots:
+                    return None
+                if not target:
+                    print(f"[MIGRATION] No hay nodos disponibles para {guild.name}")
+                    # Soltar el reproductor muerto para no volver a intentarlo en cada revisión
+                    await self.release_player(player)
+                else:
+                    snapshot = self.playback_snapshots.get(guild.id)
+                    if player.current and self.node_balancer.is_healthy(player.node):
+                        # El nodo sigue vivo (p. ej. al drenarlo): su estado es el más reciente
+                        track, position, paused = player.current, player.position, player.paused
+                    elif snapshot:
+                        # Con el nodo caído player.position se sigue extrapolando con el reloj local;
+                        # la última posición que confirmó Lavalink es la fiable
+                        track, position, paused = snapshot
+                    elif player.current:
+                        track, position, paused = player.current, 0, player.paused
+                    else:
+                        track, position, paused = None, 0, False
+
+                    print(f"[MIGRATION] Moviendo {guild.name} de {player.node.identifier} a {target.identifier} ({self.format_time(position)})")
+                    player = await self.reconnect_player(player, target)
+                    if not player:
+                        return None
+                    if track:
+                        await player.play(track, start=position, paused=paused)
+
+            if not target:
+                if text_channel:
+                    await text_channel.send("❌ No hay servidores de música disponibles. Usa el comando play cuando vuelvan.")
+                return None
+            if text_channel:
+                await text_channel.send(f"🔄 Reproducción recuperada en otro servidor de música ({self.format_time(position)}).")
+            return player
+        except Exception as e:
+            print(f"[MIGRATION] Error al recuperar el reproductor de {guild.name}: {e}")
+            return None
+        finally:
+            self.migrating.discard(guild.id)
+
+    async def release_player(self, player: wavelink.Player):
+        """Desconecta un reproductor aunque su nodo ya no responda"""
+        try:
+            await player.disconnect()
+        except Exception as e:
+            print(f"[MIGRATION] Error al desconectar el reproductor antiguo: {e}")
+            # wavelink ya soltó el cliente de voz antes de avisar al nodo; falta salir del canal
+            try:
+                await player.guild.change_voice_state(channel=None)
+            except Exception:
+                pass
+
+    async def reconnect_player(self, player: wavelink.Player, node: wavelink.Node) -> Optional[wavelink.Player]:
+        """Crea un reproductor nuevo en node, en el mismo canal que player"""
+        channel = player.channel
+        text_channel = getattr(player, 'text_channel', None)
+        await self.release_player(player)
+        if not channel:
+            return None
+        try:
+            new_player = await channel.connect(cls=lambda client, ch: wavelink.Player(client, ch, nodes=[node]))
+        except Exception as e:
+            print(f"[MIGRATION] No se pudo reconectar al canal {channel.name}: {e}")
+            return None
+        new_player.text_channel = text_channel
+        return new_player
+
     async def on_voice_state_update(self, member, before, after):
         """Evento que se dispara cuando cambia el estado de voz de un miembro"""
-        if member == self.bot.user:  # Solo nos interesa el bot
+        if member == self.bot.user:  # Registrar los cambios del propio bot
             if before.channel and not after.channel:
                 print(f"[VOICE STATE] Bot desconectado de {before.channel.name}")
+                self.idle_tracker.cancel(member.guild.id)
+                return
             elif not before.channel and after.channel:
                 print(f"[VOICE STATE] Bot conectado a {after.channel.name}")
             elif before.channel and after.channel and before.channel != after.channel:
                 print(f"[VOICE STATE] Bot movido de {before.channel.name} a {after.channel.name}")
 
-    async def play_next(self, player: wavelink.Player):
-        """Reproduce la siguiente canción en la cola"""
-        guild_id = player.guild.id
-        queue = self.get_queue(guild_id)
-        
-        if not queue:
-            print("No hay más canciones en la cola")
-            # No hay más canciones en la cola
+        # Solo importan los servidores con reproductor y los cambios en su canal
+        player = member.guild.voice_client
+        if not isinstance(player, wavelink.Player) or not player.channel:
+            return
+        if before.channel == after.channel or player.channel not in (before.channel, after.channel):
+            return
+        self.update_idle_state(player)
+
+    def snapshot_guild(self, guild_id: int) -> Optional[dict]:
+        """Estado de reproducción del servidor para guardarlo en disco, o None si no hay nada que guardar"""
+        guild = self.bot.get_guild(guild_id)
+        player = guild.voice_client if guild else None
+        if not isinstance(player, wavelink.Player) or not player.channel:
+            return None
+        current = player.current
+        if not current and not self.has_next(guild_id):
+            return None
+        text_channel = getattr(player, 'text_channel', None)
+        return {
+            "voice_channel_id": player.channel.id,
+            "text_channel_id": text_channel.id if text_channel else None,
+            "current": QueuedTrack.from_playable(current).to_row() if current else None,
+            "position": player.position if current else 0,
+            "paused": player.paused,
+        }
+
+    def snapshot_queue(self, guild_id: int) -> list[dict]:
+        """Cola del servidor (cargada y pendiente) en el orden en que va a sonar, para guardarla en disco"""
+        rows = [QueuedTrack.from_playable(track).to_row() for track in self.get_queue(guild_id)]
+        pending = self.pending_tracks.get(guild_id)
+        if pending:
+            rows.extend(track.to_row() for track in pending)
+        return rows
+
+    async def restore_sessions(self):
+        """Vuelve a unirse a los canales guardados y reanuda la reproducción tras un reinicio"""
+        try:
+            states = await self.queue_store.load_all()
+        except Exception as e:
+            print(f"[QUEUE STORE] No se pudo leer el estado guardado: {e}")
+            return
+        if states:
+            print(f"[QUEUE STORE] Restaurando {len(states)} sesiones de música")
+        for guild_id, state in states.items():
             try:
-                if hasattr(player, 'text_channel') and player.text_channel:
-                    embed = discord.Embed(
-                        title="⏹️ Cola finalizada",
-                        description="No hay más canciones en la cola.",
-                        color=discord.Color.blue()
-                    )
-                    await player.text_channel.send(embed=embed)
+                async with self.guild_locks(guild_id):
+                    await self.restore_session(guild_id, state)
             except Exception as e:
-                print(f"Error al enviar mensaje de cola finalizada: {e}")
+                print(f"[QUEUE STORE] Error al restaurar la sesión de {guild_id}: {e}")
+            # La cola se guarda de nuevo tal como quedó; si no se pudo restaurar, se borra
+            self.queue_store.mark_queue(guild_id)
+
+    async def restore_session(self, guild_id: int, state: dict):
+        guild = self.bot.get_guild(guild_id)
+        channel = guild.get_channel(state["voice_channel_id"]) if guild else None
+        if not channel or guild.voice_client:
             return
-        
+
+        # "pending" solo aparece en estados guardados antes de separar la cola
+        entries = [QueuedTrack.from_row(row) for row in state.get("queue", []) + state.get("pending", [])]
+        queue = self.get_queue(guild_id)
+        queue.clear()
+        queue.extend(entries[:self.PLAYLIST_EAGER_LIMIT])
+        if len(entries) > self.PLAYLIST_EAGER_LIMIT:
+            self.pending_tracks[guild_id] = PendingTracks(entries[self.PLAYLIST_EAGER_LIMIT:])
+
+        player = await channel.connect(cls=self.create_player)
+        text_channel = guild.get_channel(state["text_channel_id"]) if state.get("text_channel_id") else None
+        player.text_channel = text_channel
+
+        current = QueuedTrack.from_row(state["current"]) if state.get("current") else None
+        track = await self.resolve_entry(current) if current else None
+        if track:
+            await player.play(track, start=state.get("position", 0), paused=state.get("paused", False))
+        elif self.has_next(guild_id):
+            await self.play_next(player)
+
+        print(f"[QUEUE STORE] Sesión restaurada en {guild.name}: {len(entries)} canciones en cola")
+        if text_channel:
+            try:
+                await text_channel.send(f"🔄 Sesión de música restaurada tras un reinicio ({len(entries)} canciones en cola).")
+            except discord.HTTPException as e:
+                print(f"Error al enviar mensaje de sesión restaurada: {e}")
+
+    def enqueue(self, guild_id: int, tracks: list[wavelink.Playable]) -> None:
+        """Añade canciones a la cola respetando el orden de las playlists pendientes"""
+        tracks = [QueuedTrack.from_playable(track) for track in tracks]
+        self.queue_store.mark_queue(guild_id)
+        pending = self.pending_tracks.get(guild_id)
+        if pending is not None:
+            pending.extend(tracks)
+        else:
+            self.get_queue(guild_id).extend(tracks)
+
+    def queue_playlist(self, guild_id: int, tracks: list[wavelink.Playable]) -> None:
+        """Deja las canciones de una playlist como pendientes y las carga en segundo plano"""
+        pending = self.pending_tracks.setdefault(guild_id, PendingTracks())
+        pending.extend(QueuedTrack.from_playable(track) for track in tracks)
+        self.queue_store.mark_queue(guild_id)
+        task = self.ingest_tasks.get(guild_id)
+        if not task or task.done():
+            self.ingest_tasks[guild_id] = self.bot.loop.create_task(self.ingest_pending(guild_id))
+
+    async def ingest_pending(self, guild_id: int):
+        """Pasa canciones pendientes a la cola por bloques hasta PLAYLIST_EAGER_LIMIT"""
         try:
-            # Tomar la siguiente canción de la cola
-            next_track = queue.pop(0)
+            queue = self.get_queue(guild_id)
+            while True:
+                pending = self.pending_tracks.get(guild_id)
+                if not pending:
+                    self.pending_tracks.pop(guild_id, None)
+                    return
+                room = self.PLAYLIST_EAGER_LIMIT - len(queue)
+                if room <= 0:
+                    # El resto se carga desde take_next a medida que la cola se vacía
+                    return
+                queue.extend(pending.take(min(room, self.INGEST_CHUNK)))
+                # Ceder el bucle de eventos entre bloques
+                await asyncio.sleep(0)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.ingest_tasks.pop(guild_id, None)
+
+    def refill_queue(self, guild_id: int) -> None:
+        """Carga el siguiente bloque de canciones pendientes cuando la cola se queda corta"""
+        pending = self.pending_tracks.get(guild_id)
+        if pending is None:
+            return
+        queue = self.get_queue(guild_id)
+        if len(queue) < self.INGEST_CHUNK:
+            queue.extend(pending.take(self.INGEST_CHUNK))
+        if not pending:
+            self.pending_tracks.pop(guild_id, None)
+
+    def has_next(self, guild_id: int) -> bool:
+        return bool(self.get_queue(guild_id)) or bool(self.pending_tracks.get(guild_id))
+
+    def clear_guild_queue(self, guild_id: int) -> None:
+        """Vacía la cola, las canciones pendientes y la siguiente canción preparada"""
+        if guild_id in self.queues:
+            self.queues[guild_id].clear()
+        task = self.ingest_tasks.pop(guild_id, None)
+        if task:
+            task.cancel()
+        self.pending_tracks.pop(guild_id, None)
+        self.prefetched.pop(guild_id, None)
+        self.queue_store.mark_queue(guild_id)
+
+    async def resolve_entry(self, entry) -> Optional[wavelink.Playable]:
+        """Convierte una entrada de la cola en una canción lista para reproducir, o None si no es válida"""
+        if isinstance(entry, QueuedTrack):
+            if not entry.encoded:
+                return None
+            try:
+                return wavelink.Playable(entry.to_payload())
+            except Exception as e:
+                print(f"No se pudo reconstruir la canción {entry.title}: {e}")
+                return None
+        if isinstance(entry, wavelink.Playable) and entry.encoded:
+            return entry
+        return None
+
+    async def prefetch_next(self, player: wavelink.Player) -> Optional[wavelink.Playable]:
+        """Resuelve y valida la siguiente entrada de la cola mientras suena la actual"""
+        guild_id = player.guild.id
+        self.refill_queue(guild_id)
+        entry = self.get_queue(guild_id).peek()
+        if entry is None:
+            self.prefetched.pop(guild_id, None)
+            return None
+        cached = self.prefetched.get(guild_id)
+        if cached and cached[0] is entry:
+            return cached[1]
+        playable = await self.resolve_entry(entry)
+        if playable:
+            self.prefetched[guild_id] = (entry, playable)
+        return playable
+
+    async def take_next(self, guild_id: int) -> Optional[wavelink.Playable]:
+        """Saca de la cola la siguiente canción válida, usando la ya resuelta si coincide"""
+        queue = self.get_queue(guild_id)
+        self.refill_queue(guild_id)
+        while queue:
+            entry = queue.get()
+            self.queue_store.advance(guild_id)
+            self.refill_queue(guild_id)
+            cached = self.prefetched.pop(guild_id, None)
+            if cached and cached[0] is entry:
+                return cached[1]
+            playable = await self.resolve_entry(entry)
+            if playable:
+                return playable
+            print(f"Entrada inválida descartada de la cola: {getattr(entry, 'title', entry)}")
+        return None
+
+    @staticmethod
+    def summarize(samples) -> Optional[dict]:
+        """Media, p50, p95 y máximo de una serie de mediciones en ms"""
+        if not samples:
+            return None
+        values = sorted(samples)
+        return {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "p50": values[len(values) // 2],
+            "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+            "max": values[-1],
+        }
+
+    def gap_stats(self) -> Optional[dict]:
+        """Estadísticas de los silencios medidos entre canciones"""
+        return self.summarize(self.playback_gaps)
+
+    async def play_next(self, player: wavelink.Player):
+        """Reproduce la siguiente canción en la cola"""
+        guild_id = player.guild.id
+
+        # Se prueba cada entrada en orden hasta que una se reproduzca, sin recursión
+        while True:
+            next_track = await self.take_next(guild_id)
+            if next_track is None:
+                print("No hay más canciones en la cola")
+                self.track_end_times.pop(guild_id, None)
+                # El panel pasa a mostrar "Cola finalizada"
+                self.now_playing.update(guild_id, getattr(player, 'text_channel', None))
+                return
+
             print(f"Reproduciendo siguiente canción: {next_track.title}")
-            
+
             # Verificar si el reproductor sigue conectado
             # Usar player.guild.voice_client en lugar de is_connected()
             if not player.guild.voice_client or player.guild.voice_client != player:
@@ -170,46 +794,209 @@ class Music(commands.Cog):
                 if hasattr(player, 'text_channel') and player.text_channel:
                     await player.text_channel.send("❌ El bot se desconectó. Por favor, vuelve a usar el comando play.")
                 return
-            
-            # Intentar reproducir la siguiente canción
-            await player.play(next_track)
-            
-            # Enviar embed informando la nueva canción
-            if hasattr(player, 'text_channel') and player.text_channel:
-                embed = discord.Embed(
-                    title="▶️ Reproduciendo ahora",
-                    description=f"**{next_track.title}**\nDuración: {self.format_time(next_track.length)}",
-                    color=discord.Color.blue()
-                )
-                try:
-                    await player.text_channel.send(embed=embed)
-                except discord.HTTPException as e:
-                    print(f"Error al enviar mensaje de reproducción: {e}")
-        except Exception as e:
-            print(f"Error al reproducir la siguiente canción: {e}")
-            # Intentar con la siguiente canción si hay error
-            if queue:
+
+            try:
+                # Intentar reproducir la siguiente canción
+                await player.play(next_track)
+            except Exception as e:
+                print(f"Error al reproducir la siguiente canción: {e}")
+                # Intentar con la siguiente canción si hay error
                 print("Intentando con la siguiente canción debido a un error")
-                await self.play_next(player)
+                continue
 
-    @commands.command(name="play")
-    async def play_(self, ctx: commands.Context, *, search: str):
+            # El panel de "Reproduciendo ahora" se actualiza con el evento de inicio
+            return
+
+    def now_playing_embed(self, player: wavelink.Player) -> discord.Embed:
+        """Embed del panel "Reproduciendo ahora" con el estado actual del reproductor"""
+        track: wavelink.Playable = player.current
+        position = self.format_time(player.position)
+        duration = self.format_time(track.length)
+        
+        description_lines = []
+        if track.author and track.author != "Unknown Artist":
+            description_lines.append(f"**Artista:** {track.author}")
+        
+        if track.is_stream:
+            description_lines.append("**Duración:** 🔴 En directo")
+        else:
+            description_lines.append(f"{self.progress_bar(player.position, track.length)} {position} / {duration}")
+        
+        if track.uri:
+            description_lines.append(f"**Fuente:** [Click aquí]({track.uri})")
+        else:
+            description_lines.append("**Fuente:** No disponible")
+
+        queue = self.get_queue(player.guild.id)
+        upcoming = queue.peek()
+        if upcoming:
+            description_lines.append(f"**Siguiente:** {upcoming.title} ({len(queue)} en cola)")
+
+        embed = discord.Embed(
+            title=f"{'⏸️ En pausa' if player.paused else '▶️ Reproduciendo ahora'}: {track.title}",
+            description="\n".join(description_lines),
+            color=discord.Color.blue()
+        )
+
+        if hasattr(track, 'artwork') and track.artwork:
+            embed.set_thumbnail(url=track.artwork)
+        elif hasattr(track, 'album') and hasattr(track.album, 'artwork') and track.album.artwork: # Para algunas fuentes como Spotify
+             embed.set_thumbnail(url=track.album.artwork)
+        return embed
+
+    @staticmethod
+    def progress_bar(position: int, length: int, size: int = 12) -> str:
+        filled = min(size - 1, int(size * position / length)) if length else 0
+        return "▬" * filled + "🔘" + "▬" * (size - 1 - filled)
+
+    def render_now_playing(self, guild_id: int) -> Optional[discord.Embed]:
+        """Contenido del panel en el momento de enviarlo; None si el bot ya no está conectado"""
+        guild = self.bot.get_guild(guild_id)
+        player = guild.voice_client if guild else None
+        if not isinstance(player, wavelink.Player):
+            return None
+        if player.current:
+            return self.now_playing_embed(player)
+        return discord.Embed(
+            title="⏹️ Cola finalizada",
+            description="No hay más canciones en la cola.",
+            color=discord.Color.blue()
+        )
+
+    async def load_tracks(self, query: str) -> wavelink.Playlist | list[wavelink.Playable]:
+        """Busca una consulta o URL; los enlaces de Spotify pasan por su resolvedor"""
+        if parse_spotify_link(query):
+            if self.spotify is None:
+                raise RuntimeError("Los enlaces de Spotify no están configurados (SPOTIFY_CLIENT_ID/SECRET)")
+            return await self.spotify.load(query)
+        return await self.search_cache.fetch(query, wavelink.Playable.search)
+
+    @classmethod
+    def split_batch(cls, text: str, batch: bool = False) -> list[str]:
+        """Separa una lista de canciones: una por línea, separadas por ';' o varias URLs en una línea.
+
+        Una sola consulta se devuelve tal cual ("#1 Crush" o "1. Yellow" son títulos);
+        viñetas, numeración y comentarios solo se quitan en listas de verdad o si
+        ``batch`` (el texto viene de un archivo adjunto).
+        """
+        entries = [line.strip() for line in text.splitlines()]
+        entries = [entry for entry in entries if entry]
+        if len(entries) == 1 and ";" in entries[0]:
+            entries = [part.strip() for part in entries[0].split(";") if part.strip()]
+        elif len(entries) == 1:
+            parts = entries[0].split()
+            if len(parts) > 1 and all(part.startswith(("http://", "https://")) for part in parts):
+                entries = parts
+        if len(entries) <= 1 and not batch:
+            return entries
+        # Quitar viñetas y numeración de listas pegadas ("1. ", "- ") y los comentarios
+        entries = [cls.BATCH_BULLET.sub("", entry) for entry in entries]
+        return [entry for entry in entries if entry and not entry.startswith("#")]
+
+    async def play_batch(self, ctx: commands.Context, player: wavelink.Player, entries: list[str]):
+        """Busca varias canciones a la vez y las encola en el orden en que se pidieron"""
+        guild_id = ctx.guild.id
+        skipped = max(0, len(entries) - self.BATCH_MAX_ENTRIES)
+        entries = entries[:self.BATCH_MAX_ENTRIES]
+        msg = await self.reply(ctx, embed=discord.Embed(
+            title="⏳ Buscando...",
+            description=f"Buscando {len(entries)} canciones.",
+            color=discord.Color.blue()
+        ))
+
+        semaphore = asyncio.Semaphore(self.BATCH_CONCURRENCY)
+
+        async def resolve(query: str) -> list[wavelink.Playable]:
+            async with semaphore:
+                try:
+                    results = await self.load_tracks(query)
+                except Exception as e:
+                    print(f"[PLAY BATCH] Error al buscar '{query}': {e}")
+                    return []
+            if isinstance(results, wavelink.Playlist):
+                return list(results.tracks)
+            return results[:1] if results else []
+
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(resolve(query)) for query in entries]
+        added, failed, now_playing = 0, [], None
+        try:
+            # Se espera cada búsqueda en orden: lo ya resuelto entra en la cola sin esperar al resto
+            for query, task in zip(entries, tasks):
+                tracks = await task
+                if ctx.voice_client is not player:
+                    print("[PLAY BATCH] El reproductor se desconectó, se cancela el lote")
+                    break
+                if not tracks:
+                    failed.append(query)
+                    continue
+                async with self.guild_locks(guild_id):
+                    if not player.current and not self.has_next(guild_id):
+                        try:
+                            await player.play(tracks[0])
+                            now_playing = tracks[0]
+                            added += 1
+                            tracks = tracks[1:]
+                        except Exception as e:
+                            print(f"[PLAY BATCH] Error al reproducir '{tracks[0].title}': {e}")
+                    if len(tracks) > 1:
+                        self.queue_playlist(guild_id, tracks)
+                    elif tracks:
+                        self.enqueue(guild_id, tracks)
+                    added += len(tracks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        print(f"[PLAY BATCH] {len(entries)} búsquedas resueltas en {time.perf_counter() - started:.2f} s")
+
+        lines = []
+        if now_playing:
+            lines.append(f"▶️ Reproduciendo: **{now_playing.title}**")
+        lines.append(f"🎵 {added} canciones añadidas de {len(entries)} búsquedas.")
+        if failed:
+            shown = ", ".join(f"`{query}`" for query in failed[:5])
+            lines.append(f"❌ Sin resultados ({len(failed)}): {shown}{'...' if len(failed) > 5 else ''}")
+        if skipped:
+            lines.append(f"⚠️ Se ignoraron {skipped} entradas (máximo {self.BATCH_MAX_ENTRIES} por comando).")
+        await msg.edit(embed=discord.Embed(
+            title="📋 Lista añadida" if added else "❌ No se añadió ninguna canción",
+            description="\n".join(lines),
+            color=discord.Color.blue() if added else discord.Color.red()
+        ))
+
+    @commands.hybrid_command(name="play", description="Reproduce música de YouTube o Spotify!")
+    @app_commands.describe(
+        search="Nombre de la canción, URL o playlist (varias separadas por ';' o una por línea)",
+        archivo="Archivo de texto con una canción o URL por línea"
+    )
+    async def play_(self, ctx: commands.Context, archivo: Optional[discord.Attachment] = None, *, search: str = ""):
         print(f"[PLAY DEBUG] Comando play recibido: {search}")
         
         if not ctx.author.voice:
-            await ctx.send("❌ Debes estar en un canal de voz para usar este comando.")
+            await self.reply(ctx, "❌ Debes estar en un canal de voz para usar este comando.")
+            return
+
+        entries = self.split_batch(search)
+        if archivo:
+            if archivo.size > self.BATCH_MAX_FILE_BYTES:
+                await self.reply(ctx, f"❌ El archivo es demasiado grande (máximo {self.BATCH_MAX_FILE_BYTES // 1024} KB).")
+                return
+            entries += self.split_batch((await archivo.read()).decode("utf-8", errors="replace"), batch=True)
+        if not entries:
+            await self.reply(ctx, "❌ Indica una canción, una lista de canciones o adjunta un archivo de texto.")
             return
+        search = entries[0]
 
         player: wavelink.Player
         if not ctx.voice_client:
             try:
                 print(f"[PLAY DEBUG] Conectando al canal de voz: {ctx.author.voice.channel.name}")
-                player = await ctx.author.voice.channel.connect(cls=wavelink.Player)
+                player = await ctx.author.voice.channel.connect(cls=self.create_player)
                 player.text_channel = ctx.channel  # Establecer el canal de texto al crear el player
                 print(f"[PLAY DEBUG] Conexión exitosa. Player: {player}")
             except Exception as e:
                 print(f"[PLAY ERROR] Error al conectar al canal de voz: {e}")
-                await ctx.send(f"❌ Error al conectar al canal de voz: {e}")
+                await self.reply(ctx, f"❌ Error al conectar al canal de voz: {e}")
                 return
         else:
             player = ctx.voice_client
@@ -218,24 +1005,28 @@ class Music(commands.Cog):
 
         # Verificar estado del nodo Lavalink
         try:
-            node = wavelink.Pool.get_node()
-            if not node or not node.status:
+            node = player.node
+            if not node or not self.node_balancer.is_connected(node):
                 print(f"[PLAY ERROR] Nodo Lavalink no disponible. Estado: {node.status if node else 'None'}")
-                await ctx.send("❌ El servidor de música no está disponible. Inténtalo más tarde.")
+                await self.reply(ctx, "❌ El servidor de música no está disponible. Inténtalo más tarde.")
                 return
             print(f"[PLAY DEBUG] Nodo Lavalink OK: {node.uri}, Estado: {node.status}")
         except Exception as e:
             print(f"[PLAY ERROR] Error al verificar nodo Lavalink: {e}")
-            await ctx.send("❌ Error con el servidor de música.")
+            await self.reply(ctx, "❌ Error con el servidor de música.")
+            return
+
+        if len(entries) > 1:
+            await self.play_batch(ctx, player, entries)
             return
 
         embed_color = discord.Color.blue()
         embed = discord.Embed(title="⏳ Buscando...", description=f"Buscando: `{search}`", color=embed_color)
-        msg = await ctx.send(embed=embed)
+        msg = await self.reply(ctx, embed=embed)
 
         try:
             print(f"[PLAY DEBUG] Buscando: {search}")
-            results: wavelink.Playlist | list[wavelink.Playable] | None = await wavelink.Playable.search(search)
+            results: wavelink.Playlist | list[wavelink.Playable] | None = await self.load_tracks(search)
             print(f"[PLAY DEBUG] Resultados de búsqueda: {type(results)}, Cantidad: {len(results) if results else 0}")
             
             if not results:
@@ -243,96 +1034,94 @@ class Music(commands.Cog):
                 await msg.edit(embed=discord.Embed(title="❌ No se encontraron resultados.", description=f"No pude encontrar nada para: `{search}`", color=discord.Color.red()))
                 return
 
-            queue = self.get_queue(ctx.guild.id)
-
-            if isinstance(results, wavelink.Playlist):
-                print(f"[PLAY DEBUG] Procesando playlist: {results.name}")
-                playlist = results
-                if not playlist.tracks:
-                    await msg.edit(embed=discord.Embed(title=f"❌ La playlist '{playlist.name}' está vacía o no se pudo cargar.", color=discord.Color.red()))
-                    return
+            # La búsqueda y las respuestas quedan fuera del lock; solo se serializa el cambio de estado
+            started = False
+            async with self.guild_locks(ctx.guild.id):
+                if isinstance(results, wavelink.Playlist):
+                    print(f"[PLAY DEBUG] Procesando playlist: {results.name}")
+                    playlist = results
+                    tracks_from_playlist = playlist.tracks
+                    num_tracks = len(tracks_from_playlist)
+                    playlist_name = playlist.name if playlist.name else "Playlist sin nombre"
 
-                tracks_from_playlist = playlist.tracks
-                num_tracks = len(tracks_from_playlist)
-                playlist_name = playlist.name if playlist.name else "Playlist sin nombre"
-
-                if player.current: # Player is busy
-                    print(f"[PLAY DEBUG] Player ocupado, añadiendo {num_tracks} canciones a la cola")
-                    for track_in_playlist in tracks_from_playlist:
-                        queue.append(track_in_playlist)
-                    embed = discord.Embed(
-                        title="🎵 Playlist añadida a la cola",
-                        description=f"Se añadieron {num_tracks} canciones de **{playlist_name}** a la cola.",
-                        color=embed_color
-                    )
-                    await msg.edit(embed=embed)
-                else: # Player is idle, play first and queue rest
-                    first_track = tracks_from_playlist[0]
-                    print(f"[PLAY DEBUG] Player libre, reproduciendo: {first_track.title}")
-                    
-                    try:
-                        await player.play(first_track)
-                        print(f"[PLAY DEBUG] Reproducción iniciada exitosamente")
-                    except Exception as play_error:
-                        print(f"[PLAY ERROR] Error al reproducir: {play_error}")
-                        await msg.edit(embed=discord.Embed(title="❌ Error al reproducir", description=f"Error: {play_error}", color=discord.Color.red()))
-                        return
-                    
-                    desc = f"Empezando con: **{first_track.title}** ({self.format_time(first_track.length)})"
-                    for track_in_playlist in tracks_from_playlist[1:]:
-                        queue.append(track_in_playlist)
+                    if not tracks_from_playlist:
+                        embed = discord.Embed(title=f"❌ La playlist '{playlist.name}' está vacía o no se pudo cargar.", color=discord.Color.red())
+                    elif player.current: # Player is busy
+                        print(f"[PLAY DEBUG] Player ocupado, añadiendo {num_tracks} canciones a la cola")
+                        self.queue_playlist(ctx.guild.id, tracks_from_playlist)
+                        embed = discord.Embed(
+                            title="🎵 Playlist añadida a la cola",
+                            description=f"Se añadieron {num_tracks} canciones de **{playlist_name}** a la cola.",
+                            color=embed_color
+                        )
+                    else: # Player is idle, play first and queue rest
+                        first_track = tracks_from_playlist[0]
+                        print(f"[PLAY DEBUG] Player libre, reproduciendo: {first_track.title}")
                     
-                    if num_tracks > 1:
-                        desc += f"\n{num_tracks - 1} más canciones de **{playlist_name}** añadidas a la cola."
+                        try:
+                            await player.play(first_track)
+                            print(f"[PLAY DEBUG] Reproducción iniciada exitosamente")
+                        except Exception as play_error:
+                            print(f"[PLAY ERROR] Error al reproducir: {play_error}")
+                            embed = discord.Embed(title="❌ Error al reproducir", description=f"Error: {play_error}", color=discord.Color.red())
+                        else:
+                            started = True
+                            desc = f"Empezando con: **{first_track.title}** ({self.format_time(first_track.length)})"
+                            # El resto entra en la cola en segundo plano; la respuesta no espera
+                            self.queue_playlist(ctx.guild.id, tracks_from_playlist[1:])
+                        
+                            if num_tracks > 1:
+                                desc += f"\n{num_tracks - 1} más canciones de **{playlist_name}** añadidas a la cola."
 
-                    embed = discord.Embed(
-                        title=f"▶️ Reproduciendo playlist: {playlist_name}",
-                        description=desc,
-                        color=embed_color
-                    )
-                    await msg.edit(embed=embed)
+                            embed = discord.Embed(
+                                title=f"▶️ Reproduciendo playlist: {playlist_name}",
+                                description=desc,
+                                color=embed_color
+                            )
 
-            elif isinstance(results, list): # List of Playable tracks
-                track: wavelink.Playable = results[0] # Take the first result
-                print(f"[PLAY DEBUG] Procesando canción individual: {track.title}")
+                elif isinstance(results, list): # List of Playable tracks
+                    track: wavelink.Playable = results[0] # Take the first result
+                    print(f"[PLAY DEBUG] Procesando canción individual: {track.title}")
                 
+                    if player.current:
+                        print(f"[PLAY DEBUG] Player ocupado, añadiendo a la cola: {track.title}")
+                        self.enqueue(ctx.guild.id, [track])
+                        embed = discord.Embed(
+                            title="🎵 Añadida a la cola",
+                            description=f"**{track.title}**\nDuración: {self.format_time(track.length)}",
+                            color=embed_color
+                        )
+                    else:
+                        print(f"[PLAY DEBUG] Player libre, reproduciendo: {track.title}")
+                        try:
+                            await player.play(track)
+                            print(f"[PLAY DEBUG] Reproducción iniciada exitosamente")
+                        except Exception as play_error:
+                            print(f"[PLAY ERROR] Error al reproducir: {play_error}")
+                            embed = discord.Embed(title="❌ Error al reproducir", description=f"Error: {play_error}", color=discord.Color.red())
+                        else:
+                            started = True
+                            embed = discord.Embed(
+                                title="▶️ Reproduciendo",
+                                description=f"**{track.title}**\nDuración: {self.format_time(track.length)}",
+                                color=embed_color
+                            )
+                else: 
+                    print(f"[PLAY ERROR] Formato de resultado inesperado: {type(results)}")
+                    embed = discord.Embed(title="❌ Formato de resultado inesperado.", color=discord.Color.red())
+
+            if started and isinstance(results, list):
+                # Verificar si la reproducción comenzó, sin retener el lock del servidor
+                await asyncio.sleep(1)
                 if player.current:
-                    print(f"[PLAY DEBUG] Player ocupado, añadiendo a la cola: {track.title}")
-                    queue.append(track)
-                    embed = discord.Embed(
-                        title="🎵 Añadida a la cola",
-                        description=f"**{track.title}**\nDuración: {self.format_time(track.length)}",
-                        color=embed_color
-                    )
-                    await msg.edit(embed=embed)
+                    print(f"[PLAY DEBUG] Confirmado: player.current = {player.current.title}")
                 else:
-                    print(f"[PLAY DEBUG] Player libre, reproduciendo: {track.title}")
-                    try:
-                        await player.play(track)
-                        print(f"[PLAY DEBUG] Reproducción iniciada exitosamente")
-                        
-                        # Verificar inmediatamente si la reproducción comenzó
-                        await asyncio.sleep(1)
-                        if player.current:
-                            print(f"[PLAY DEBUG] Confirmado: player.current = {player.current.title}")
-                        else:
-                            print(f"[PLAY WARNING] player.current sigue siendo None después de 1 segundo")
-                            
-                    except Exception as play_error:
-                        print(f"[PLAY ERROR] Error al reproducir: {play_error}")
-                        await msg.edit(embed=discord.Embed(title="❌ Error al reproducir", description=f"Error: {play_error}", color=discord.Color.red()))
-                        return
-                        
-                    embed = discord.Embed(
-                        title="▶️ Reproduciendo",
-                        description=f"**{track.title}**\nDuración: {self.format_time(track.length)}",
-                        color=embed_color
-                    )
-                    await msg.edit(embed=embed)
-            else: 
-                print(f"[PLAY ERROR] Formato de resultado inesperado: {type(results)}")
-                await msg.edit(embed=discord.Embed(title="❌ Formato de resultado inesperado.", color=discord.Color.red()))
-                return
+                    print(f"[PLAY WARNING] player.current sigue siendo None después de 1 segundo")
+
+            await msg.edit(embed=embed)
+            if started:
+                # Esta respuesta pasa a ser el panel y se editará con cada canción
+                self.now_playing.adopt(ctx.guild.id, msg)
 
         except Exception as e:
             print(f"[PLAY ERROR] Error general en play: {e}")
@@ -340,112 +1129,198 @@ class Music(commands.Cog):
             traceback.print_exc()
             await msg.edit(embed=discord.Embed(title="❌ Error", description=f"Ocurrió un error: {str(e)}", color=discord.Color.red()))
 
-    @commands.command(name="stop")
+    @commands.hybrid_command(name="stop", description="Detén la música.")
     async def stop_(self, ctx: commands.Context):
         player: wavelink.Player | None = ctx.voice_client
         if not player:
-            await ctx.send("❌ No estoy reproduciendo música.")
+            await self.reply(ctx, "❌ No estoy reproduciendo música.")
             return
 
-        # Guardar referencia al canal para enviar el mensaje después de desconectar
-        text_channel = ctx.channel
         guild_id = ctx.guild.id
         
-        # Limpiar la cola antes de desconectar
-        if guild_id in self.queues:
-            self.queues[guild_id] = []
+        async with self.guild_locks(guild_id):
+            # Limpiar la cola antes de desconectar
+            self.clear_guild_queue(guild_id)
+            self.playback_snapshots.pop(guild_id, None)
+            self.track_end_times.pop(guild_id, None)
+            self.now_playing.forget(guild_id, getattr(player, 'text_channel', None))
             
-        # Desconectar el reproductor    
-        await player.disconnect()
+            # Desconectar el reproductor    
+            await player.disconnect()
+            await self.queue_store.delete(guild_id)
         
         embed = discord.Embed(title="⏹️ Música detenida", color=discord.Color.blue())
-        await text_channel.send(embed=embed)
+        await self.reply(ctx, embed=embed)
 
-    @commands.command(name="pause")
+    @commands.hybrid_command(name="pause", description="Pausa la música.")
     async def pause_(self, ctx: commands.Context):
         player: wavelink.Player | None = ctx.voice_client
         if not player or not player.current:
-            await ctx.send("❌ No hay música reproduciéndose para pausar.")
+            await self.reply(ctx, "❌ No hay música reproduciéndose para pausar.")
             return
 
         if player.paused:
-            await ctx.send("❌ La música ya está pausada.")
+            await self.reply(ctx, "❌ La música ya está pausada.")
             return
 
         await player.pause(True)
+        self.queue_store.mark_dirty(ctx.guild.id)
+        self.now_playing.update(ctx.guild.id, getattr(player, 'text_channel', None))
         embed = discord.Embed(title="⏸️ Música pausada", color=discord.Color.blue())
-        await ctx.send(embed=embed)
+        await self.reply(ctx, embed=embed)
 
-    @commands.command(name="resume")
+    @commands.hybrid_command(name="resume", description="Reanuda la música pausada.")
     async def resume_(self, ctx: commands.Context):
         player: wavelink.Player | None = ctx.voice_client
         if not player or not player.current:
-            await ctx.send("❌ No hay música pausada para reanudar.")
+            await self.reply(ctx, "❌ No hay música pausada para reanudar.")
             return
 
         if not player.paused:
-            await ctx.send("❌ La música no está pausada.")
+            await self.reply(ctx, "❌ La música no está pausada.")
             return
 
         await player.pause(False)
+        self.queue_store.mark_dirty(ctx.guild.id)
+        self.now_playing.update(ctx.guild.id, getattr(player, 'text_channel', None))
         embed = discord.Embed(title="▶️ Música reanudada", color=discord.Color.blue())
-        await ctx.send(embed=embed)
+        await self.reply(ctx, embed=embed)
 
-    @commands.command(name="skip")
+    @commands.hybrid_command(name="skip", description="Salta la canción actual.")
     async def skip_(self, ctx: commands.Context):
         player: wavelink.Player | None = ctx.voice_client
         if not player or not player.current:
-            await ctx.send("❌ No hay música reproduciéndose para saltar.")
+            await self.reply(ctx, "❌ No hay música reproduciéndose para saltar.")
             return
 
-        queue = self.get_queue(ctx.guild.id)
-        
-        # Guardar canal para enviar mensaje después de stop
-        text_channel = ctx.channel
-        
-        if queue:
-            try:
-                next_track = queue.pop(0)
-                print(f"Saltando a la siguiente canción: {next_track.title}")
+        async with self.guild_locks(ctx.guild.id):
+            if self.has_next(ctx.guild.id):
+                try:
+                    next_track = await self.take_next(ctx.guild.id)
+                    if next_track is None:
+                        await player.stop()
+                        await self.reply(ctx, embed=discord.Embed(title="⏭️ Canción saltada. No hay más canciones válidas en la cola.", color=discord.Color.blue()))
+                        return
+                    print(f"Saltando a la siguiente canción: {next_track.title}")
                 
-                # Comprobar que el player sigue conectado antes de reproducir
-                if not ctx.voice_client or ctx.voice_client != player:
-                    await ctx.send("❌ Se perdió la conexión con el canal de voz.")
-                    return
+                    # Comprobar que el player sigue conectado antes de reproducir
+                    if not ctx.voice_client or ctx.voice_client != player:
+                        await self.reply(ctx, "❌ Se perdió la conexión con el canal de voz.")
+                        return
                     
-                await player.play(next_track)
-                embed = discord.Embed(title="⏭️ Canción saltada, reproduciendo la siguiente.", description=f"Ahora reproduciendo: **{next_track.title}**", color=discord.Color.blue())
-                await text_channel.send(embed=embed)
-            except Exception as e:
-                print(f"Error al saltar a la siguiente canción: {e}")
-                await ctx.send("❌ Ocurrió un error al intentar reproducir la siguiente canción.")
-                # Intentar detener la reproducción actual si hubo error
+                    await player.play(next_track)
+                    embed = discord.Embed(title="⏭️ Canción saltada, reproduciendo la siguiente.", description=f"Ahora reproduciendo: **{next_track.title}**", color=discord.Color.blue())
+                    await self.reply(ctx, embed=embed)
+                except Exception as e:
+                    print(f"Error al saltar a la siguiente canción: {e}")
+                    await self.reply(ctx, "❌ Ocurrió un error al intentar reproducir la siguiente canción.")
+                    # Intentar detener la reproducción actual si hubo error
+                    try:
+                        await player.stop()
+                    except:
+                        pass
+            else:
+                print("No hay más canciones para saltar")
                 try:
                     await player.stop()
-                except:
-                    pass
-        else:
-            print("No hay más canciones para saltar")
+                    embed = discord.Embed(title="⏭️ Canción saltada. No hay más canciones en la cola.", color=discord.Color.blue())
+                    await self.reply(ctx, embed=embed)
+                except Exception as e:
+                    print(f"Error al detener la reproducción: {e}")
+                    await self.reply(ctx, "❌ Ocurrió un error al intentar detener la reproducción.")
+
+    @commands.hybrid_command(name="previous", description="Vuelve a la canción anterior.")
+    async def previous_(self, ctx: commands.Context):
+        player: wavelink.Player | None = ctx.voice_client
+        if not player:
+            await self.reply(ctx, "❌ No estoy conectado a un canal de voz.")
+            return
+
+        guild_id = ctx.guild.id
+        async with self.guild_locks(guild_id):
+            current = player.current
+            latest = self.history.get(guild_id)
+            # Si suena algo, es la última entrada del historial: la anterior es la siguiente
+            skip_current = bool(current and latest and latest.encoded == current.encoded)
+            previous = self.history.get(guild_id, 1 if skip_current else 0)
+            if previous is None:
+                await self.reply(ctx, "❌ No hay canciones anteriores en el historial.")
+                return
+            playable = await self.resolve_entry(previous)
+            if playable is None:
+                await self.reply(ctx, "❌ No se pudo recuperar la canción anterior.")
+                return
+
+            # Se sacan del historial; la anterior se vuelve a registrar al empezar
+            if skip_current:
+                self.history.pop(guild_id)
+            self.history.pop(guild_id)
+            if current:
+                # La canción actual vuelve al principio de la cola
+                self.get_queue(guild_id).put_first(QueuedTrack.from_playable(current))
+                self.queue_store.mark_queue(guild_id)
             try:
-                await player.stop()
-                embed = discord.Embed(title="⏭️ Canción saltada. No hay más canciones en la cola.", color=discord.Color.blue())
-                await text_channel.send(embed=embed)
+                await player.play(playable)
             except Exception as e:
-                print(f"Error al detener la reproducción: {e}")
-                await ctx.send("❌ Ocurrió un error al intentar detener la reproducción.")
+                print(f"Error al volver a la canción anterior: {e}")
+                await self.reply(ctx, "❌ Ocurrió un error al reproducir la canción anterior.")
+                return
 
-    @commands.command(name="queue")
-    async def queue_(self, ctx: commands.Context):
+        embed = discord.Embed(title="⏮️ Canción anterior", description=f"Ahora reproduciendo: **{previous.title}**", color=discord.Color.blue())
+        await self.reply(ctx, embed=embed)
+
+    @commands.hybrid_command(name="replay", description="Vuelve a poner una canción reciente sin buscarla de nuevo.")
+    @app_commands.describe(position="Posición en el historial (1 = la más reciente)")
+    async def replay_(self, ctx: commands.Context, position: int = 1):
         player: wavelink.Player | None = ctx.voice_client
         if not player:
-            await ctx.send("❌ No estoy conectado a un canal de voz.")
+            await self.reply(ctx, "❌ No estoy conectado a un canal de voz.")
+            return
+
+        guild_id = ctx.guild.id
+        async with self.guild_locks(guild_id):
+            entry = self.history.get(guild_id, position - 1)
+            if entry is None:
+                recent = self.history.recent(guild_id)
+                if not recent:
+                    await self.reply(ctx, "❌ Aún no se ha reproducido nada en este servidor.")
+                    return
+                lines = "\n".join(f"{i}. **{track.title}** - {self.format_time(track.length)}" for i, track in enumerate(recent, 1))
+                await self.reply(ctx, embed=discord.Embed(title="❌ Posición no válida. Canciones recientes:", description=lines, color=discord.Color.red()))
+                return
+
+            if await self.resolve_entry(entry) is None:
+                await self.reply(ctx, "❌ No se pudo recuperar la canción.")
+                return
+            # Suena justo después de la actual; con el reproductor parado (aunque quede
+            # cola) empieza ya, y detrás sigue el resto de la cola
+            self.get_queue(guild_id).put_first(entry)
+            self.queue_store.mark_queue(guild_id)
+            if player.current:
+                title = "🔁 Sonará a continuación"
+            else:
+                await self.play_next(player)
+                if not player.current:
+                    await self.reply(ctx, "❌ Ocurrió un error al reproducir la canción.")
+                    return
+                title = "🔁 Reproduciendo de nuevo"
+
+        embed = discord.Embed(title=title, description=f"**{entry.title}**\nDuración: {self.format_time(entry.length)}", color=discord.Color.blue())
+        await self.reply(ctx, embed=embed)
+
+    @commands.hybrid_command(name="queue", description="Muestra la cola de reproducción.")
+    @app_commands.describe(page="Página de la cola a mostrar")
+    async def queue_(self, ctx: commands.Context, page: int = 1):
+        player: wavelink.Player | None = ctx.voice_client
+        if not player:
+            await self.reply(ctx, "❌ No estoy conectado a un canal de voz.")
             return
 
         queue = self.get_queue(ctx.guild.id)
         current_track = player.current
 
         if not current_track and not queue:
-            await ctx.send("❌ No hay canciones en la cola ni reproduciéndose.")
+            await self.reply(ctx, "❌ No hay canciones en la cola ni reproduciéndose.")
             return
         
         embed = discord.Embed(title="🎵 Cola de reproducción", color=discord.Color.blue())
@@ -458,31 +1333,99 @@ class Music(commands.Cog):
             )
 
         if queue:
-            total_duration = sum(track.length for track in queue if track.length is not None)
+            per_page = 10
+            total_pages = (len(queue) + per_page - 1) // per_page
+            page = max(1, min(page, total_pages))
+
+            # Lo que falta de la canción actual se suma a la espera de cada entrada
+            remaining_current = 0
+            if current_track and current_track.length:
+                remaining_current = max(0, current_track.length - player.position)
+
             queue_text = ""
-            for i, track in enumerate(queue[:10], 1):
-                queue_text += f"{i}. **{track.title}** - {self.format_time(track.length)}\n"
-            
-            if len(queue) > 10:
-                queue_text += f"\n...y {len(queue) - 10} canciones más"
+            for i, track, wait in queue.page(page, per_page):
+                queue_text += f"{i}. **{track.title}** - {self.format_time(track.length)} (en {self.format_time(remaining_current + wait)})\n"
             
             embed.add_field(
-                name="📋 Próximas canciones",
+                name=f"📋 Próximas canciones (página {page}/{total_pages})",
                 value=queue_text if queue_text else "Nada más en la cola.",
                 inline=False
             )
+            total_duration = queue.total_duration
             if total_duration > 0:
                 embed.add_field(
                     name="⏱️ Duración total de la cola",
-                    value=self.format_time(total_duration),
+                    value=f"{self.format_time(total_duration)} ({len(queue)} canciones, termina en {self.format_time(remaining_current + total_duration)})",
+                    inline=False
+                )
+            pending = self.pending_tracks.get(ctx.guild.id)
+            if pending:
+                embed.add_field(
+                    name="📥 Cargando playlist",
+                    value=f"{len(pending)} canciones más se añadirán a la cola a medida que avance.",
                     inline=False
                 )
+            if total_pages > 1:
+                embed.set_footer(text=f"Usa queue <página> para ver más ({total_pages} páginas)")
         elif not current_track:
             embed.description = "La cola está vacía y nada se está reproduciendo."
 
-        await ctx.send(embed=embed)
+        await self.reply(ctx, embed=embed)
 
-    @commands.command(name="info", aliases=['np', 'nowplaying'])
+    @commands.hybrid_command(name="shuffle", description="Mezcla las canciones de la cola.")
+    async def shuffle_(self, ctx: commands.Context):
+        """Mezcla las canciones de la cola, incluidas las de playlists que aún se están cargando."""
+        queue = self.get_queue(ctx.guild.id)
+        pending = self.pending_tracks.get(ctx.guild.id)
+        total = len(queue) + (len(pending) if pending else 0)
+        if total < 2:
+            await self.reply(ctx, "❌ No hay suficientes canciones en la cola para mezclar.")
+            return
+
+        if pending:
+            pending.shuffle_with(queue)
+        else:
+            queue.shuffle()
+        self.queue_store.mark_queue(ctx.guild.id)
+        embed = discord.Embed(title="🔀 Cola mezclada", description=f"Se mezclaron {total} canciones.", color=discord.Color.blue())
+        await self.reply(ctx, embed=embed)
+
+    @commands.hybrid_command(name="remove", description="Elimina una canción de la cola.")
+    @app_commands.describe(position="Posición de la canción en la cola")
+    async def remove_(self, ctx: commands.Context, position: int):
+        """Elimina de la cola la canción en la posición indicada.
+
+        Las posiciones son las que muestra ``queue``: las canciones de una
+        playlist que aún se está cargando no se pueden elegir hasta que entren.
+        """
+        queue = self.get_queue(ctx.guild.id)
+        if not 1 <= position <= len(queue):
+            await self.reply(ctx, f"❌ Posición inválida. La cola tiene {len(queue)} canciones.")
+            return
+
+        track = queue.remove(position - 1)
+        self.queue_store.mark_queue(ctx.guild.id)
+        embed = discord.Embed(title="🗑️ Canción eliminada de la cola", description=f"**{track.title}**", color=discord.Color.blue())
+        await self.reply(ctx, embed=embed)
+
+    @commands.hybrid_command(name="move", description="Mueve una canción de la cola a otra posición.")
+    @app_commands.describe(source="Posición actual de la canción", destination="Nueva posición en la cola")
+    async def move_(self, ctx: commands.Context, source: int, destination: int):
+        """Mueve una canción de la cola a otra posición.
+
+        Como en ``remove``, solo entre las canciones ya cargadas en la cola.
+        """
+        queue = self.get_queue(ctx.guild.id)
+        if not 1 <= source <= len(queue) or not 1 <= destination <= len(queue):
+            await self.reply(ctx, f"❌ Posición inválida. La cola tiene {len(queue)} canciones.")
+            return
+
+        track = queue.move(source - 1, destination - 1)
+        self.queue_store.mark_queue(ctx.guild.id)
+        embed = discord.Embed(title="↕️ Canción movida", description=f"**{track.title}** ahora está en la posición {destination}.", color=discord.Color.blue())
+        await self.reply(ctx, embed=embed)
+
+    @commands.hybrid_command(name="info", aliases=['np', 'nowplaying'], description="Muestra la canción que se está reproduciendo.")
     async def info_(self, ctx: commands.Context):
         """Muestra información sobre la canción que se está reproduciendo actualmente."""
         player: wavelink.Player | None = ctx.voice_client
@@ -494,98 +1437,12 @@ class Music(commands.Cog):
                 description="No hay ninguna canción reproduciéndose actualmente.", 
                 color=embed_color
             )
-            await ctx.send(embed=embed)
+            await self.reply(ctx, embed=embed)
             return
 
-        track: wavelink.Playable = player.current
-        position = self.format_time(player.position)
-        duration = self.format_time(track.length)
-        
-        description_lines = []
-        if track.author and track.author != "Unknown Artist":
-            description_lines.append(f"**Artista:** {track.author}")
-        
-        description_lines.append(f"**Duración:** {position} / {duration}")
-        
-        if track.uri:
-            description_lines.append(f"**Fuente:** [Click aquí]({track.uri})")
-        else:
-            description_lines.append("**Fuente:** No disponible")
-
-        embed = discord.Embed(
-            title=f"▶️ Reproduciendo ahora: {track.title}",
-            description="\n".join(description_lines),
-            color=embed_color
-        )
-
-        if hasattr(track, 'artwork') and track.artwork:
-            embed.set_thumbnail(url=track.artwork)
-        elif hasattr(track, 'album') and hasattr(track.album, 'artwork') and track.album.artwork: # Para algunas fuentes como Spotify
-             embed.set_thumbnail(url=track.album.artwork)
-
-
-        await ctx.send(embed=embed)
-
-    # Slash commands
-    @app_commands.command(name="play", description="Reproduce música de YouTube o Spotify!")
-    async def play_slash(self, interaction: discord.Interaction, search: str):
-        mock_message = discord.Object(id=interaction.id)
-        mock_message.author = interaction.user
-        mock_message.channel = interaction.channel
-        mock_message.guild = interaction.guild
-        ctx = await self.bot.get_context(mock_message)
-        ctx.voice_client = interaction.guild.voice_client
-        await self.play_(ctx, search=search)
-
-    @app_commands.command(name="stop", description="Detén la música.")
-    async def stop_slash(self, interaction: discord.Interaction):
-        mock_message = discord.Object(id=interaction.id)
-        mock_message.author = interaction.user
-        mock_message.channel = interaction.channel
-        mock_message.guild = interaction.guild
-        ctx = await self.bot.get_context(mock_message)
-        ctx.voice_client = interaction.guild.voice_client
-        await self.stop_(ctx)
-
-    @app_commands.command(name="pause", description="Pausa la música.")
-    async def pause_slash(self, interaction: discord.Interaction):
-        mock_message = discord.Object(id=interaction.id)
-        mock_message.author = interaction.user
-        mock_message.channel = interaction.channel
-        mock_message.guild = interaction.guild
-        ctx = await self.bot.get_context(mock_message)
-        ctx.voice_client = interaction.guild.voice_client
-        await self.pause_(ctx)
-
-    @app_commands.command(name="resume", description="Reanuda la música pausada.")
-    async def resume_slash(self, interaction: discord.Interaction):
-        mock_message = discord.Object(id=interaction.id)
-        mock_message.author = interaction.user
-        mock_message.channel = interaction.channel
-        mock_message.guild = interaction.guild
-        ctx = await self.bot.get_context(mock_message)
-        ctx.voice_client = interaction.guild.voice_client
-        await self.resume_(ctx)
-
-    @app_commands.command(name="skip", description="Salta la canción actual.")
-    async def skip_slash(self, interaction: discord.Interaction):
-        mock_message = discord.Object(id=interaction.id)
-        mock_message.author = interaction.user
-        mock_message.channel = interaction.channel
-        mock_message.guild = interaction.guild
-        ctx = await self.bot.get_context(mock_message)
-        ctx.voice_client = interaction.guild.voice_client
-        await self.skip_(ctx)
-
-    @app_commands.command(name="queue", description="Muestra la cola de reproducción.")
-    async def queue_slash(self, interaction: discord.Interaction):
-        mock_message = discord.Object(id=interaction.id)
-        mock_message.author = interaction.user
-        mock_message.channel = interaction.channel
-        mock_message.guild = interaction.guild
-        ctx = await self.bot.get_context(mock_message)
-        ctx.voice_client = interaction.guild.voice_client
-        await self.queue_(ctx)
+        # La respuesta pasa a ser el panel del servidor y se sigue editando
+        msg = await self.reply(ctx, embed=self.now_playing_embed(player))
+        self.now_playing.adopt(ctx.guild.id, msg)
 
     @commands.command(name="lavalink")
     async def lavalink_info(self, ctx: commands.Context):
@@ -623,135 +1480,230 @@ class Music(commands.Cog):
             except:
                 embed.add_field(name="📦 Wavelink versión", value="No disponible", inline=True)
                 
-            # Estadísticas del nodo si están disponibles
-            if hasattr(node, '_stats') and node._stats:
-                stats = node._stats
-                embed.add_field(name="💾 RAM usada", value=f"{stats.get('memory', {}).get('used', 'N/A')}", inline=True)
-                embed.add_field(name="🔧 CPU", value=f"{stats.get('cpu', {}).get('cores', 'N/A')} cores", inline=True)
-                embed.add_field(name="⏱️ Uptime", value=f"{stats.get('uptime', 'N/A')}ms", inline=True)
-            
-            await ctx.send(embed=embed)
+            # Última muestra del recolector de estadísticas
+            load = self.node_balancer.history.latest(node.identifier)
+            if load:
+                embed.add_field(
+                    name="💾 Memoria JVM",
+                    value=f"{load.memory_used / 1048576:.0f} / {load.memory_reservable / 1048576:.0f} MB ({load.heap_usage:.0%})",
+                    inline=True
+                )
+                embed.add_field(name="🔧 CPU", value=f"{load.cores} cores · {load.system_load:.0%} sistema · {load.lavalink_load:.0%} Lavalink", inline=True)
+                embed.add_field(name="⏱️ Uptime", value=self.format_time(load.uptime), inline=True)
+                if load.frames_sent or load.frames_deficit or load.frames_nulled:
+                    embed.add_field(
+                        name="🎞️ Frames (último minuto)",
+                        value=f"Enviados: {load.frames_sent} · Nulos: {load.frames_nulled} · Déficit: {load.frames_deficit}",
+                        inline=False
+                    )
             
-            # Información adicional en consola para debugging
-            print(f"[LAVALINK DEBUG] URI: {node.uri}")
-            print(f"[LAVALINK DEBUG] Estado: {'Conectado' if node.status else 'Desconectado'}")
-            print(f"[LAVALINK DEBUG] Atributos del nodo: {dir(node)}")
-            if hasattr(node, '_stats'):
-                print(f"[LAVALINK DEBUG] Estadísticas: {node._stats}")
+            gaps = self.gap_stats()
+            if gaps:
+                embed.add_field(
+                    name="⏯️ Silencio entre canciones",
+                    value=f"Media: {gaps['mean']:.0f} ms · p95: {gaps['p95']:.0f} ms · Máx: {gaps['max']:.0f} ms ({gaps['count']} cambios)",
+                    inline=False
+                )
+
+            latency_lines = []
+            for path, label in (("prefix", "Prefijo"), ("slash", "Slash")):
+                latency = self.summarize(self.command_latency[path])
+                if latency:
+                    latency_lines.append(f"{label}: p50 {latency['p50']:.0f} ms · p95 {latency['p95']:.0f} ms ({latency['count']} comandos)")
+            if latency_lines:
+                embed.add_field(name="⌨️ Comando → primera respuesta", value="\n".join(latency_lines), inline=False)
+
+            panel_stats = self.now_playing.stats()
+            embed.add_field(
+                name="🪧 Panel de reproducción",
+                value=(
+                    f"{panel_stats['panels']} paneles · {panel_stats['sends']} envíos · {panel_stats['edits']} ediciones\n"
+                    f"Peticiones agrupadas: {panel_stats['requested']} → {panel_stats['delivered']}"
+                ),
+                inline=False
+            )
+
+            cache_stats = self.search_cache.stats()
+            embed.add_field(
+                name="🗃️ Caché de búsquedas",
+                value=(
+                    f"{cache_stats['entries']} búsquedas / {cache_stats['tracks']} canciones\n"
+                    f"Aciertos: {cache_stats['hits']} ({cache_stats['hit_rate']:.0%}) · "
+                    f"Fallos: {cache_stats['misses']} · Agrupadas: {cache_stats['collapsed']}"
+                ),
+                inline=False
+            )
             
+            await ctx.send(embed=embed)
+
         except Exception as e:
             await ctx.send(f"❌ Error al obtener información de Lavalink: {e}")
             print(f"[LAVALINK ERROR] {e}")
 
-    async def check_voice_state_loop(self):
-        """Tarea de verificación periódica del estado de los canales de voz"""
-        await self.bot.wait_until_ready()
-        # Esperar 2 minutos adicionales después de que el bot esté listo para evitar desconexiones inmediatas
-        await asyncio.sleep(120)
-        
-        try:
-            while not self.bot.is_closed():
-                for guild in self.bot.guilds:
-                    # Comprobar si el bot está en un canal de voz
-                    if not guild.voice_client or not isinstance(guild.voice_client, wavelink.Player):
-                        continue
-                    
-                    player = guild.voice_client
-                    channel = player.channel
-                    
-                    # Si no hay canal (extraño pero posible), continuar
-                    if not channel:
-                        continue
-                    
-                    # Contar miembros humanos en el canal de voz
-                    human_members = [m for m in channel.members if not m.bot]
-                    
-                    print(f"[VOICE CHECK] Guild: {guild.name}, Humanos: {len(human_members)}, Reproduciendo: {player.current is not None}")
-                    
-                    # Si está reproduciendo activamente música, resetear cualquier temporizador
-                    if player.current:
-                        if guild.id in self.disconnect_timers:
-                            print(f"[VOICE CHECK] Cancelando temporizador para {guild.name} - música activa")
-                            # Cancelar temporizador si existe
-                            self.disconnect_timers[guild.id].cancel()
-                            self.disconnect_timers.pop(guild.id, None)
-                        continue
-                    
-                    # Caso 1: Bot solo en el canal - esperar 5 minutos
-                    if len(human_members) == 0:
-                        if guild.id not in self.disconnect_timers:
-                            print(f"[VOICE CHECK] Bot solo en el canal de voz en {guild.name}. Programando desconexión en 5 minutos.")
-                            self.disconnect_timers[guild.id] = self.bot.loop.create_task(
-                                self.disconnect_after(player, 5 * 60, guild.id)
-                            )
-                    
-                    # Caso 2: Bot con otros usuarios pero sin reproducir - esperar 15 minutos
-                    elif not player.current:
-                        if guild.id not in self.disconnect_timers:
-                            print(f"[VOICE CHECK] Bot inactivo con usuarios en el canal en {guild.name}. Programando desconexión en 15 minutos.")
-                            self.disconnect_timers[guild.id] = self.bot.loop.create_task(
-                                self.disconnect_after(player, 15 * 60, guild.id)
-                            )
-                
-                # Esperar 60 segundos antes de la próxima verificación (aumentado de 30s)
-                await asyncio.sleep(60)
-        except asyncio.CancelledError:
-            print("[VOICE CHECK] Tarea de verificación cancelada")
-            pass
-        except Exception as e:
-            print(f"[VOICE CHECK] Error en la tarea de verificación de canales de voz: {e}")
+    @commands.command(name="nodes")
+    async def nodes_(self, ctx: commands.Context):
+        """Muestra la carga de cada nodo de Lavalink"""
+        nodes = list(wavelink.Pool.nodes.values())
+        if not nodes:
+            await ctx.send("❌ No hay nodos de Lavalink conectados.")
+            return
+
+        best = self.select_node()
+        embed = discord.Embed(title="🔗 Nodos de Lavalink", color=discord.Color.blue())
+        for node in nodes:
+            load = self.node_balancer.loads.get(node.identifier)
+            if not self.node_balancer.is_connected(node):
+                state = "🔴 Desconectado"
+            elif node.identifier in self.node_balancer.unreachable:
+                state = "🔴 Sin respuesta"
+            elif node.identifier in self.node_balancer.draining:
+                state = "🟡 Drenando"
+            else:
+                state = "🟢 Conectado"
+            lines = [state, f"Reproductores: {len(node.players)}"]
+            if load:
+                lines.append(f"CPU: {load.system_load:.0%} · Déficit de frames: {load.frames_deficit}")
+                lines.append(f"Carga: {self.node_balancer.score(node):.1f}")
+            if node is best:
+                lines.append("⭐ Próximo nodo para reproductores nuevos")
+            embed.add_field(name=f"{node.identifier} ({node.uri})", value="\n".join(lines), inline=False)
+        await ctx.send(embed=embed)
 
-    async def disconnect_after(self, player: wavelink.Player, seconds: int, guild_id: int):
-        """Desconecta al bot después de un tiempo determinado si no se reanuda la reproducción"""
+    @commands.command(name="nodeadd")
+    @commands.is_owner()
+    async def node_add(self, ctx: commands.Context, uri: str, password: Optional[str] = None):
+        """Conecta un nodo de Lavalink nuevo sin reiniciar el bot"""
+        identifier = f"node-{len(wavelink.Pool.nodes) + 1}"
+        while identifier in wavelink.Pool.nodes:
+            identifier += "+"
+        password = password or os.environ.get("LAVALINK_PASSWORD", "youshallnotpass")
+        # Sondear antes: el websocket de wavelink reintenta para siempre si no hay nadie escuchando
         try:
-            # Esperar el tiempo especificado
-            await asyncio.sleep(seconds)
-            
-            # Verificar si el bot sigue conectado y si sigue sin reproducir
-            if (player.guild and player.guild.voice_client == player and 
-                not player.current):
-                
-                # Enviar mensaje si hay un canal de texto asociado
-                if hasattr(player, 'text_channel') and player.text_channel:
-                    try:
-                        minutes = seconds // 60
-                        embed = discord.Embed(
-                            title="🎵 Desconexión automática",
-                            description=f"Me he desconectado después de {minutes} minutos de inactividad.",
-                            color=discord.Color.blue(),
-                            timestamp=datetime.now()
-                        )
-                        await player.text_channel.send(embed=embed)
-                    except Exception as e:
-                        print(f"Error al enviar mensaje de desconexión: {e}")
-                
-                # Limpiar cola
-                if guild_id in self.queues:
-                    self.queues[guild_id] = []
-                
-                # Desconectar
-                await player.disconnect()
-                print(f"Bot desconectado por inactividad en servidor {guild_id}")
-            
-        except asyncio.CancelledError:
-            # Tarea cancelada - probablemente porque se reanudó la música
-            pass
+            await wait_for_lavalink(uri, password, timeout=self.NODE_ADD_TIMEOUT)
+        except asyncio.TimeoutError:
+            await ctx.send(f"❌ Lavalink en {uri} no respondió en {self.NODE_ADD_TIMEOUT} s (¿dirección o contraseña incorrectas?).")
+            return
+        node = self.new_node(identifier, uri, password)
+        try:
+            connected = await asyncio.wait_for(self.open_node(node), timeout=self.NODE_ADD_TIMEOUT)
         except Exception as e:
-            print(f"Error en temporizador de desconexión: {e}")
-        finally:
-            # Limpiar referencia del temporizador
-            self.disconnect_timers.pop(guild_id, None)
+            await node.close(eject=True)
+            await ctx.send(f"❌ No se pudo conectar el nodo: {str(e) or 'tiempo de espera agotado'}")
+            return
+        if not connected:
+            await ctx.send("❌ Lavalink rechazó la conexión (¿contraseña incorrecta?).")
+            return
+        await self.node_balancer.refresh([node])
+        await ctx.send(f"✅ Nodo **{identifier}** conectado ({uri}).")
 
-    def cog_unload(self):
+    @commands.command(name="nodedrain")
+    @commands.is_owner()
+    async def node_drain(self, ctx: commands.Context, identifier: str):
+        """Deja de usar un nodo: mueve sus reproductores a otros nodos y lo cierra"""
+        node = wavelink.Pool.nodes.get(identifier)
+        if not node:
+            await ctx.send(f"❌ No existe el nodo **{identifier}**.")
+            return
+
+        self.node_balancer.draining.add(identifier)
+        moved = 0
+        for player in list(node.players.values()):
+            if not self.select_node():
+                break
+            if await self.migrate_player(player, exclude=node):
+                moved += 1
+
+        if node.players:
+            await ctx.send(f"🟡 Nodo **{identifier}** en drenaje: {moved} reproductores movidos, {len(node.players)} siguen en él.")
+            return
+
+        await node.close(eject=True)
+        self.node_balancer.forget(identifier)
+        self.node_down_since.pop(identifier, None)
+        await ctx.send(f"✅ Nodo **{identifier}** drenado ({moved} reproductores movidos) y desconectado.")
+
+    def update_idle_state(self, player: wavelink.Player, playing: Optional[bool] = None):
+        """Programa o cancela la desconexión por inactividad de un servidor.
+
+        Se llama desde los eventos de voz y de canciones, así que solo se
+        revisan los servidores con un reproductor activo y en el momento en
+        que algo cambia.
+        """
+        guild = player.guild
+        channel = player.channel
+        if not guild or not channel:
+            return
+        if playing is None:
+            playing = player.current is not None
+
+        # Si está reproduciendo activamente música, no hay temporizador
+        if playing:
+            if guild.id in self.idle_tracker:
+                print(f"[IDLE] Cancelando temporizador para {guild.name} - música activa")
+            self.idle_tracker.cancel(guild.id)
+            return
+
+        humans = sum(1 for m in channel.members if not m.bot)
+        # Caso 1: Bot solo en el canal - esperar 5 minutos
+        # Caso 2: Bot con otros usuarios pero sin reproducir - esperar 15 minutos
+        seconds = self.IDLE_ALONE_TIMEOUT if humans == 0 else self.IDLE_TIMEOUT
+        if self.idle_tracker.scheduled(guild.id) != seconds:
+            print(f"[IDLE] {guild.name}: {humans} usuarios y sin reproducir. Desconexión en {seconds // 60} minutos.")
+            self.idle_tracker.schedule(guild.id, seconds)
+
+    async def disconnect_idle(self, guild_id: int, seconds: int):
+        """Desconecta al bot cuando vence el temporizador de inactividad"""
+        guild = self.bot.get_guild(guild_id)
+        player = guild.voice_client if guild else None
+        # Verificar si el bot sigue conectado y si sigue sin reproducir
+        if not isinstance(player, wavelink.Player) or player.current:
+            return
+
+        # Enviar mensaje si hay un canal de texto asociado
+        if hasattr(player, 'text_channel') and player.text_channel:
+            try:
+                minutes = seconds // 60
+                embed = discord.Embed(
+                    title="🎵 Desconexión automática",
+                    description=f"Me he desconectado después de {minutes} minutos de inactividad.",
+                    color=discord.Color.blue(),
+                    timestamp=datetime.now()
+                )
+                await player.text_channel.send(embed=embed)
+            except Exception as e:
+                print(f"Error al enviar mensaje de desconexión: {e}")
+
+        async with self.guild_locks(guild_id):
+            # Alguien pudo poner música mientras se enviaba el aviso
+            if player.current:
+                return
+
+            # Limpiar cola
+            self.clear_guild_queue(guild_id)
+            self.playback_snapshots.pop(guild_id, None)
+            self.track_end_times.pop(guild_id, None)
+            self.now_playing.forget(guild_id, getattr(player, 'text_channel', None))
+
+            # Desconectar
+            await player.disconnect()
+            await self.queue_store.delete(guild_id)
+        self.guild_locks.discard(guild_id)
+        print(f"Bot desconectado por inactividad en servidor {guild_id}")
+
+    async def cog_unload(self):
         """Limpieza al descargar el cog"""
         # Cancelar tareas programadas
-        if hasattr(self, 'check_voice_state_task') and self.check_voice_state_task:
-            self.check_voice_state_task.cancel()
+        if self.node_stats_task:
+            self.node_stats_task.cancel()
         
         # Cancelar todos los temporizadores de desconexión
-        for timer in self.disconnect_timers.values():
-            timer.cancel()
-        self.disconnect_timers.clear()
+        self.idle_tracker.stop()
+        await self.outbox.stop()
+        if self.spotify:
+            await self.spotify.api.close()
+
+        # Escribir el estado pendiente antes de salir
+        await self.queue_store.stop()
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Music(bot))
\ No newline at end of file
@@ -0,0 +1,193 @@
+import random
+from collections import deque
+from itertools import accumulate, islice
+from typing import Any, Iterable, Iterator, Optional
+
+
+class MusicQueue:
+    """Cola de reproducción por servidor respaldada por un deque.
+
+    Sacar y añadir por los extremos es O(1), a diferencia de ``list.pop(0)``
+    que desplaza toda la lista en cada canción. Un índice de sumas acumuladas
+    da en O(1) la duración total y cuánto falta para que empiece cualquier
+    canción; sacar canciones solo avanza su inicio, y tras reordenar la cola
+    se reconstruye la próxima vez que se consulta.
+    """
+
+    # Entradas consumidas que se toleran al inicio del índice antes de compactarlo
+    COMPACT_THRESHOLD = 1024
+
+    def __init__(self, tracks: Optional[Iterable[Any]] = None):
+        self._items: deque = deque()
+        # _prefix[k] es la suma de las duraciones de las k primeras canciones
+        # contando desde _offset; None si hay que reconstruirlo
+        self._prefix: Optional[list[int]] = [0]
+        self._offset = 0
+        if tracks:
+            self.extend(tracks)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __bool__(self) -> bool:
+        return bool(self._items)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._items)
+
+    def __getitem__(self, index: int) -> Any:
+        return self._items[index]
+
+    @staticmethod
+    def track_length(track: Any) -> int:
+        """Duración de una canción en milisegundos (0 si no se conoce)"""
+        return getattr(track, "length", None) or 0
+
+    @staticmethod
+    def track_lengths(tracks: Iterable[Any]) -> list[int]:
+        """Duraciones de varias canciones (como track_length, sin una llamada por canción)"""
+        return [getattr(track, "length", None) or 0 for track in tracks]
+
+    @property
+    def total_duration(self) -> int:
+        """Duración total de la cola en milisegundos"""
+        if self._prefix is None:
+            self._rebuild_prefix()
+        return self._prefix[-1] - self._prefix[self._offset]
+
+    def put(self, track: Any) -> None:
+        """Añade una canción al final de la cola"""
+        self._items.append(track)
+        if self._prefix is not None:
+            self._prefix.append(self._prefix[-1] + self.track_length(track))
+
+    def put_first(self, track: Any) -> None:
+        """Añade una canción al principio de la cola"""
+        self._items.appendleft(track)
+        self._prefix = None
+
+    def extend(self, tracks: Iterable[Any]) -> int:
+        """Añade varias canciones al final de la cola y devuelve cuántas se añadieron"""
+        tracks = list(tracks)
+        self._items.extend(tracks)
+        if self._prefix is not None:
+            # El último valor sirve de inicio de accumulate y vuelve a entrar como primer elemento
+            self._prefix.extend(accumulate(self.track_lengths(tracks), initial=self._prefix.pop()))
+        return len(tracks)
+
+    def get(self) -> Optional[Any]:
+        """Saca la siguiente canción de la cola, o None si está vacía"""
+        if not self._items:
+            return None
+        if self._prefix is not None:
+            self._offset += 1
+            if self._offset > self.COMPACT_THRESHOLD and self._offset * 2 > len(self._prefix):
+                base = self._prefix[self._offset]
+                self._prefix = [value - base for value in self._prefix[self._offset:]]
+                self._offset = 0
+        return self._items.popleft()
+
+    def peek(self, index: int = 0) -> Optional[Any]:
+        """Devuelve la canción en la posición indicada sin sacarla"""
+        if -len(self._items) <= index < len(self._items):
+            return self._items[index]
+        return None
+
+    def slice(self, start: int, stop: int) -> list:
+        """Devuelve las canciones entre start y stop sin copiar toda la cola"""
+        return list(islice(self._items, start, stop))
+
+    def remove(self, index: int) -> Any:
+        """Elimina y devuelve la canción en la posición indicada (base 0)"""
+        if not -len(self._items) <= index < len(self._items):
+            raise IndexError("Posición fuera de la cola")
+        if index < 0:
+            index += len(self._items)
+        # rotate deja el elemento en un extremo, así el borrado es O(min(i, n - i))
+        self._items.rotate(-index)
+        track = self._items.popleft()
+        self._items.rotate(index)
+        self._prefix = None
+        return track
+
+    def move(self, src: int, dst: int) -> Any:
+        """Mueve la canción de la posición src a la posición dst (base 0)"""
+        track = self.remove(src)
+        dst = max(0, min(dst, len(self._items)))
+        self._items.insert(dst, track)
+        self._prefix = None
+        return track
+
+    def shuffle(self) -> None:
+        """Mezcla la cola en su lugar"""
+        # Barajar un deque por índice es O(n^2); se baraja una copia plana y se recarga
+        items = list(self._items)
+        random.shuffle(items)
+        self._items.clear()
+        self._items.extend(items)
+        self._prefix = None
+
+    def clear(self) -> None:
+        """Vacía la cola"""
+        self._items.clear()
+        self._prefix = [0]
+        self._offset = 0
+
+    def _rebuild_prefix(self) -> None:
+        self._prefix = list(accumulate(self.track_lengths(self._items), initial=0))
+        self._offset = 0
+
+    def time_until(self, index: int) -> int:
+        """Milisegundos de cola que deben sonar antes de que empiece la canción en index"""
+        if not 0 <= index <= len(self._items):
+            raise IndexError("Posición fuera de la cola")
+        if self._prefix is None:
+            self._rebuild_prefix()
+        return self._prefix[self._offset + index] - self._prefix[self._offset]
+
+    def page(self, page: int, per_page: int = 10) -> list[tuple[int, Any, int]]:
+        """Devuelve (posición, canción, espera en ms) para una página de la cola (base 1)"""
+        start = (page - 1) * per_page
+        return [
+            (start + i + 1, track, self.time_until(start + i))
+            for i, track in enumerate(self.slice(start, start + per_page))
+        ]
+
+
+class PendingTracks:
+    """Canciones de playlists grandes que todavía no entraron en la cola.
+
+    Se van pasando a la MusicQueue por bloques a medida que esta se vacía,
+    así la cola (y su índice de tiempos) solo contiene lo que está cerca
+    de sonar.
+    """
+
+    def __init__(self, tracks: Optional[Iterable[Any]] = None):
+        self._items: deque = deque(tracks or ())
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __bool__(self) -> bool:
+        return bool(self._items)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._items)
+
+    def extend(self, tracks: Iterable[Any]) -> None:
+        self._items.extend(tracks)
+
+    def take(self, count: int) -> list:
+        """Saca hasta count canciones del principio"""
+        count = min(count, len(self._items))
+        return [self._items.popleft() for _ in range(count)]
+
+    def shuffle_with(self, queue: MusicQueue) -> None:
+        """Mezcla estas canciones junto con las de ``queue``; la cola conserva su tamaño"""
+        items = list(queue)
+        items.extend(self._items)
+        random.shuffle(items)
+        loaded = len(queue)
+        queue.clear()
+        queue.extend(items[:loaded])
+        self._items = deque(items[loaded:])
@@ -0,0 +1,169 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Iterable, Optional
+
+
+def parse_node_list(spec: str, default_password: str) -> list[tuple[str, str, str]]:
+    """Convierte LAVALINK_NODES en una lista de (identificador, uri, contraseña).
+
+    Formato: entradas separadas por comas, cada una ``uri`` o ``uri|contraseña``.
+    Ejemplo: ``http://127.0.0.1:2333,http://10.0.0.2:2333|otraclave``
+    """
+    nodes = []
+    for index, entry in enumerate(filter(None, (part.strip() for part in spec.split(","))), 1):
+        uri, _, password = entry.partition("|")
+        nodes.append((f"node-{index}", uri.strip(), password.strip() or default_password))
+    return nodes
+
+
+class NodeLoad:
+    """Última muestra de estadísticas conocida de un nodo"""
+
+    __slots__ = ("players", "playing", "system_load", "lavalink_load", "cores",
+                 "memory_used", "memory_free", "memory_allocated", "memory_reservable", "uptime",
+                 "frames_sent", "frames_nulled", "frames_deficit", "sampled_at")
+
+    def __init__(self, stats: Any):
+        memory = getattr(stats, "memory", None)
+        cpu = getattr(stats, "cpu", None)
+        frames = getattr(stats, "frames", None)
+        self.players = getattr(stats, "players", 0) or 0
+        self.playing = getattr(stats, "playing", 0) or 0
+        self.uptime = getattr(stats, "uptime", 0) or 0
+        self.memory_used = getattr(memory, "used", 0) or 0
+        self.memory_free = getattr(memory, "free", 0) or 0
+        self.memory_allocated = getattr(memory, "allocated", 0) or 0
+        self.memory_reservable = getattr(memory, "reservable", 0) or 0
+        self.cores = getattr(cpu, "cores", 0) or 0
+        self.system_load = getattr(cpu, "system_load", 0.0) or 0.0
+        self.lavalink_load = getattr(cpu, "lavalink_load", 0.0) or 0.0
+        self.frames_sent = getattr(frames, "sent", 0) or 0
+        self.frames_nulled = getattr(frames, "nulled", 0) or 0
+        self.frames_deficit = getattr(frames, "deficit", 0) or 0
+        self.sampled_at = time.time()
+
+    @property
+    def penalty(self) -> float:
+        """Carga estimada del nodo; menor es mejor.
+
+        Misma idea que los clientes oficiales de Lavalink: cada reproductor
+        activo suma 1, la CPU del sistema crece de forma exponencial y los
+        frames perdidos o nulos (audio entrecortado) penalizan mucho más.
+        """
+        penalty = self.playing
+        penalty += 1.05 ** (100 * self.system_load) * 10 - 10
+        if self.frames_deficit or self.frames_nulled:
+            penalty += 1.03 ** (500 * (self.frames_deficit / 3000)) * 600 - 600
+            penalty += (1.03 ** (500 * (self.frames_nulled / 3000)) * 300 - 300) * 2
+        return penalty
+
+    @property
+    def heap_usage(self) -> float:
+        """Fracción del heap máximo de la JVM (-Xmx) en uso"""
+        return self.memory_used / self.memory_reservable if self.memory_reservable else 0.0
+
+    def as_dict(self) -> dict:
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data["heap_usage"] = round(self.heap_usage, 4)
+        data["penalty"] = round(self.penalty, 2)
+        return data
+
+
+class NodeStatsHistory:
+    """Últimas muestras de estadísticas de cada nodo en un búfer circular.
+
+    Cada nodo guarda como mucho ``size`` muestras; las más viejas se
+    descartan solas. Se lee desde el hilo del servidor Flask, así que las
+    lecturas copian el deque con ``list()`` (operación atómica) antes de
+    recorrerlo.
+    """
+
+    def __init__(self, size: int = 240):
+        self.size = size
+        self._samples: dict[str, deque] = {}
+
+    def append(self, identifier: str, load: NodeLoad) -> None:
+        samples = self._samples.get(identifier)
+        if samples is None:
+            samples = self._samples[identifier] = deque(maxlen=self.size)
+        samples.append(load)
+
+    def latest(self, identifier: str) -> Optional[NodeLoad]:
+        samples = self._samples.get(identifier)
+        return samples[-1] if samples else None
+
+    def recent(self, identifier: str, limit: Optional[int] = None) -> list[NodeLoad]:
+        samples = list(self._samples.get(identifier, ()))
+        return samples[-limit:] if limit else samples
+
+    def forget(self, identifier: str) -> None:
+        self._samples.pop(identifier, None)
+
+
+class NodeBalancer:
+    """Elige en qué nodo de Lavalink colocar cada reproductor nuevo.
+
+    Mantiene la última carga reportada por cada nodo y el conjunto de nodos
+    en drenaje, que siguen atendiendo a sus reproductores actuales pero no
+    reciben ninguno nuevo.
+    """
+
+    def __init__(self, history_size: int = 240):
+        self.loads: dict[str, NodeLoad] = {}
+        self.draining: set[str] = set()
+        # Nodos que dicen estar conectados pero no contestaron a la última petición de estadísticas
+        self.unreachable: set[str] = set()
+        self.history = NodeStatsHistory(history_size)
+
+    @staticmethod
+    def is_connected(node: Any) -> bool:
+        status = getattr(node, "status", None)
+        return getattr(status, "name", status) == "CONNECTED"
+
+    def is_healthy(self, node: Any) -> bool:
+        return self.is_connected(node) and node.identifier not in self.unreachable
+
+    def score(self, node: Any) -> float:
+        load = self.loads.get(node.identifier)
+        if load is None:
+            # Sin estadísticas todavía: usar los reproductores que conocemos
+            return float(len(getattr(node, "players", {}) or {}))
+        # Los reproductores creados desde la última muestra aún no aparecen en ella
+        return load.penalty + max(0, len(getattr(node, "players", {}) or {}) - load.players)
+
+    def available(self, nodes: Iterable[Any]) -> list[Any]:
+        """Nodos conectados que pueden recibir reproductores nuevos"""
+        return [node for node in nodes if self.is_healthy(node) and node.identifier not in self.draining]
+
+    def best_node(self, nodes: Iterable[Any], exclude: Optional[Any] = None) -> Optional[Any]:
+        """Devuelve el nodo disponible con menos carga, o None si no hay ninguno"""
+        candidates = [node for node in self.available(nodes) if node is not exclude]
+        if not candidates:
+            return None
+        return min(candidates, key=self.score)
+
+    def record(self, identifier: str, stats: Any) -> NodeLoad:
+        load = NodeLoad(stats)
+        self.loads[identifier] = load
+        self.history.append(identifier, load)
+        return load
+
+    def forget(self, identifier: str) -> None:
+        self.loads.pop(identifier, None)
+        self.draining.discard(identifier)
+        self.unreachable.discard(identifier)
+        self.history.forget(identifier)
+
+    async def refresh(self, nodes: Iterable[Any]) -> None:
+        """Pide las estadísticas a todos los nodos conectados a la vez"""
+        nodes = [node for node in nodes if self.is_connected(node)]
+        results = await asyncio.gather(*(node.fetch_stats() for node in nodes), return_exceptions=True)
+        for node, stats in zip(nodes, results):
+            if isinstance(stats, Exception):
+                print(f"[NODES] No se pudieron obtener estadísticas de {node.identifier}: {stats}")
+                self.loads.pop(node.identifier, None)
+                self.unreachable.add(node.identifier)
+            else:
+                self.unreachable.discard(node.identifier)
+                self.record(node.identifier, stats)
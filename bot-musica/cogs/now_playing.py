@@ -0,0 +1,140 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+import discord
+
+
+class ChannelOutbox:
+    """Envíos a Discord agrupados por canal con rebote (debounce).
+
+    Cada envío se registra con una clave; si llega otro con la misma clave
+    antes de que se vacíe el canal, solo se ejecuta el último. Una única
+    tarea por canal espera ``delay`` segundos desde el primer envío pendiente
+    y luego ejecuta lo acumulado en orden.
+    """
+
+    def __init__(self, delay: float = 1.5):
+        self.delay = delay
+        self._pending: dict[int, dict[Hashable, Callable[[], Awaitable[Any]]]] = {}
+        self._tasks: dict[int, asyncio.Task] = {}
+        self.submitted = 0
+        self.sent = 0
+
+    def submit(self, channel_id: int, key: Hashable, action: Callable[[], Awaitable[Any]]) -> None:
+        pending = self._pending.setdefault(channel_id, {})
+        # Reinsertar para que el orden sea el del último envío
+        pending.pop(key, None)
+        pending[key] = action
+        self.submitted += 1
+        if channel_id not in self._tasks:
+            self._tasks[channel_id] = asyncio.get_running_loop().create_task(self._drain(channel_id))
+
+    def discard(self, channel_id: int, key: Hashable) -> None:
+        pending = self._pending.get(channel_id)
+        if pending:
+            pending.pop(key, None)
+
+    async def _drain(self, channel_id: int) -> None:
+        try:
+            while True:
+                await asyncio.sleep(self.delay)
+                actions = self._pending.pop(channel_id, None)
+                if not actions:
+                    return
+                for action in actions.values():
+                    try:
+                        await action()
+                        self.sent += 1
+                    except Exception as e:
+                        print(f"[OUTBOX] Error al enviar al canal {channel_id}: {e}")
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._tasks.pop(channel_id, None)
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        self._tasks.clear()
+        self._pending.clear()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class NowPlayingPanels:
+    """Un único mensaje de "Reproduciendo ahora" por servidor, editado en el sitio.
+
+    ``render(guild_id)`` construye el embed con el estado del momento en que
+    se envía, no en el que se pidió, así varias peticiones seguidas terminan
+    en una sola edición. El panel solo cambia al empezar una canción y al
+    pausar o reanudar; con ``progress_interval`` > 0 además se refresca la
+    barra de progreso como mucho una vez cada tantos segundos.
+    """
+
+    def __init__(self, outbox: ChannelOutbox, render: Callable[[int], Optional[discord.Embed]],
+                 progress_interval: float = 0):
+        self.outbox = outbox
+        self.render = render
+        self.progress_interval = progress_interval
+        self._messages: dict[int, discord.Message] = {}
+        self._updated_at: dict[int, float] = {}
+        self.sends = 0
+        self.edits = 0
+
+    def adopt(self, guild_id: int, message: discord.Message) -> None:
+        """Usa un mensaje ya enviado (p. ej. la respuesta de play) como panel"""
+        # Las respuestas a comandos de barra se editan con el token de la interacción,
+        # que caduca a los 15 minutos; el panel será un mensaje normal del canal
+        if isinstance(message, (discord.InteractionMessage, discord.WebhookMessage)):
+            return
+        self._messages[guild_id] = message
+
+    def update(self, guild_id: int, channel: Optional[discord.abc.Messageable]) -> None:
+        """Pide refrescar el panel; se agrupa con las demás peticiones del canal"""
+        if channel is None:
+            return
+        self._updated_at[guild_id] = time.monotonic()
+        self.outbox.submit(channel.id, ("now_playing", guild_id), lambda: self._publish(guild_id, channel))
+
+    def progress(self, guild_id: int, channel: Optional[discord.abc.Messageable]) -> None:
+        """Refresca la barra de progreso como mucho una vez por intervalo (si está activado)"""
+        if self.progress_interval <= 0:
+            return
+        updated_at = self._updated_at.get(guild_id)
+        if guild_id not in self._messages or (updated_at and time.monotonic() - updated_at < self.progress_interval):
+            return
+        self.update(guild_id, channel)
+
+    def forget(self, guild_id: int, channel: Optional[discord.abc.Messageable] = None) -> None:
+        """Deja de seguir el panel del servidor (el mensaje queda como está)"""
+        self._messages.pop(guild_id, None)
+        self._updated_at.pop(guild_id, None)
+        if channel is not None:
+            self.outbox.discard(channel.id, ("now_playing", guild_id))
+
+    async def _publish(self, guild_id: int, channel: discord.abc.Messageable) -> None:
+        embed = self.render(guild_id)
+        if embed is None:
+            return
+        message = self._messages.get(guild_id)
+        if message is not None and message.channel.id == channel.id:
+            try:
+                await message.edit(embed=embed)
+                self.edits += 1
+                return
+            except discord.HTTPException as e:
+                # Panel borrado, sin permisos o ya no editable: se publica uno nuevo
+                print(f"[NOW PLAYING] No se pudo editar el panel de {guild_id} ({e.status}), se envía otro")
+                self._messages.pop(guild_id, None)
+        self._messages[guild_id] = await channel.send(embed=embed)
+        self.sends += 1
+
+    def stats(self) -> dict:
+        return {
+            "panels": len(self._messages),
+            "sends": self.sends,
+            "edits": self.edits,
+            "requested": self.outbox.submitted,
+            "delivered": self.outbox.sent,
+        }
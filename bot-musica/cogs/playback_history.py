@@ -0,0 +1,87 @@
+from collections import OrderedDict, deque
+from typing import Any, Optional
+
+from cogs.queued_track import QueuedTrack
+
+
+class PlaybackHistory:
+    """Últimas canciones reproducidas en cada servidor, en forma compacta.
+
+    Cada servidor tiene un búfer circular de ``per_guild`` entradas
+    (``QueuedTrack``, sin el Playable completo). Además hay un tope global
+    ``max_total``: al pasarlo se descartan primero las entradas más antiguas
+    del servidor que lleva más tiempo sin reproducir nada.
+    """
+
+    def __init__(self, per_guild: int = 50, max_total: int = 10_000):
+        self.per_guild = per_guild
+        self.max_total = max_total
+        # Servidores ordenados por última canción (el primero es el más inactivo)
+        self._guilds: OrderedDict[int, deque] = OrderedDict()
+        self._total = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return self._total
+
+    def push(self, guild_id: int, track: Any) -> None:
+        """Registra una canción que acaba de empezar"""
+        entry = QueuedTrack.from_playable(track)
+        if not entry.encoded:
+            return
+        history = self._guilds.get(guild_id)
+        if history is None:
+            history = self._guilds[guild_id] = deque(maxlen=self.per_guild)
+        self._guilds.move_to_end(guild_id)
+        # La misma canción reanudada (migración, restauración) no se repite
+        if history and history[-1].encoded == entry.encoded:
+            return
+        if len(history) == history.maxlen:
+            self._total -= 1
+        history.append(entry)
+        self._total += 1
+        while self._total > self.max_total:
+            oldest_id, oldest = next(iter(self._guilds.items()))
+            oldest.popleft()
+            self._total -= 1
+            self.evicted += 1
+            if not oldest:
+                del self._guilds[oldest_id]
+
+    def pop(self, guild_id: int) -> Optional[QueuedTrack]:
+        """Saca la canción más reciente del historial"""
+        history = self._guilds.get(guild_id)
+        if not history:
+            return None
+        self._total -= 1
+        entry = history.pop()
+        if not history:
+            del self._guilds[guild_id]
+        return entry
+
+    def get(self, guild_id: int, index: int = 0) -> Optional[QueuedTrack]:
+        """Canción ``index`` contando desde la más reciente (0), o None"""
+        history = self._guilds.get(guild_id)
+        if not history or not 0 <= index < len(history):
+            return None
+        return history[-1 - index]
+
+    def recent(self, guild_id: int, limit: int = 10) -> list[QueuedTrack]:
+        """Las últimas canciones del servidor, de la más reciente a la más antigua"""
+        history = self._guilds.get(guild_id)
+        if not history:
+            return []
+        return [history[-1 - i] for i in range(min(limit, len(history)))]
+
+    def forget(self, guild_id: int) -> None:
+        history = self._guilds.pop(guild_id, None)
+        if history:
+            self._total -= len(history)
+
+    def stats(self) -> dict:
+        return {
+            "guilds": len(self._guilds),
+            "entries": self._total,
+            "max_total": self.max_total,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,229 @@
+import asyncio
+import json
+import sqlite3
+import time
+from typing import Callable, Optional
+
+
+class QueueStore:
+    """Guarda en SQLite el estado de reproducción de cada servidor (escritura diferida).
+
+    Los cambios solo marcan el servidor como pendiente; una tarea en segundo
+    plano toma una foto de los servidores marcados cada ``interval`` segundos
+    y los escribe juntos en una transacción desde un hilo, fuera del bucle
+    de eventos. Si se reinicia el bot se pierden como mucho los cambios del
+    último intervalo.
+
+    La posición de la canción cambia continuamente sin que cambie nada más,
+    así que va en su propia columna: ``mark_position`` solo actualiza esa
+    fila, sin volver a serializar la cola.
+
+    La cola va en su propia tabla y solo se reescribe tras ``mark_queue``
+    (añadir, mezclar, quitar...). Cuando una canción sale de la cola para
+    sonar basta con ``advance``: avanza un cursor sobre la última cola
+    guardada, así una playlist de miles de canciones no se vuelve a
+    escribir entera en cada canción.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        snapshot: Callable[[int], Optional[dict]],
+        snapshot_queue: Callable[[int], list[dict]],
+        interval: float = 5.0,
+    ):
+        self.path = path
+        # snapshot(guild_id) devuelve el estado a guardar, o None para borrarlo
+        self.snapshot = snapshot
+        # snapshot_queue(guild_id) devuelve la cola completa en orden de reproducción
+        self.snapshot_queue = snapshot_queue
+        self.interval = interval
+        self._dirty: set[int] = set()
+        self._queue_dirty: set[int] = set()
+        # guild_id -> canciones sacadas desde la última cola guardada
+        self._cursors: dict[int, int] = {}
+        # guild_id -> última posición (ms) aún sin escribir
+        self._positions: dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.flushes = 0
+        self.rows_written = 0
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_db(self) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS guild_state ("
+                "guild_id INTEGER PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL, position INTEGER, "
+                "cursor INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS guild_queue (guild_id INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+            # Bases creadas antes de que la posición y el cursor tuvieran columna propia
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(guild_state)")}
+            if "position" not in columns:
+                conn.execute("ALTER TABLE guild_state ADD COLUMN position INTEGER")
+            if "cursor" not in columns:
+                conn.execute("ALTER TABLE guild_state ADD COLUMN cursor INTEGER NOT NULL DEFAULT 0")
+        conn.close()
+
+    def mark_dirty(self, guild_id: int) -> None:
+        self._dirty.add(guild_id)
+
+    def mark_queue(self, guild_id: int) -> None:
+        """Anota que cambió la cola: la próxima escritura la guarda entera"""
+        self._dirty.add(guild_id)
+        self._queue_dirty.add(guild_id)
+
+    def advance(self, guild_id: int) -> None:
+        """Anota que salió de la cola su primera canción, sin reescribirla"""
+        self._cursors[guild_id] = self._cursors.get(guild_id, 0) + 1
+        self._dirty.add(guild_id)
+
+    def mark_position(self, guild_id: int, position: int) -> None:
+        """Anota solo la posición; si el servidor ya está marcado, la foto completa la incluye"""
+        self._positions[guild_id] = position
+
+    def start(self) -> None:
+        if not self._task or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Detiene la tarea y escribe lo que quede pendiente"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                await self.flush()
+        except asyncio.CancelledError:
+            pass
+
+    async def flush(self) -> None:
+        """Escribe en disco el estado de todos los servidores marcados"""
+        async with self._lock:
+            if not self._dirty and not self._positions:
+                return
+            dirty, self._dirty = self._dirty, set()
+            queue_dirty, self._queue_dirty = self._queue_dirty, set()
+            positions, self._positions = self._positions, {}
+            cursors = dict(self._cursors)
+            writes = []
+            for guild_id in dirty:
+                try:
+                    state = self.snapshot(guild_id)
+                    entries = self.snapshot_queue(guild_id) if state and guild_id in queue_dirty else None
+                except Exception as e:
+                    print(f"[QUEUE STORE] Error al preparar el estado de {guild_id}: {e}")
+                    continue
+                if entries is not None or not state:
+                    # La cola guardada pasa a ser la actual (o se borra): el cursor vuelve a su inicio
+                    self._cursors.pop(guild_id, None)
+                    cursors.pop(guild_id, None)
+                writes.append((guild_id, state, entries, cursors.get(guild_id, 0)))
+            moves = [(guild_id, position) for guild_id, position in positions.items() if guild_id not in dirty]
+            try:
+                await asyncio.to_thread(self._write, writes, moves)
+            except Exception as e:
+                print(f"[QUEUE STORE] Error al guardar el estado: {e}")
+                # Reintentar en el próximo ciclo sin pisar posiciones más nuevas
+                self._dirty |= dirty
+                self._queue_dirty |= queue_dirty
+                for guild_id, state, entries, cursor in writes:
+                    if entries is not None:
+                        # Esa cola no llegó a disco: hay que volver a escribirla
+                        self._queue_dirty.add(guild_id)
+                self._positions = {**positions, **self._positions}
+                return
+            self.flushes += 1
+            self.rows_written += len(writes) + len(moves)
+
+    def _write(
+        self,
+        writes: list[tuple[int, Optional[dict], Optional[list[dict]], int]],
+        moves: list[tuple[int, int]] = (),
+    ) -> None:
+        now = time.time()
+        upserts = [
+            (guild_id, json.dumps(state, separators=(",", ":")), now, state.get("position"), cursor)
+            for guild_id, state, entries, cursor in writes if state
+        ]
+        queues = [
+            (guild_id, json.dumps(entries, separators=(",", ":")))
+            for guild_id, state, entries, cursor in writes if state and entries is not None
+        ]
+        deletes = [(guild_id,) for guild_id, state, entries, cursor in writes if not state]
+        conn = self._connect()
+        try:
+            with conn:
+                if upserts:
+                    conn.executemany(
+                        "INSERT INTO guild_state (guild_id, data, updated_at, position, cursor) VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT(guild_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at, "
+                        "position = excluded.position, cursor = excluded.cursor",
+                        upserts,
+                    )
+                if queues:
+                    conn.executemany(
+                        "INSERT INTO guild_queue (guild_id, data) VALUES (?, ?) "
+                        "ON CONFLICT(guild_id) DO UPDATE SET data = excluded.data",
+                        queues,
+                    )
+                if deletes:
+                    conn.executemany("DELETE FROM guild_state WHERE guild_id = ?", deletes)
+                    conn.executemany("DELETE FROM guild_queue WHERE guild_id = ?", deletes)
+                if moves:
+                    # Un servidor sin fila todavía no tiene nada que mover: la foto completa llegará
+                    conn.executemany(
+                        "UPDATE guild_state SET position = ?, updated_at = ? WHERE guild_id = ?",
+                        [(position, now, guild_id) for guild_id, position in moves],
+                    )
+        finally:
+            conn.close()
+
+    def _read_all(self) -> dict[int, dict]:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT s.guild_id, s.data, s.position, s.cursor, q.data "
+                "FROM guild_state s LEFT JOIN guild_queue q ON q.guild_id = s.guild_id"
+            ).fetchall()
+        finally:
+            conn.close()
+        states = {}
+        for guild_id, data, position, cursor, queue in rows:
+            try:
+                state = json.loads(data)
+                # Las filas anteriores a la tabla de colas llevan la cola dentro de data
+                if queue is not None:
+                    state["queue"] = json.loads(queue)[cursor:]
+            except ValueError:
+                print(f"[QUEUE STORE] Estado corrupto para {guild_id}, se ignora")
+                continue
+            if position is not None:
+                state["position"] = position
+            states[guild_id] = state
+        return states
+
+    async def load_all(self) -> dict[int, dict]:
+        """Devuelve el estado guardado de todos los servidores"""
+        return await asyncio.to_thread(self._read_all)
+
+    async def delete(self, guild_id: int) -> None:
+        """Borra ya el estado guardado del servidor (al detener o desconectar la música)"""
+        # Con el lock, un flush en curso no puede volver a escribir el estado recién borrado
+        async with self._lock:
+            self._dirty.discard(guild_id)
+            self._queue_dirty.discard(guild_id)
+            self._positions.pop(guild_id, None)
+            self._cursors.pop(guild_id, None)
+            await asyncio.to_thread(self._write, [(guild_id, None, None, 0)])
@@ -0,0 +1,77 @@
+from typing import Any, Optional
+
+
+class QueuedTrack:
+    """Entrada compacta de la cola de reproducción.
+
+    Guarda solo la pista codificada de Lavalink y los datos que muestran
+    los comandos; el ``wavelink.Playable`` completo se reconstruye con
+    ``to_payload`` justo antes de reproducirla.
+    """
+
+    __slots__ = ("encoded", "title", "author", "length", "uri", "identifier",
+                 "source", "artwork", "is_stream", "is_seekable")
+
+    def __init__(self, encoded: str, title: str, length: int, uri: Optional[str] = None,
+                 author: str = "", identifier: str = "", source: str = "",
+                 artwork: Optional[str] = None, is_stream: bool = False, is_seekable: bool = True):
+        self.encoded = encoded
+        self.title = title
+        self.author = author
+        self.length = length
+        self.uri = uri
+        self.identifier = identifier
+        self.source = source
+        self.artwork = artwork
+        self.is_stream = is_stream
+        self.is_seekable = is_seekable
+
+    @classmethod
+    def from_playable(cls, track: Any) -> "QueuedTrack":
+        """Crea la entrada compacta a partir de un wavelink.Playable (o devuelve la misma entrada)"""
+        if isinstance(track, cls):
+            return track
+        return cls(
+            encoded=track.encoded,
+            title=track.title,
+            length=track.length,
+            uri=track.uri,
+            author=track.author,
+            identifier=track.identifier,
+            source=track.source,
+            artwork=track.artwork,
+            is_stream=track.is_stream,
+            is_seekable=track.is_seekable,
+        )
+
+    def to_payload(self) -> dict:
+        """Datos de pista con el formato de Lavalink v4 para construir un wavelink.Playable"""
+        return {
+            "encoded": self.encoded,
+            "info": {
+                "identifier": self.identifier,
+                "isSeekable": self.is_seekable,
+                "author": self.author,
+                "length": self.length,
+                "isStream": self.is_stream,
+                "position": 0,
+                "title": self.title,
+                "uri": self.uri,
+                "artworkUrl": self.artwork,
+                "isrc": None,
+                "sourceName": self.source,
+            },
+            "pluginInfo": {},
+            "userData": {},
+        }
+
+    def to_row(self) -> list:
+        """Lista con los campos en orden, para guardarla en disco"""
+        return [getattr(self, name) for name in self.__slots__]
+
+    @classmethod
+    def from_row(cls, row: list) -> "QueuedTrack":
+        return cls(**dict(zip(cls.__slots__, row)))
+
+    def __repr__(self) -> str:
+        return f"<QueuedTrack title={self.title!r} length={self.length}>"
@@ -1,12 +1,165 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
+from typing import Optional
+import asyncio
+import os
+import time
+import aiohttp
 import config
-import requests
+from cogs.exchange_rates import ExchangeRates
+from cogs.response_cache import ResponseCache
+from cogs.translation_cache import TranslationCache
 
 class Search(commands.Cog):
+    # APIs externas
+    MAL_API_URL = 'https://api.myanimelist.net/v2'
+    TRANSLATE_URL = 'https://translate.googleapis.com/translate_a/single'
+    EXCHANGE_API_URL = 'https://api.exchangerate-api.com/v4/latest'
+    CUSTOM_SEARCH_URL = 'https://www.googleapis.com/customsearch/v1'
+    # Conexiones HTTP: máximo total y por host, caché de DNS (s) y tiempos de espera
+    HTTP_LIMIT = 50
+    HTTP_LIMIT_PER_HOST = 10
+    HTTP_DNS_TTL = 300
+    HTTP_TIMEOUT = aiohttp.ClientTimeout(total=15, connect=5)
+    # Resultados de anime cuyos detalles y traducción se piden a la vez (entre todos los comandos)
+    ANIME_CONCURRENCY = 10
+    # Vigencia (s) de las respuestas de MAL: búsquedas y detalles según el estado de emisión
+    MAL_SEARCH_TTL = 6 * 3600
+    MAL_DETAILS_TTL = {
+        'finished_airing': 7 * 86400,
+        'currently_airing': 3600,
+        'not_yet_aired': 6 * 3600,
+    }
+    MAL_DETAILS_FIELDS = 'title,synopsis,mean,genres,num_episodes,status,main_picture,media_type,start_date,end_date,studios'
+
     def __init__(self, bot):
         self.bot = bot
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.anime_slots = asyncio.Semaphore(self.ANIME_CONCURRENCY)
+        # Respuestas de MAL; las caducadas se sirven mientras se renuevan en segundo plano
+        self.mal_cache = ResponseCache(max_entries=int(os.environ.get('MAL_CACHE_SIZE', '2000')))
+        # Tabla local de tasas de cambio: una descarga por intervalo, conversiones sin red
+        self.rates = ExchangeRates(
+            lambda base: self.get_json(f'{self.EXCHANGE_API_URL}/{base}'),
+            base=os.environ.get('EXCHANGE_RATES_BASE', 'USD'),
+            interval=float(os.environ.get('EXCHANGE_RATES_INTERVAL', '3600')),
+        )
+        # Sinopsis ya traducidas, por (anime, texto original, idioma)
+        self.translations = TranslationCache(
+            os.environ.get('TRANSLATION_CACHE_DB', 'translation_cache.db'),
+            max_entries=int(os.environ.get('TRANSLATION_CACHE_SIZE', '1000')),
+        )
+
+    async def cog_load(self):
+        # Una sola sesión por vida del cog: reutiliza conexiones (keep-alive) y resoluciones DNS
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=self.HTTP_LIMIT,
+                limit_per_host=self.HTTP_LIMIT_PER_HOST,
+                ttl_dns_cache=self.HTTP_DNS_TTL,
+                keepalive_timeout=30,
+            ),
+            timeout=self.HTTP_TIMEOUT,
+        )
+        self.rates.start()
+
+    async def cog_unload(self):
+        self.mal_cache.close()
+        self.rates.stop()
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def get_json(self, url: str, **kwargs):
+        """GET sin bloquear el bucle de eventos; devuelve el JSON de la respuesta"""
+        async with self.session.get(url, **kwargs) as response:
+            return await response.json(content_type=None)
+
+    @classmethod
+    def mal_details_ttl(cls, details: dict) -> float:
+        """Las series terminadas apenas cambian; las que están en emisión sí"""
+        if 'error' in details or 'title' not in details:
+            return 0
+        return cls.MAL_DETAILS_TTL.get(details.get('status'), cls.MAL_SEARCH_TTL)
+
+    async def mal_search(self, nombre: str, limite: int) -> dict:
+        headers = {'Authorization': f'Bearer {config.MAL_TOKEN}'}
+        return await self.mal_cache.fetch(
+            ('search', nombre.lower(), limite),
+            lambda: self.get_json(f'{self.MAL_API_URL}/anime', params={'q': nombre, 'limit': limite}, headers=headers),
+            lambda data: self.MAL_SEARCH_TTL if 'data' in data else 0,
+        )
+
+    async def mal_details(self, anime_id: int) -> dict:
+        headers = {'Authorization': f'Bearer {config.MAL_TOKEN}'}
+        return await self.mal_cache.fetch(
+            ('details', anime_id),
+            lambda: self.get_json(f'{self.MAL_API_URL}/anime/{anime_id}', params={'fields': self.MAL_DETAILS_FIELDS}, headers=headers),
+            self.mal_details_ttl,
+        )
+
+    async def translate(self, anime_id: int, text: str, target: str = 'es') -> str:
+        """Traduce la sinopsis de un anime desde el inglés, usando la caché si ya se tradujo"""
+        cached = await self.translations.get(anime_id, text, target)
+        if cached is not None:
+            return cached
+        translate_params = {
+            "client": "gtx",
+            "sl": "en",
+            "tl": target,
+            "dt": "t",
+            "q": text
+        }
+        translation = await self.get_json(self.TRANSLATE_URL, params=translate_params)
+        translated = ''.join([t[0] for t in translation[0]])
+        await self.translations.put(anime_id, text, target, translated)
+        return translated
+
+    async def anime_embed(self, anime_id: int) -> discord.Embed:
+        """Detalles de MAL y sinopsis traducida de un resultado de búsqueda"""
+        async with self.anime_slots:
+            details = await self.mal_details(anime_id)
+
+            # Translate and shorten synopsis
+            synopsis = details.get('synopsis', 'Sin descripción disponible.')
+            translated_description = await self.translate(anime_id, synopsis)
+        if len(translated_description) > 350:
+            translated_description = translated_description[:350] + "..."
+
+        estado = details.get('status', 'N/A').lower()
+        estados_traducidos = {
+            "finished_airing": "Finalizado",
+            "currently_airing": "En emisión",
+            "not_yet_aired": "No emitido"
+        }
+        estado_traducido = estados_traducidos.get(estado, "Desconocido")
+
+        start_date = details.get('start_date', 'Desconocido')
+        end_date = details.get('end_date', 'Desconocido')
+        studios = ', '.join([studio['name'] for studio in details.get('studios', [])]) or 'Desconocido'
+
+        embed = discord.Embed(
+            title=details['title'],
+            description=translated_description,
+            color=discord.Color.teal()
+        )
+        embed.add_field(name='Tipo', value=details.get('media_type', 'Desconocido').capitalize(), inline=True)
+        embed.add_field(name='Puntuación', value=details.get('mean', 'N/A'), inline=True)
+        embed.add_field(name='Episodios', value=details.get('num_episodes', 'N/A'), inline=True)
+        embed.add_field(name='Estado', value=estado_traducido, inline=True)
+        embed.add_field(name='Fecha de inicio', value=start_date, inline=True)
+        embed.add_field(name='Fecha de fin', value=end_date, inline=True)
+        embed.add_field(name='Estudios', value=studios, inline=False)
+        embed.add_field(
+            name='Géneros',
+            value=', '.join([genre['name'] for genre in details.get('genres', [])]) or 'N/A',
+            inline=False
+        )
+        if 'main_picture' in details:
+            embed.set_image(url=details['main_picture']['large'])
+        embed.set_footer(text='Información obtenida de MyAnimeList')
+        return embed
 
     # ------------------ Comando ANIME prefijo ------------------
     @commands.command(name='anime')
@@ -25,67 +178,17 @@ class Search(commands.Cog):
                 nombre = mensaje.strip()
                 limite = 1
 
-            url = f'https://api.myanimelist.net/v2/anime?q={nombre}&limit={limite}'
-            headers = {'Authorization': f'Bearer {config.MAL_TOKEN}'}
-            response = requests.get(url, headers=headers)
-            data = response.json()
+            data = await self.mal_search(nombre, limite)
 
             if 'data' in data and len(data['data']) > 0:
-                for item in data['data']:
-                    anime_id = item['node']['id']
-                    details_url = f'https://api.myanimelist.net/v2/anime/{anime_id}?fields=title,synopsis,mean,genres,num_episodes,status,main_picture,media_type,start_date,end_date,studios'
-                    details_response = requests.get(details_url, headers=headers)
-                    details = details_response.json()
-
-                    # Translate and shorten synopsis
-                    translated_description = details.get('synopsis', 'Sin descripción disponible.')
-                    translate_url = "https://translate.googleapis.com/translate_a/single"
-                    translate_params = {
-                        "client": "gtx",
-                        "sl": "en",
-                        "tl": "es",
-                        "dt": "t",
-                        "q": translated_description
-                    }
-                    translate_response = requests.get(translate_url, params=translate_params)
-                    translation = translate_response.json()
-                    translated_description = ''.join([t[0] for t in translation[0]])
-                    if len(translated_description) > 350:
-                        translated_description = translated_description[:350] + "..."
-
-                    estado = details.get('status', 'N/A').lower()
-                    estados_traducidos = {
-                        "finished_airing": "Finalizado",
-                        "currently_airing": "En emisión",
-                        "not_yet_aired": "No emitido"
-                    }
-                    estado_traducido = estados_traducidos.get(estado, "Desconocido")
-
-                    start_date = details.get('start_date', 'Desconocido')
-                    end_date = details.get('end_date', 'Desconocido')
-                    studios = ', '.join([studio['name'] for studio in details.get('studios', [])]) or 'Desconocido'
-
-                    embed = discord.Embed(
-                        title=details['title'],
-                        description=translated_description,
-                        color=discord.Color.teal()
-                    )
-                    embed.add_field(name='Tipo', value=details.get('media_type', 'Desconocido').capitalize(), inline=True)
-                    embed.add_field(name='Puntuación', value=details.get('mean', 'N/A'), inline=True)
-                    embed.add_field(name='Episodios', value=details.get('num_episodes', 'N/A'), inline=True)
-                    embed.add_field(name='Estado', value=estado_traducido, inline=True)
-                    embed.add_field(name='Fecha de inicio', value=start_date, inline=True)
-                    embed.add_field(name='Fecha de fin', value=end_date, inline=True)
-                    embed.add_field(name='Estudios', value=studios, inline=False)
-                    embed.add_field(
-                        name='Géneros',
-                        value=', '.join([genre['name'] for genre in details.get('genres', [])]) or 'N/A',
-                        inline=False
-                    )
-                    if 'main_picture' in details:
-                        embed.set_image(url=details['main_picture']['large'])
-                    embed.set_footer(text='Información obtenida de MyAnimeList')
-                    await ctx.send(embed=embed)
+                # Detalles y traducciones de todos los resultados a la vez; se envían en orden
+                tasks = [asyncio.create_task(self.anime_embed(item['node']['id'])) for item in data['data']]
+                try:
+                    for task in tasks:
+                        await ctx.send(embed=await task)
+                finally:
+                    for task in tasks:
+                        task.cancel()
             else:
                 await ctx.send('No se encontró ningún anime con ese nombre.')
 
@@ -106,13 +209,13 @@ class Search(commands.Cog):
             # Dividir el mensaje en partes usando "to" como separador
             partes = mensaje.split(" to ")
             if len(partes) != 2:
-                await ctx.send('Formato incorrecto. Usa: g.convert [cantidad] [moneda origen] to [moneda destino]')
+                await ctx.send('Formato incorrecto. Usa: g.convert [cantidad] [moneda origen] to [moneda destino][,otra...]')
                 return
 
             # Obtener la cantidad y la moneda de origen
             primera_parte = partes[0].strip().split()
             if len(primera_parte) != 2:
-                await ctx.send('Formato incorrecto. Usa: g.convert [cantidad] [moneda origen] to [moneda destino]')
+                await ctx.send('Formato incorrecto. Usa: g.convert [cantidad] [moneda origen] to [moneda destino][,otra...]')
                 return
 
             try:
@@ -122,15 +225,27 @@ class Search(commands.Cog):
                 return
 
             origen = primera_parte[1].upper()
-            destino = partes[1].strip().upper()
+            # Una o varias monedas de destino: "EUR" o "EUR,CLP,JPY"
+            destinos = list(dict.fromkeys(code.strip().upper() for code in partes[1].replace(' ', ',').split(',') if code.strip()))
+            if not destinos:
+                await ctx.send('Indica al menos una moneda de destino.')
+                return
 
-            url = f'https://api.exchangerate-api.com/v4/latest/{origen}'
-            response = requests.get(url)
-            data = response.json()
-            tasas = data["rates"]
+            # Todas las conversiones salen de la misma tabla local, sin pedir nada a la red
+            tasas = await self.rates.current()
+            if origen not in tasas:
+                await ctx.send(f'No se encontró la divisa {origen}.')
+                return
+            desconocidas = [destino for destino in destinos if destino not in tasas]
+            destinos = [destino for destino in destinos if destino in tasas]
+            if not destinos:
+                await ctx.send(f'No se encontró la tasa de cambio para {", ".join(desconocidas)}.')
+                return
 
-            if destino in tasas:
-                relacion = tasas[destino] / tasas[origen]
+            minutos = int((time.time() - tasas.updated_at) // 60)
+            if len(destinos) == 1:
+                destino = destinos[0]
+                relacion = tasas.rate(origen, destino)
                 resultado = cantidad * relacion
 
                 embed = discord.Embed(
@@ -140,20 +255,27 @@ class Search(commands.Cog):
                 )
                 embed.add_field(name="Relación", value=f"1 {origen} = {relacion:.4f} {destino}", inline=False)
                 embed.add_field(name="Conversión", value=f"{cantidad} {origen} son {resultado:.2f} {destino}", inline=False)
-                embed.set_footer(text="Información obtenida de Exchange Rate API")
-
-                await ctx.send(embed=embed)
             else:
-                await ctx.send(f'No se encontró la tasa de cambio para {destino}.')
+                embed = discord.Embed(
+                    title="Conversión",
+                    description=f"{cantidad} {origen} a {len(destinos)} monedas",
+                    color=discord.Color.teal()
+                )
+                for destino in destinos:
+                    relacion = tasas.rate(origen, destino)
+                    embed.add_field(name=destino, value=f"{cantidad * relacion:,.2f} {destino}\n(1 {origen} = {relacion:.4f})", inline=True)
+            if desconocidas:
+                embed.add_field(name="Sin tasa de cambio", value=", ".join(desconocidas), inline=False)
+            embed.set_footer(text=f"Información obtenida de Exchange Rate API (tasas de hace {minutos} min)")
+
+            await ctx.send(embed=embed)
 
-        except KeyError:
-            await ctx.send(f'No se encontró la divisa {origen} o {destino}.')
         except Exception as e:
             await ctx.send(f'Ocurrió un error: {e}')
 
     # ------------------ Comando CONVERT slash -------------------
     @app_commands.command(name="convert", description="Convierte una cantidad de una moneda a otra.")
-    @app_commands.describe(mensaje="Formato: [cantidad] [moneda origen] to [moneda destino]")
+    @app_commands.describe(mensaje="Formato: [cantidad] [moneda origen] to [moneda destino] (varias separadas por comas)")
     async def convert_slash(self, interaction: discord.Interaction, mensaje: str):
         ctx = await self.bot.get_context(interaction)
         await self.convert(ctx, mensaje=mensaje)
@@ -162,7 +284,6 @@ class Search(commands.Cog):
     @commands.command(name='img')
     async def image(self, ctx, *, query: str):
         try:
-            url = "https://www.googleapis.com/customsearch/v1"
             params = {
                 "q": query,
                 "cx": config.CX,
@@ -171,9 +292,10 @@ class Search(commands.Cog):
                 "num": 1,
                 "safe": "active"
             }
-            response = requests.get(url, params=params)
-            if response.status_code == 200:
-                data = response.json()
+            async with self.session.get(self.CUSTOM_SEARCH_URL, params=params) as response:
+                status = response.status
+                data = await response.json(content_type=None) if status == 200 else await response.text()
+            if status == 200:
                 if 'items' in data and len(data['items']) > 0:
                     image_url = data['items'][0]['link']
                     embed = discord.Embed(
@@ -186,7 +308,7 @@ class Search(commands.Cog):
                 else:
                     await ctx.send("No se encontraron imágenes para esta búsqueda.")
             else:
-                await ctx.send(f"Error al buscar imágenes: {response.status_code}, {response.text}")
+                await ctx.send(f"Error al buscar imágenes: {status}, {data}")
         except Exception as e:
             await ctx.send(f"Ocurrió un error: {e}")
 
@@ -197,5 +319,49 @@ class Search(commands.Cog):
         ctx = await self.bot.get_context(interaction)
         await self.image(ctx, query=query)
 
+    # ------------------ Comando SEARCHSTATS prefijo ------------------
+    @commands.command(name='searchstats')
+    async def search_stats(self, ctx):
+        translations = self.translations.stats()
+        mal = self.mal_cache.stats()
+        embed = discord.Embed(title="Diagnóstico de búsquedas", color=discord.Color.teal())
+        embed.add_field(
+            name="Respuestas de MyAnimeList",
+            value=(
+                f"Aciertos: {mal['hit_rate']:.1%} ({mal['hits']} frescas, {mal['stale_hits']} caducadas, "
+                f"{mal['misses']} pedidas)\n"
+                f"Renovaciones en segundo plano: {mal['refreshes']}; peticiones agrupadas: {mal['collapsed']}\n"
+                f"Entradas: {mal['entries']}"
+            ),
+            inline=False
+        )
+        embed.add_field(
+            name="Traducciones de sinopsis",
+            value=(
+                f"Aciertos: {translations['hit_rate']:.1%} "
+                f"({translations['memory_hits']} en memoria, {translations['disk_hits']} en disco, "
+                f"{translations['misses']} traducidas)\n"
+                f"Entradas: {translations['entries']} en memoria, {await self.translations.disk_entries()} en disco"
+            ),
+            inline=False
+        )
+        rates = self.rates.stats()
+        edad = f"hace {int(rates['age'] // 60)} min" if rates['age'] is not None else "sin descargar"
+        embed.add_field(
+            name="Tasas de cambio",
+            value=(
+                f"Base {rates['base']}, {rates['currencies']} divisas, actualizadas {edad}\n"
+                f"Descargas: {rates['refreshes']}; fallos: {rates['failures']}"
+            ),
+            inline=False
+        )
+        await ctx.send(embed=embed)
+
+    # ------------------ Comando SEARCHSTATS slash ------------------
+    @app_commands.command(name="searchstats", description="Muestra estadísticas de las cachés de búsqueda.")
+    async def search_stats_slash(self, interaction: discord.Interaction):
+        ctx = await self.bot.get_context(interaction)
+        await self.search_stats(ctx)
+
 async def setup(bot):
     await bot.add_cog(Search(bot))
\ No newline at end of file
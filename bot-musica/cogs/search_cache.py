@@ -0,0 +1,139 @@
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+
+class SearchCache:
+    """Caché de resultados de búsqueda de Lavalink compartida por todos los servidores.
+
+    Guarda los resultados por consulta normalizada con caducidad (TTL) y
+    expulsión LRU. El tamaño se limita por el número total de canciones
+    guardadas, que es lo que ocupa memoria de verdad (una playlist cuenta
+    todas sus canciones). Las búsquedas idénticas que llegan a la vez
+    comparten una única petición a Lavalink.
+    """
+
+    def __init__(self, ttl: float = 600, max_entries: int = 512, max_tracks: int = 20_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_tracks = max_tracks
+        # clave -> (expira_en, resultados, canciones)
+        self._entries: OrderedDict[str, tuple[float, Any, int]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._track_count = 0
+        self.hits = 0
+        self.misses = 0
+        self.collapsed = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Normaliza una consulta: las URLs se respetan, el texto se pasa a minúsculas"""
+        query = re.sub(r"\s+", " ", query.strip())
+        if query.startswith(("http://", "https://")):
+            return query
+        return query.lower()
+
+    @staticmethod
+    def _size_of(results: Any) -> int:
+        tracks = getattr(results, "tracks", results)
+        try:
+            return max(1, len(tracks))
+        except TypeError:
+            return 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, query: str) -> Optional[Any]:
+        """Devuelve los resultados guardados para la consulta, o None"""
+        key = self.normalize(query)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, results, _ = entry
+        if expires_at < time.monotonic():
+            self._discard(key)
+            return None
+        self._entries.move_to_end(key)
+        return results
+
+    def put(self, query: str, results: Any) -> None:
+        """Guarda los resultados de una consulta y expulsa las entradas más antiguas si hace falta"""
+        key = self.normalize(query)
+        self._discard(key)
+        size = self._size_of(results)
+        if size > self.max_tracks:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, results, size)
+        self._track_count += size
+        while len(self._entries) > self.max_entries or self._track_count > self.max_tracks:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._track_count -= entry[2]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._track_count = 0
+
+    async def fetch(self, query: str, loader: Callable[[str], Awaitable[Any]]) -> Any:
+        """Devuelve los resultados de la caché o los carga con loader una sola vez"""
+        cached = self.get(query)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        key = self.normalize(query)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            # Otra búsqueda idéntica ya está en curso: esperar su resultado
+            self.collapsed += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Si se canceló quien hacía la búsqueda y no esta espera, se repite aquí
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+            self.collapsed -= 1
+            return await self.fetch(query, loader)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            results = await loader(query)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Evitar el aviso de "excepción nunca recuperada" si nadie más esperaba
+            future.exception()
+            raise
+        else:
+            if results:
+                self.put(query, results)
+            future.set_result(results)
+            return results
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "tracks": self._track_count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "collapsed": self.collapsed,
+            "hit_rate": self.hit_rate,
+        }
@@ -0,0 +1,344 @@
+import asyncio
+import json
+import re
+import sqlite3
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+import aiohttp
+import wavelink
+
+from cogs.queued_track import QueuedTrack
+
+SPOTIFY_LINK = re.compile(
+    r"^(?:https?://open\.spotify\.com/(?:intl-[\w-]+/)?(track|album|playlist)/"
+    r"|spotify:(track|album|playlist):)([A-Za-z0-9]{22})"
+)
+
+
+def parse_spotify_link(text: str) -> Optional[tuple[str, str]]:
+    """Devuelve (tipo, id) de un enlace o URI de Spotify, o None si no lo es"""
+    match = SPOTIFY_LINK.match(text.strip())
+    if not match:
+        return None
+    return match.group(1) or match.group(2), match.group(3)
+
+
+class SpotifyTrack:
+    """Datos de una canción de Spotify necesarios para buscarla en otra fuente"""
+
+    __slots__ = ("id", "title", "artists", "length")
+
+    def __init__(self, id: str, title: str, artists: list[str], length: int):
+        self.id = id
+        self.title = title
+        self.artists = artists
+        self.length = length
+
+    @classmethod
+    def from_api(cls, data: dict) -> Optional["SpotifyTrack"]:
+        # Pistas locales, episodios o canciones retiradas no se pueden buscar
+        if not data or not data.get("id") or data.get("is_local") or data.get("type", "track") != "track":
+            return None
+        return cls(
+            id=data["id"],
+            title=data.get("name", ""),
+            artists=[artist.get("name", "") for artist in data.get("artists", [])],
+            length=data.get("duration_ms", 0),
+        )
+
+    @property
+    def query(self) -> str:
+        return f"{', '.join(self.artists)} - {self.title}" if self.artists else self.title
+
+
+class SpotifyAPI:
+    """Cliente mínimo de la Web API de Spotify con credenciales de cliente.
+
+    Solo lee canciones, álbumes y playlists públicas. El token se renueva
+    solo al caducar y las respuestas 429 se respetan esperando lo que
+    indique ``Retry-After``.
+    """
+
+    def __init__(self, client_id: str, client_secret: str, api_url: str = "https://api.spotify.com/v1",
+                 token_url: str = "https://accounts.spotify.com/api/token", max_tracks: int = 500):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.api_url = api_url.rstrip("/")
+        self.token_url = token_url
+        self.max_tracks = max_tracks
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._token: Optional[str] = None
+        self._token_expires = 0.0
+        self._token_lock = asyncio.Lock()
+        self.requests = 0
+
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def token(self) -> str:
+        async with self._token_lock:
+            if self._token and time.monotonic() < self._token_expires:
+                return self._token
+            auth = aiohttp.BasicAuth(self.client_id, self.client_secret)
+            async with self.session().post(self.token_url, data={"grant_type": "client_credentials"}, auth=auth) as resp:
+                resp.raise_for_status()
+                data = await resp.json()
+            self._token = data["access_token"]
+            # Renovar un minuto antes de que caduque
+            self._token_expires = time.monotonic() + data.get("expires_in", 3600) - 60
+            return self._token
+
+    async def get(self, url: str, params: Optional[dict] = None) -> dict:
+        if not url.startswith(("http://", "https://")):
+            url = f"{self.api_url}/{url.lstrip('/')}"
+        for attempt in range(3):
+            headers = {"Authorization": f"Bearer {await self.token()}"}
+            self.requests += 1
+            async with self.session().get(url, params=params, headers=headers) as resp:
+                if resp.status == 401 and attempt == 0:
+                    # Token revocado o caducado antes de tiempo
+                    self._token = None
+                    continue
+                if resp.status == 429:
+                    await asyncio.sleep(float(resp.headers.get("Retry-After", "1")))
+                    continue
+                resp.raise_for_status()
+                return await resp.json()
+        raise RuntimeError(f"Spotify no respondió a {url}")
+
+    async def _paginate(self, page: dict, key: Optional[str] = None) -> list[SpotifyTrack]:
+        tracks: list[SpotifyTrack] = []
+        while page:
+            for item in page.get("items", []):
+                track = SpotifyTrack.from_api(item.get(key) if key else item)
+                if track:
+                    tracks.append(track)
+            if len(tracks) >= self.max_tracks or not page.get("next"):
+                break
+            page = await self.get(page["next"])
+        return tracks[:self.max_tracks]
+
+    async def load(self, kind: str, spotify_id: str) -> tuple[str, list[SpotifyTrack]]:
+        """Devuelve (nombre, canciones) de una canción, álbum o playlist"""
+        if kind == "track":
+            data = await self.get(f"tracks/{spotify_id}")
+            track = SpotifyTrack.from_api(data)
+            return data.get("name", ""), [track] if track else []
+        if kind == "album":
+            data = await self.get(f"albums/{spotify_id}")
+            return data.get("name", ""), await self._paginate(data.get("tracks", {}))
+        data = await self.get(
+            f"playlists/{spotify_id}",
+            params={"fields": "name,tracks(next,items(track(id,name,type,is_local,duration_ms,artists(name))))"},
+        )
+        return data.get("name", ""), await self._paginate(data.get("tracks", {}), key="track")
+
+
+class SpotifyMatchCache:
+    """Caché en disco (SQLite) de id de Spotify → pista reproducible de Lavalink.
+
+    Guarda la forma compacta de ``QueuedTrack``. Las entradas caducan a
+    los ``max_age`` segundos y, si hay más de ``max_entries``, se expulsan
+    las usadas hace más tiempo. Todo el acceso a disco se hace en un hilo,
+    por lotes, fuera del bucle de eventos.
+    """
+
+    def __init__(self, path: str, max_entries: int = 50_000, max_age: float = 30 * 86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_db(self) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS spotify_match ("
+                "spotify_id TEXT PRIMARY KEY, data TEXT NOT NULL, created_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS spotify_match_used ON spotify_match (used_at)")
+        conn.close()
+
+    def _read(self, ids: list[str]) -> dict[str, QueuedTrack]:
+        now = time.time()
+        found: dict[str, QueuedTrack] = {}
+        conn = self._connect()
+        try:
+            with conn:
+                # Por bloques para no pasar del límite de parámetros de SQLite
+                for start in range(0, len(ids), 500):
+                    chunk = ids[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT spotify_id, data FROM spotify_match WHERE spotify_id IN ({','.join('?' * len(chunk))}) "
+                        "AND created_at > ?",
+                        (*chunk, now - self.max_age),
+                    ).fetchall()
+                    for spotify_id, data in rows:
+                        try:
+                            found[spotify_id] = QueuedTrack.from_row(json.loads(data))
+                        except (ValueError, TypeError):
+                            pass
+                if found:
+                    conn.executemany("UPDATE spotify_match SET used_at = ? WHERE spotify_id = ?",
+                                     [(now, spotify_id) for spotify_id in found])
+        finally:
+            conn.close()
+        return found
+
+    def _write(self, matches: dict[str, QueuedTrack]) -> int:
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO spotify_match (spotify_id, data, created_at, used_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(spotify_id) DO UPDATE SET data = excluded.data, "
+                    "created_at = excluded.created_at, used_at = excluded.used_at",
+                    [(spotify_id, json.dumps(track.to_row(), separators=(",", ":")), now, now)
+                     for spotify_id, track in matches.items()],
+                )
+                evicted = conn.execute("DELETE FROM spotify_match WHERE created_at <= ?",
+                                       (now - self.max_age,)).rowcount
+                excess = conn.execute("SELECT COUNT(*) FROM spotify_match").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    evicted += conn.execute(
+                        "DELETE FROM spotify_match WHERE spotify_id IN "
+                        "(SELECT spotify_id FROM spotify_match ORDER BY used_at LIMIT ?)",
+                        (excess,),
+                    ).rowcount
+        finally:
+            conn.close()
+        return evicted
+
+    def __len__(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM spotify_match").fetchone()[0]
+        finally:
+            conn.close()
+
+    async def get_many(self, ids: list[str]) -> dict[str, QueuedTrack]:
+        """Devuelve las pistas guardadas para los ids dados (los que falten no aparecen)"""
+        if not ids:
+            return {}
+        try:
+            found = await asyncio.to_thread(self._read, list(dict.fromkeys(ids)))
+        except sqlite3.Error as e:
+            print(f"[SPOTIFY] Error al leer la caché: {e}")
+            found = {}
+        self.hits += sum(1 for spotify_id in ids if spotify_id in found)
+        self.misses += sum(1 for spotify_id in ids if spotify_id not in found)
+        return found
+
+    async def put_many(self, matches: dict[str, QueuedTrack]) -> None:
+        if not matches:
+            return
+        try:
+            self.evicted += await asyncio.to_thread(self._write, matches)
+        except sqlite3.Error as e:
+            print(f"[SPOTIFY] Error al guardar en la caché: {e}")
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class SpotifyResolver:
+    """Convierte enlaces de Spotify en pistas reproducibles por Lavalink.
+
+    Spotify no se puede reproducir directamente: cada canción se busca por
+    "artistas - título" con ``search`` y se elige el primer resultado cuya
+    duración se parezca a la original; si ninguno se parece, la canción se
+    da por no encontrada. Solo lo encontrado se guarda en
+    ``SpotifyMatchCache``, así que una playlist ya escuchada se resuelve sin
+    ninguna búsqueda. Devuelve lo mismo que ``wavelink.Playable.search``.
+    """
+
+    # Diferencia de duración (ms) aceptable entre la canción de Spotify y el resultado
+    LENGTH_TOLERANCE = 5000
+    CANDIDATES = 5
+
+    def __init__(self, api: SpotifyAPI, cache: SpotifyMatchCache,
+                 search: Callable[[str], Awaitable[Any]], concurrency: int = 5):
+        self.api = api
+        self.cache = cache
+        self.search = search
+        self.concurrency = concurrency
+        self.searches = 0
+
+    def pick(self, track: SpotifyTrack, results: Any) -> Optional[wavelink.Playable]:
+        if not results or isinstance(results, wavelink.Playlist):
+            return None
+        for candidate in results[:self.CANDIDATES]:
+            if abs(candidate.length - track.length) <= self.LENGTH_TOLERANCE:
+                return candidate
+        # Mejor no encontrarla que guardar 30 días una canción equivocada
+        return None
+
+    async def match(self, tracks: list[SpotifyTrack]) -> dict[str, QueuedTrack]:
+        """Busca las canciones que no están en la caché, como mucho ``concurrency`` a la vez"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def find(track: SpotifyTrack) -> Optional[QueuedTrack]:
+            async with semaphore:
+                self.searches += 1
+                try:
+                    results = await self.search(track.query)
+                except Exception as e:
+                    print(f"[SPOTIFY] Error al buscar '{track.query}': {e}")
+                    return None
+            playable = self.pick(track, results)
+            return QueuedTrack.from_playable(playable) if playable else None
+
+        found = await asyncio.gather(*(find(track) for track in tracks))
+        return {track.id: queued for track, queued in zip(tracks, found) if queued}
+
+    async def load(self, url: str) -> wavelink.Playlist | list[wavelink.Playable]:
+        link = parse_spotify_link(url)
+        if link is None:
+            return []
+        kind, spotify_id = link
+        name, tracks = await self.api.load(kind, spotify_id)
+        if not tracks:
+            return []
+
+        matches = await self.cache.get_many([track.id for track in tracks])
+        missing = list({track.id: track for track in tracks if track.id not in matches}.values())
+        if missing:
+            found = await self.match(missing)
+            await self.cache.put_many(found)
+            matches.update(found)
+
+        resolved = [matches[track.id] for track in tracks if track.id in matches]
+        print(f"[SPOTIFY] {kind} '{name}': {len(resolved)}/{len(tracks)} canciones, {len(missing)} búsquedas")
+        if kind == "track":
+            return [wavelink.Playable(resolved[0].to_payload())] if resolved else []
+        return wavelink.Playlist({
+            "info": {"name": name, "selectedTrack": -1},
+            "tracks": [track.to_payload() for track in resolved],
+            "pluginInfo": {"type": kind, "url": url},
+        })
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "searches": self.searches, "api_requests": self.api.requests}
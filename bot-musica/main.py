@@ -4,7 +4,13 @@ from discord import app_commands
 import wavelink
 import os
 import threading
-from flask import Flask
+from flask import Flask, jsonify, request
+from cogs.startup import StartupTimeline
+from cogs.command_sync import sync_if_changed
+
+# Tiempos de cada fase del arranque (se imprimen al terminar todas)
+startup_timeline = StartupTimeline()
+startup_timeline.expect("Gateway de Discord", "Nodos de Lavalink")
 
 # Configuración del servidor Flask
 app = Flask(__name__)
@@ -13,6 +19,16 @@ app = Flask(__name__)
 def home():
     return "Bot de música funcionando!"
 
+@app.route('/metrics')
+def metrics():
+    # Estadísticas de los nodos de Lavalink que recoge el cog de música
+    music = bot.get_cog('Music')
+    if music is None:
+        return jsonify({"error": "El cog de música todavía no está cargado"}), 503
+    # ?history=N limita las muestras por nodo (0 = todo el búfer)
+    history = request.args.get('history', default=20, type=int)
+    return jsonify(music.metrics(history=max(0, history)))
+
 def run_flask_app():
     port = int(os.environ.get("PORT", 5000))
     app.run(host='0.0.0.0', port=port)
@@ -21,11 +37,13 @@ intents = discord.Intents.default()
 intents.message_content = True
 
 bot = commands.Bot(command_prefix='g.', intents=intents)
+bot.startup_timeline = startup_timeline
 
 # ---------- EVENTOS GLOBALES ----------
 @bot.event
 async def on_ready():
     print(f'Bot de Música conectado como {bot.user}')
+    startup_timeline.end("Gateway de Discord")
 
 @bot.event
 async def on_error(event, *args, **kwargs):
@@ -37,18 +55,23 @@ async def on_error(event, *args, **kwargs):
 # --------- SETUP PARA COMANDOS SLASH ----------
 @bot.event
 async def setup_hook():
-    # Cargar cogs del bot de música
-    await bot.load_extension('cogs.search')
-    await bot.load_extension('cogs.music')
-    await bot.load_extension('cogs.moderation')
-    await bot.load_extension('cogs.buckshot')
+    # Los cogs que no dependen de Lavalink quedan listos de inmediato
+    with startup_timeline.phase("Cogs"):
+        await bot.load_extension('cogs.search')
+        await bot.load_extension('cogs.moderation')
+        await bot.load_extension('cogs.buckshot')
+        # El cog de música conecta los nodos en segundo plano, en paralelo con el gateway
+        await bot.load_extension('cogs.music')
     # NO cargar cogs.minecraft aquí
 
-    try:
-        synced = await bot.tree.sync()
-        print(f"Sincronizados {len(synced)} comandos de aplicación (Música).")
-    except Exception as e:
-        print(f"Error al sincronizar comandos de aplicación (Música): {e}")
+    with startup_timeline.phase("Sincronización de comandos"):
+        try:
+            # Solo se sincroniza si el árbol de comandos cambió desde el último arranque
+            await sync_if_changed(bot.tree)
+        except Exception as e:
+            print(f"Error al sincronizar comandos de aplicación (Música): {e}")
+
+    startup_timeline.start("Gateway de Discord")
 
 # --------- ARRANQUE DEL BOT ----------
 if __name__ == '__main__':
@@ -3,33 +3,12 @@
 # Iniciar Lavalink en segundo plano, forzando IPv4 para Java y limitando memoria
 cd /opt/Lavalink
 java -Xms128m -Xmx320m -Djava.net.preferIPv4Stack=true -jar Lavalink.jar &
-LAVALINK_PID=$!
 
-# Esperar a que Lavalink inicie
-echo "Esperando a que Lavalink inicie..."
-sleep 30
-
-# Verificar que Lavalink está corriendo
-if ! ps -p $LAVALINK_PID > /dev/null; then
-    echo "Error: Lavalink no pudo iniciar"
-    exit 1
-fi
-
-# Verificar que el puerto está abierto
-if ! netstat -tuln | grep -q ":2333"; then
-    echo "Error: Lavalink no está escuchando en el puerto 2333"
-    exit 1
-fi
-
-# Verificar que Lavalink está respondiendo
-if ! curl -s http://localhost:2333/version > /dev/null; then
-    echo "Error: Lavalink no está respondiendo en el puerto 2333"
-    exit 1
-fi
-
-echo "Lavalink iniciado correctamente y escuchando en el puerto 2333"
+# No se espera a Lavalink aquí: el bot sondea /version con espera creciente y
+# conecta los nodos en cuanto responden, mientras inicia sesión en Discord y
+# carga el resto de cogs.
 
 # Iniciar el bot
 cd /app
-echo "Iniciando el bot..."
+echo "Iniciando el bot (Lavalink sigue arrancando en segundo plano)..."
 exec python3 main.py 
\ No newline at end of file
@@ -0,0 +1,89 @@
+import hashlib
+import inspect
+import json
+import os
+import time
+from typing import Callable, Optional
+
+import discord
+from discord import app_commands
+
+
+def _command_payload(command, tree: app_commands.CommandTree) -> dict:
+    # Desde discord.py 2.4 to_dict recibe el árbol; en 2.3 no acepta argumentos
+    if "tree" in inspect.signature(command.to_dict).parameters:
+        return command.to_dict(tree)
+    return command.to_dict()
+
+
+def command_fingerprint(tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None) -> str:
+    """Hash del árbol de comandos tal como se enviaría a Discord al sincronizar"""
+    payload = sorted(
+        (_command_payload(command, tree) for command in tree.get_commands(guild=guild)),
+        key=lambda data: (data.get("type", 1), data["name"]),
+    )
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _load_state(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(path: str, state: dict) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+async def sync_if_changed(tree: app_commands.CommandTree, log: Callable[[str], None] = print) -> int:
+    """Sincroniza los comandos de aplicación solo si cambiaron desde la última vez.
+
+    Se guarda en COMMAND_SYNC_STATE (por defecto ``command_sync.json``) el
+    hash de lo último que se sincronizó con cada destino. Con DEV_GUILD_IDS
+    (ids separados por comas) se sincroniza solo en esos servidores, que
+    aplican los cambios al instante; FORCE_COMMAND_SYNC=1 ignora el hash.
+    Devuelve cuántos destinos se sincronizaron.
+    """
+    path = os.environ.get("COMMAND_SYNC_STATE", "command_sync.json")
+    force = os.environ.get("FORCE_COMMAND_SYNC", "").lower() in ("1", "true", "yes")
+    dev_guilds = [discord.Object(id=int(part)) for part in os.environ.get("DEV_GUILD_IDS", "").split(",") if part.strip()]
+
+    targets: list[Optional[discord.Object]] = []
+    for guild in dev_guilds:
+        tree.copy_global_to(guild=guild)
+        targets.append(guild)
+    if not dev_guilds:
+        targets.append(None)
+
+    state = _load_state(path)
+    synced = 0
+    for guild in targets:
+        key = f"{tree.client.application_id}:{f'guild:{guild.id}' if guild else 'global'}"
+        label = f"el servidor {guild.id}" if guild else "global"
+        fingerprint = command_fingerprint(tree, guild=guild)
+        previous = state.get(key, {})
+
+        if not force and previous.get("fingerprint") == fingerprint:
+            saved = previous.get("duration", 0.0)
+            log(f"Comandos de aplicación ({label}) sin cambios, sincronización omitida (~{saved:.2f} s ahorrados).")
+            continue
+
+        started = time.perf_counter()
+        commands = await tree.sync(guild=guild)
+        duration = time.perf_counter() - started
+        log(f"Sincronizados {len(commands)} comandos de aplicación ({label}) en {duration:.2f} s.")
+        state[key] = {"fingerprint": fingerprint, "duration": duration, "synced_at": time.time()}
+        synced += 1
+
+    if synced:
+        try:
+            _save_state(path, state)
+        except OSError as e:
+            log(f"No se pudo guardar el estado de sincronización en {path}: {e}")
+    return synced
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from array import array
+from typing import Awaitable, Callable, Optional
+
+
+class RatesSnapshot:
+    """Tabla de tasas de cambio respecto a una moneda base, inmutable.
+
+    Las tasas se guardan en un ``array`` de dobles con un índice por código
+    de moneda; cualquier tasa cruzada se calcula como cociente de dos de
+    ellas, sin pedir otra tabla.
+    """
+
+    __slots__ = ("base", "index", "rates", "updated_at")
+
+    def __init__(self, base: str, rates: dict[str, float], updated_at: Optional[float] = None):
+        codes = sorted(code for code, rate in rates.items() if rate)
+        self.base = base
+        self.index = {code: i for i, code in enumerate(codes)}
+        self.rates = array("d", (float(rates[code]) for code in codes))
+        self.updated_at = updated_at or time.time()
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def rate(self, origen: str, destino: str) -> float:
+        """Unidades de ``destino`` por cada unidad de ``origen`` (KeyError si no existe alguna)"""
+        return self.rates[self.index[destino]] / self.rates[self.index[origen]]
+
+
+class ExchangeRates:
+    """Tasas de cambio locales renovadas cada ``interval`` segundos.
+
+    Se descarga una sola tabla (la de ``base``) por intervalo y todas las
+    conversiones se responden con la última foto, sin ir a la red. Si una
+    renovación falla se sigue usando la tabla anterior y se reintenta antes.
+    """
+
+    RETRY_INTERVAL = 300
+
+    def __init__(self, load: Callable[[str], Awaitable[dict]], base: str = "USD", interval: float = 3600):
+        # load(base) devuelve la respuesta de la API: {"rates": {...}, "time_last_updated": ...}
+        self.load = load
+        self.base = base
+        self.interval = interval
+        self.snapshot: Optional[RatesSnapshot] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.failures = 0
+
+    def start(self) -> None:
+        if not self._task or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                try:
+                    await self.refresh()
+                    delay = self.interval
+                except Exception as e:
+                    print(f"[EXCHANGE RATES] Error al renovar las tasas: {e}")
+                    delay = min(self.interval, self.RETRY_INTERVAL)
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            pass
+
+    async def _refresh(self) -> RatesSnapshot:
+        try:
+            data = await self.load(self.base)
+            snapshot = RatesSnapshot(self.base, data["rates"], data.get("time_last_updated"))
+        except Exception:
+            self.failures += 1
+            raise
+        self.snapshot = snapshot
+        self.refreshes += 1
+        return snapshot
+
+    async def refresh(self) -> RatesSnapshot:
+        async with self._lock:
+            return await self._refresh()
+
+    async def current(self) -> RatesSnapshot:
+        """La última tabla; si aún no hay ninguna, la descarga (una sola vez aunque se pida a la vez)"""
+        if self.snapshot is not None:
+            return self.snapshot
+        async with self._lock:
+            if self.snapshot is None:
+                await self._refresh()
+            return self.snapshot
+
+    def stats(self) -> dict:
+        snapshot = self.snapshot
+        return {
+            "base": self.base,
+            "currencies": len(snapshot) if snapshot else 0,
+            "age": time.time() - snapshot.updated_at if snapshot else None,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+        }
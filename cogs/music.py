@@ -5,9 +5,15 @@ import wavelink
 import os
 from typing import Optional
 import asyncio
+import time
 from datetime import timedelta, datetime
+from cogs.music_queue import MusicQueue
+from cogs.startup import wait_for_lavalink
 
 class Music(commands.Cog):
+    # Segundos antes de reintentar si Lavalink rechaza la conexión
+    NODE_RETRY_DELAY = 5
+
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.bot.loop.create_task(self.connect_nodes())
@@ -20,25 +26,44 @@ class Music(commands.Cog):
         self.check_voice_state_task = self.bot.loop.create_task(self.check_voice_state_loop())
 
     async def connect_nodes(self):
-        """Conecta a los nodos de Lavalink"""
-        await self.bot.wait_until_ready()
+        """Conecta al nodo de Lavalink en segundo plano.
+
+        No espera al gateway de Discord: el nodo se sondea hasta que
+        responde y entonces se abre su websocket, reintentando si falla.
+        """
+        timeline = getattr(self.bot, "startup_timeline", None)
+        if timeline:
+            timeline.start("Nodos de Lavalink")
 
         lavalink_uri = os.environ.get("LAVALINK_URI", "http://127.0.0.1:2333")
         lavalink_password = os.environ.get("LAVALINK_PASSWORD", "youshallnotpass")
-
-        nodes = [
-            wavelink.Node(
-                uri=lavalink_uri,
-                password=lavalink_password,
-            )
-        ]
-        await wavelink.Pool.connect(nodes=nodes, client=self.bot, cache_capacity=100)
-        print("Conectado a los nodos de Lavalink")
-
-    def get_queue(self, guild_id: int) -> list[wavelink.Playable]:
+        node = wavelink.Node(uri=lavalink_uri, password=lavalink_password)
+        started = time.perf_counter()
+
+        while True:
+            # start.sh ya no espera a Lavalink: sondear /version hasta que responda
+            attempts = await wait_for_lavalink(lavalink_uri, lavalink_password)
+            print(f"🔗 Lavalink ({lavalink_uri}) listo tras {attempts} intento(s), {time.perf_counter() - started:.1f} s")
+
+            # Si el websocket no llega a abrirse, wavelink sigue reintentando dentro de esta tarea
+            await wavelink.Pool.connect(nodes=[node], client=self.bot, cache_capacity=100)
+            if node.identifier in wavelink.Pool.nodes:
+                break
+            # /version ya aceptó la contraseña: el rechazo es de un Lavalink que aún no ha terminado de arrancar
+            print(f"⚠️ Lavalink ({lavalink_uri}) rechazó la conexión, reintentando...")
+            await asyncio.sleep(self.NODE_RETRY_DELAY)
+
+        # El nodo queda listo al recibir el "ready" del websocket
+        while node.status != wavelink.NodeStatus.CONNECTED:
+            await asyncio.sleep(0.1)
+        print(f"📊 Conectado a Lavalink en {time.perf_counter() - started:.1f} s")
+        if timeline:
+            timeline.end("Nodos de Lavalink")
+
+    def get_queue(self, guild_id: int) -> MusicQueue:
         """Obtiene la cola de reproducción del servidor"""
         if guild_id not in self.queues:
-            self.queues[guild_id] = []
+            self.queues[guild_id] = MusicQueue()
         return self.queues[guild_id]
 
     def format_time(self, milliseconds: int) -> str:
@@ -118,7 +143,7 @@ class Music(commands.Cog):
         
         try:
             # Tomar la siguiente canción de la cola
-            next_track = queue.pop(0)
+            next_track = queue.get()
             print(f"Reproduciendo siguiente canción: {next_track.title}")
             
             # Verificar si el reproductor sigue conectado
@@ -192,8 +217,7 @@ class Music(commands.Cog):
                 playlist_name = playlist.name if playlist.name else "Playlist sin nombre"
 
                 if player.current: # Player is busy
-                    for track_in_playlist in tracks_from_playlist:
-                        queue.append(track_in_playlist)
+                    queue.extend(tracks_from_playlist)
                     embed = discord.Embed(
                         title="🎵 Playlist añadida a la cola",
                         description=f"Se añadieron {num_tracks} canciones de **{playlist_name}** a la cola.",
@@ -205,8 +229,7 @@ class Music(commands.Cog):
                     await player.play(first_track)
                     
                     desc = f"Empezando con: **{first_track.title}** ({self.format_time(first_track.length)})"
-                    for track_in_playlist in tracks_from_playlist[1:]:
-                        queue.append(track_in_playlist)
+                    queue.extend(tracks_from_playlist[1:])
                     
                     if num_tracks > 1:
                         desc += f"\n{num_tracks - 1} más canciones de **{playlist_name}** añadidas a la cola."
@@ -222,7 +245,7 @@ class Music(commands.Cog):
                 track: wavelink.Playable = results[0] # Take the first result
                 
                 if player.current:
-                    queue.append(track)
+                    queue.put(track)
                     embed = discord.Embed(
                         title="🎵 Añadida a la cola",
                         description=f"**{track.title}**\nDuración: {self.format_time(track.length)}",
@@ -258,7 +281,7 @@ class Music(commands.Cog):
         
         # Limpiar la cola antes de desconectar
         if guild_id in self.queues:
-            self.queues[guild_id] = []
+            self.queues[guild_id].clear()
             
         # Desconectar el reproductor    
         await player.disconnect()
@@ -310,7 +333,7 @@ class Music(commands.Cog):
         
         if queue:
             try:
-                next_track = queue.pop(0)
+                next_track = queue.get()
                 print(f"Saltando a la siguiente canción: {next_track.title}")
                 
                 # Comprobar que el player sigue conectado antes de reproducir
@@ -340,7 +363,7 @@ class Music(commands.Cog):
                 await ctx.send("❌ Ocurrió un error al intentar detener la reproducción.")
 
     @commands.command(name="queue")
-    async def queue_(self, ctx: commands.Context):
+    async def queue_(self, ctx: commands.Context, page: int = 1):
         player: wavelink.Player | None = ctx.voice_client
         if not player:
             await ctx.send("❌ No estoy conectado a un canal de voz.")
@@ -363,30 +386,74 @@ class Music(commands.Cog):
             )
 
         if queue:
-            total_duration = sum(track.length for track in queue if track.length is not None)
+            per_page = 10
+            total_pages = (len(queue) + per_page - 1) // per_page
+            page = max(1, min(page, total_pages))
+
+            # Lo que falta de la canción actual se suma a la espera de cada entrada
+            remaining_current = 0
+            if current_track and current_track.length:
+                remaining_current = max(0, current_track.length - player.position)
+
             queue_text = ""
-            for i, track in enumerate(queue[:10], 1):
-                queue_text += f"{i}. **{track.title}** - {self.format_time(track.length)}\n"
-            
-            if len(queue) > 10:
-                queue_text += f"\n...y {len(queue) - 10} canciones más"
+            for i, track, wait in queue.page(page, per_page):
+                queue_text += f"{i}. **{track.title}** - {self.format_time(track.length)} (en {self.format_time(remaining_current + wait)})\n"
             
             embed.add_field(
-                name="📋 Próximas canciones",
+                name=f"📋 Próximas canciones (página {page}/{total_pages})",
                 value=queue_text if queue_text else "Nada más en la cola.",
                 inline=False
             )
+            total_duration = queue.total_duration
             if total_duration > 0:
                 embed.add_field(
                     name="⏱️ Duración total de la cola",
-                    value=self.format_time(total_duration),
+                    value=f"{self.format_time(total_duration)} ({len(queue)} canciones, termina en {self.format_time(remaining_current + total_duration)})",
                     inline=False
                 )
+            if total_pages > 1:
+                embed.set_footer(text=f"Usa queue <página> para ver más ({total_pages} páginas)")
         elif not current_track:
             embed.description = "La cola está vacía y nada se está reproduciendo."
 
         await ctx.send(embed=embed)
 
+    @commands.command(name="shuffle")
+    async def shuffle_(self, ctx: commands.Context):
+        """Mezcla las canciones de la cola."""
+        queue = self.get_queue(ctx.guild.id)
+        if len(queue) < 2:
+            await ctx.send("❌ No hay suficientes canciones en la cola para mezclar.")
+            return
+
+        queue.shuffle()
+        embed = discord.Embed(title="🔀 Cola mezclada", description=f"Se mezclaron {len(queue)} canciones.", color=discord.Color.blue())
+        await ctx.send(embed=embed)
+
+    @commands.command(name="remove")
+    async def remove_(self, ctx: commands.Context, position: int):
+        """Elimina de la cola la canción en la posición indicada."""
+        queue = self.get_queue(ctx.guild.id)
+        if not 1 <= position <= len(queue):
+            await ctx.send(f"❌ Posición inválida. La cola tiene {len(queue)} canciones.")
+            return
+
+        track = queue.remove(position - 1)
+        embed = discord.Embed(title="🗑️ Canción eliminada de la cola", description=f"**{track.title}**", color=discord.Color.blue())
+        await ctx.send(embed=embed)
+
+    @commands.command(name="move")
+    async def move_(self, ctx: commands.Context, source: int, destination: int):
+        """Mueve una canción de la cola a otra posición."""
+        queue = self.get_queue(ctx.guild.id)
+        if not 1 <= source <= len(queue) or not 1 <= destination <= len(queue):
+            await ctx.send(f"❌ Posición inválida. La cola tiene {len(queue)} canciones.")
+            return
+
+        track = queue.move(source - 1, destination - 1)
+        embed = discord.Embed(title="↕️ Canción movida", description=f"**{track.title}** ahora está en la posición {destination}.", color=discord.Color.blue())
+        await ctx.send(embed=embed)
+
     @commands.command(name="info", aliases=['np', 'nowplaying'])
     async def info_(self, ctx: commands.Context):
         """Muestra información sobre la canción que se está reproduciendo actualmente."""
@@ -483,14 +550,15 @@ class Music(commands.Cog):
         await self.skip_(ctx)
 
     @app_commands.command(name="queue", description="Muestra la cola de reproducción.")
-    async def queue_slash(self, interaction: discord.Interaction):
+    @app_commands.describe(page="Página de la cola a mostrar")
+    async def queue_slash(self, interaction: discord.Interaction, page: int = 1):
         mock_message = discord.Object(id=interaction.id)
         mock_message.author = interaction.user
         mock_message.channel = interaction.channel
         mock_message.guild = interaction.guild
         ctx = await self.bot.get_context(mock_message)
         ctx.voice_client = interaction.guild.voice_client
-        await self.queue_(ctx)
+        await self.queue_(ctx, page=page)
 
     async def check_voice_state_loop(self):
         """Tarea de verificación periódica del estado de los canales de voz"""
@@ -569,7 +637,7 @@ class Music(commands.Cog):
                 
                 # Limpiar cola
                 if guild_id in self.queues:
-                    self.queues[guild_id] = []
+                    self.queues[guild_id].clear()
                 
                 # Desconectar
                 await player.disconnect()
@@ -0,0 +1,131 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Union
+
+
+class ResponseCache:
+    """Caché en memoria de respuestas de APIs con stale-while-revalidate.
+
+    Cada respuesta se guarda con su propio TTL (``ttl`` puede ser un número
+    o una función de la respuesta; 0 significa no guardarla). Pasado el TTL
+    la respuesta sigue sirviéndose al momento durante ``max_stale``
+    segundos mientras una tarea en segundo plano la renueva. Las peticiones
+    idénticas que llegan a la vez comparten una sola llamada a la API.
+    """
+
+    def __init__(self, max_entries: int = 2000, max_stale: float = 86400):
+        self.max_entries = max_entries
+        self.max_stale = max_stale
+        # clave -> (fresca_hasta, servible_hasta, respuesta)
+        self._entries: OrderedDict[Hashable, tuple[float, float, Any]] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self._refreshing: dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.collapsed = 0
+        self.refreshes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(self, key: Hashable, value: Any, ttl: Union[float, Callable[[Any], float]]) -> None:
+        seconds = ttl(value) if callable(ttl) else ttl
+        if seconds <= 0:
+            self._entries.pop(key, None)
+            return
+        now = time.monotonic()
+        self._entries[key] = (now + seconds, now + seconds + self.max_stale, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                    ttl: Union[float, Callable[[Any], float]]) -> Any:
+        """Llama a la API una sola vez por clave aunque la pidan varios a la vez"""
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.collapsed += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Si se canceló quien llamaba a la API y no esta espera, se repite aquí
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+            self.collapsed -= 1
+            return await self.fetch(key, loader, ttl)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Evitar el aviso de "excepción nunca recuperada" si nadie más esperaba
+            future.exception()
+            raise
+        else:
+            self._store(key, value, ttl)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                       ttl: Union[float, Callable[[Any], float]]) -> None:
+        try:
+            await self._load(key, loader, ttl)
+            self.refreshes += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # Se sigue sirviendo la respuesta antigua hasta que caduque del todo
+            print(f"[RESPONSE CACHE] Error al renovar {key}: {e}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def fetch(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                    ttl: Union[float, Callable[[Any], float]]) -> Any:
+        """Devuelve la respuesta guardada (fresca o caducada) o la pide con ``loader``"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            fresh_until, usable_until, value = entry
+            now = time.monotonic()
+            if now < fresh_until:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            if now < usable_until:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                if key not in self._refreshing:
+                    self._refreshing[key] = asyncio.get_running_loop().create_task(self._refresh(key, loader, ttl))
+                return value
+            self._entries.pop(key, None)
+
+        if key not in self._inflight:
+            self.misses += 1
+        return await self._load(key, loader, ttl)
+
+    def close(self) -> None:
+        for task in self._refreshing.values():
+            task.cancel()
+        self._refreshing.clear()
+
+    def stats(self) -> dict:
+        # Las peticiones agrupadas tampoco llegan a la API
+        served = self.hits + self.stale_hits + self.collapsed
+        total = served + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "collapsed": self.collapsed,
+            "refreshes": self.refreshes,
+            "hit_rate": served / total if total else 0.0,
+        }
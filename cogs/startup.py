@@ -0,0 +1,84 @@
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import aiohttp
+
+
+class StartupTimeline:
+    """Duración de cada fase del arranque, medida desde que se importa main.py.
+
+    Cada fase se registra al terminar; cuando terminan todas las fases
+    esperadas se imprime el resumen completo en orden de inicio.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.phases: list[tuple[str, float, float]] = []
+        self.expected: set[str] = set()
+        self._started: dict[str, float] = {}
+        self.reported = False
+
+    def expect(self, *names: str) -> None:
+        self.expected.update(names)
+
+    def start(self, name: str) -> None:
+        self._started.setdefault(name, time.perf_counter())
+
+    def end(self, name: str) -> None:
+        started_at = self._started.pop(name, None)
+        if started_at is None:
+            return
+        ended_at = time.perf_counter()
+        self.phases.append((name, started_at - self.origin, ended_at - self.origin))
+        print(f"[STARTUP] {name}: {ended_at - started_at:.2f} s (t+{ended_at - self.origin:.2f} s)")
+        if not self.reported and self.expected <= {phase[0] for phase in self.phases}:
+            self.report()
+
+    @contextmanager
+    def phase(self, name: str):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    def report(self) -> None:
+        self.reported = True
+        total = max(end for _, _, end in self.phases)
+        print(f"[STARTUP] Arranque completo en {total:.2f} s:")
+        for name, start, end in sorted(self.phases, key=lambda phase: phase[1]):
+            print(f"[STARTUP]   {start:7.2f} s → {end:7.2f} s  {end - start:6.2f} s  {name}")
+
+
+async def wait_for_lavalink(uri: str, password: str, initial_delay: float = 0.5, max_delay: float = 5.0,
+                            timeout: Optional[float] = None) -> int:
+    """Espera a que Lavalink responda en /version, reintentando con espera creciente.
+
+    Devuelve el número de intentos. Con ``timeout`` lanza ``asyncio.TimeoutError``
+    si no responde a tiempo; sin él espera indefinidamente.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    delay = initial_delay
+    attempts = 0
+    url = f"{uri.rstrip('/')}/version"
+    headers = {"Authorization": password}
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=3)) as session:
+        while True:
+            attempts += 1
+            try:
+                async with session.get(url, headers=headers) as resp:
+                    if resp.status == 200:
+                        return attempts
+                    reason = f"HTTP {resp.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                reason = type(e).__name__
+            if attempts == 1 or attempts % 10 == 0:
+                print(f"[STARTUP] Lavalink en {uri} aún no responde ({reason}), reintentando...")
+            if deadline and time.monotonic() + delay > deadline:
+                raise asyncio.TimeoutError(f"Lavalink en {uri} no respondió tras {attempts} intentos")
+            # Espera creciente con algo de azar para no sincronizar reintentos
+            await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+            delay = min(delay * 1.5, max_delay)
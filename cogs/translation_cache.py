@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class TranslationCache:
+    """Caché de traducciones de sinopsis: LRU en memoria respaldada por SQLite.
+
+    La clave es (id del anime, hash del texto original, idioma destino), así
+    que si MAL cambia la sinopsis se vuelve a traducir. En memoria se guardan
+    ``max_entries`` traducciones; en disco hasta ``max_disk_entries``,
+    expulsando las usadas hace más tiempo. El disco se lee y escribe en un
+    hilo, fuera del bucle de eventos.
+    """
+
+    def __init__(self, path: str, max_entries: int = 1000, max_disk_entries: int = 20_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._entries: OrderedDict[tuple[int, str, str], str] = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._init_db()
+
+    @staticmethod
+    def key(anime_id: int, text: str, target: str) -> tuple[int, str, str]:
+        return anime_id, hashlib.sha256(text.encode("utf-8")).hexdigest()[:32], target
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_db(self) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS translation ("
+                "anime_id INTEGER NOT NULL, source_hash TEXT NOT NULL, target TEXT NOT NULL, "
+                "text TEXT NOT NULL, used_at REAL NOT NULL, PRIMARY KEY (anime_id, source_hash, target))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS translation_used ON translation (used_at)")
+        conn.close()
+
+    def _read(self, key: tuple[int, str, str]) -> Optional[str]:
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute(
+                    "SELECT text FROM translation WHERE anime_id = ? AND source_hash = ? AND target = ?", key
+                ).fetchone()
+                if row:
+                    conn.execute(
+                        "UPDATE translation SET used_at = ? WHERE anime_id = ? AND source_hash = ? AND target = ?",
+                        (time.time(), *key),
+                    )
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def _write(self, key: tuple[int, str, str], text: str) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO translation (anime_id, source_hash, target, text, used_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (*key, text, time.time()),
+                )
+                excess = conn.execute("SELECT COUNT(*) FROM translation").fetchone()[0] - self.max_disk_entries
+                if excess > 0:
+                    conn.execute(
+                        "DELETE FROM translation WHERE rowid IN "
+                        "(SELECT rowid FROM translation ORDER BY used_at LIMIT ?)",
+                        (excess,),
+                    )
+        finally:
+            conn.close()
+
+    def _remember(self, key: tuple[int, str, str], text: str) -> None:
+        self._entries[key] = text
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, anime_id: int, text: str, target: str) -> Optional[str]:
+        key = self.key(anime_id, text, target)
+        cached = self._entries.get(key)
+        if cached is not None:
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            return cached
+        try:
+            cached = await asyncio.to_thread(self._read, key)
+        except sqlite3.Error as e:
+            print(f"[TRANSLATION CACHE] Error al leer: {e}")
+            cached = None
+        if cached is None:
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        self._remember(key, cached)
+        return cached
+
+    async def put(self, anime_id: int, text: str, target: str, translation: str) -> None:
+        key = self.key(anime_id, text, target)
+        self._remember(key, translation)
+        try:
+            await asyncio.to_thread(self._write, key, translation)
+        except sqlite3.Error as e:
+            print(f"[TRANSLATION CACHE] Error al guardar: {e}")
+
+    def _count(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM translation").fetchone()[0]
+        finally:
+            conn.close()
+
+    async def disk_entries(self) -> int:
+        return await asyncio.to_thread(self._count)
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+        }
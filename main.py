@@ -3,17 +3,24 @@ from discord.ext import commands
 from discord import app_commands
 import wavelink
 import os
+from cogs.startup import StartupTimeline
+from cogs.command_sync import sync_if_changed
 
+# Tiempos de cada fase del arranque (se imprimen al terminar todas)
+startup_timeline = StartupTimeline()
+startup_timeline.expect("Gateway de Discord", "Nodos de Lavalink")
 
 intents = discord.Intents.default()
 intents.message_content = True
 
 bot = commands.Bot(command_prefix='g.', intents=intents)
+bot.startup_timeline = startup_timeline
 
 # ---------- EVENTOS GLOBALES ----------
 @bot.event
 async def on_ready():
     print(f'Bot conectado como {bot.user}')
+    startup_timeline.end("Gateway de Discord")
 
 @bot.event
 async def on_error(event, *args, **kwargs):
@@ -26,19 +33,23 @@ async def on_error(event, *args, **kwargs):
 @bot.event
 async def setup_hook():
     # Carga tu cog de búsquedas (agrega más cogs aquí según los vayas creando)
-    await bot.load_extension('cogs.search')
-    await bot.load_extension('cogs.music')
-    await bot.load_extension('cogs.moderation')
-    await bot.load_extension('cogs.buckshot')
-    await bot.load_extension('cogs.minecraft')
+    with startup_timeline.phase("Cogs"):
+        await bot.load_extension('cogs.search')
+        # El cog de música conecta Lavalink en segundo plano, en paralelo con el gateway
+        await bot.load_extension('cogs.music')
+        await bot.load_extension('cogs.moderation')
+        await bot.load_extension('cogs.buckshot')
+        await bot.load_extension('cogs.minecraft')
     # Recuerda: el nombre es el "path" relativo: carpeta + nombre archivo (sin .py)
 
-    # Sincroniza los comandos de la aplicación (slash commands)
-    try:
-        synced = await bot.tree.sync()
-        print(f"Sincronizados {len(synced)} comandos de aplicación.")
-    except Exception as e:
-        print(f"Error al sincronizar comandos de aplicación: {e}")
+    # Sincroniza los comandos de la aplicación (slash commands) solo si cambiaron
+    with startup_timeline.phase("Sincronización de comandos"):
+        try:
+            await sync_if_changed(bot.tree)
+        except Exception as e:
+            print(f"Error al sincronizar comandos de aplicación: {e}")
+
+    startup_timeline.start("Gateway de Discord")
 
 # --------- ARRANQUE DEL BOT ----------
 if __name__ == '__main__':